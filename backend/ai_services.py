@@ -1,38 +1,67 @@
 # This module encapsulates all interactions with the Google Generative AI.
 import os
+import re
 import google.generativeai as genai
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict
 from dotenv import load_dotenv
+from embedding_cache import embedding_cache
+from embedding_batcher import EmbeddingBatcher
+from generation_scheduler import GenerationScheduler, INTERACTIVE
+from metrics import span
 
 load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+EMBEDDING_MODEL = "models/text-embedding-004"
+GENERATION_MODEL = "gemini-2.0-flash"
 
 genai.configure(api_key=GOOGLE_API_KEY)
 
+def embed_batch(texts: List[str]) -> List[List[float]]:
+   """Embed several texts in one synchronous API call."""
+   result = genai.embed_content(model=EMBEDDING_MODEL, content=texts, task_type="retrieval_document")
+   return result['embedding']
+
+# Shared by request handlers and offline ingestion; concurrent callers share API calls.
+embedding_batcher = EmbeddingBatcher(embed_batch)
+
+async def get_embeddings(texts: List[str]) -> List[List[float]]:
+   """Embed many texts (e.g. commentary chunks during ingestion) in batched API calls, bypassing the cache."""
+   return await embedding_batcher.embed_many(texts)
+
 async def get_embedding(text: str) -> List[float]:
-   """Generate embedding for text using Google AI."""
+   """Generate embedding for text using Google AI, served from the embedding cache when possible."""
+   with span("embedding"):
+       return await _get_embedding(text)
+
+async def _get_embedding(text: str) -> List[float]:
+   cached = await embedding_cache.get(EMBEDDING_MODEL, text)
+   if cached is not None:
+       return cached
+
    try:
-       model = "models/text-embedding-004"
-       result = genai.embed_content(model=model, content=text, task_type="retrieval_document")
-       return result['embedding']
+       # Concurrent misses are coalesced into one batched call, made off the event loop.
+       embedding = await embedding_batcher.embed(text)
    except Exception as e:
        print(f"Error generating embedding: {e}")
        return []
 
-async def generate_event_explanation(query: str, theology_context: List[Dict], commentary_context: List[Dict], book: str, verse: str, theme: str) -> str:
-   """Generate explanation using Google AI with RAG context."""
-   try:
-       theology_text = "\n".join([
-           f"Concept: {item.get('concept', '')}\nSummary: {item.get('summary', '')}\nDescription: {item.get('description', '')}"
-           for item in theology_context
-       ])
+   if embedding:
+       await embedding_cache.put(EMBEDDING_MODEL, text, embedding)
+   return embedding
 
-       commentary_text = "\n".join([
-           f"Commentary: {item.get('text', '')}"
-           for item in commentary_context
-       ])
+def build_event_prompt(theology_context: List[Dict], commentary_context: List[Dict], book: str, verse: str, theme: str) -> str:
+   """Build the RAG prompt for an event explanation."""
+   theology_text = "\n".join([
+       f"Concept: {item.get('concept', '')}\nSummary: {item.get('summary', '')}\nDescription: {item.get('description', '')}"
+       for item in theology_context
+   ])
 
-       prompt = f"""You are a biblical scholar. Your task is to provide a detailed explanation of a biblical event based on the provided context.
+   commentary_text = "\n".join([
+       f"Commentary: {item.get('text', '')}"
+       for item in commentary_context
+   ])
+
+   return f"""You are a biblical scholar. Your task is to provide a detailed explanation of a biblical event based on the provided context.
 
 **Topic:** The biblical event in {book} {verse} as it relates to the theme of "{theme}".
 
@@ -54,35 +83,19 @@ Generate a comprehensive explanation of approximately 200-300 words. The respons
 Combine these points into a single, cohesive, and scholarly yet accessible explanation.
 """
 
-       model = genai.GenerativeModel('gemini-2.0-flash')
-       response = await model.generate_content_async(prompt)
-
-       if response.text:
-           # Clean the text to remove unwanted markdown characters before returning
-           cleaned_text = response.text.replace('**', '').replace('#', '').strip()
-           return cleaned_text
-       else:
-           return "Unable to generate explanation at this time."
+def build_verse_prompt(verse_text: str, theology_context: List[Dict], commentary_context: List[Dict], book: str, chapter: int, verse: int) -> str:
+   """Build the RAG prompt for a verse explanation."""
+   theology_text = "\n".join([
+       f"Concept: {item.get('concept', '')}\nSummary: {item.get('summary', '')}"
+       for item in theology_context
+   ])
 
+   commentary_text = "\n".join([
+       f"Commentary: {item.get('text', '')}"
+       for item in commentary_context
+   ])
 
-   except Exception as e:
-       print(f"Error generating event explanation: {e}")
-       return f"Error generating explanation for {book} {verse} related to {theme}."
-
-async def generate_verse_explanation(verse_text: str, theology_context: List[Dict], commentary_context: List[Dict], book: str, chapter: int, verse: int) -> str:
-   """Generate verse explanation using Google AI with RAG context."""
-   try:
-       theology_text = "\n".join([
-           f"Concept: {item.get('concept', '')}\nSummary: {item.get('summary', '')}"
-           for item in theology_context
-       ])
-
-       commentary_text = "\n".join([
-           f"Commentary: {item.get('text', '')}"
-           for item in commentary_context
-       ])
-
-       prompt = f"""You are a biblical scholar. Your task is to provide a detailed explanation of a Bible verse based on the provided context.
+   return f"""You are a biblical scholar. Your task is to provide a detailed explanation of a Bible verse based on the provided context.
 
 **Verse for Explanation:** "{verse_text}" ({book} {chapter}:{verse})
 
@@ -104,16 +117,105 @@ Generate a comprehensive explanation of approximately 200-300 words. The respons
 Combine these points into a single, cohesive, and scholarly yet accessible explanation.
 """
 
-       model = genai.GenerativeModel('gemini-2.0-flash')
-       response = await model.generate_content_async(prompt)
-
-       if response.text:
-           # Clean the text to remove unwanted markdown characters before returning
-           cleaned_text = response.text.replace('**', '').replace('#', '').strip()
-           return cleaned_text
-       else:
-           return "Unable to generate explanation at this time."
-
-   except Exception as e:
-       print(f"Error generating verse explanation: {e}")
-       return f"Error generating explanation for {book} {chapter}:{verse}."
+def clean_explanation_text(text: str) -> str:
+   """Remove unwanted markdown characters from generated text."""
+   return text.replace('**', '').replace('#', '').strip()
+
+class StreamingTextCleaner:
+   """
+   Applies clean_explanation_text incrementally to streamed chunks. A trailing run of
+   '*', '#' or whitespace is held back until the next chunk shows where it ends, so the
+   concatenated output equals cleaning the full text at once.
+   """
+
+   _TRAILING = re.compile(r"[\s*#]*$")
+
+   def __init__(self):
+       self._pending = ""
+       self._started = False
+
+   def feed(self, chunk: str) -> str:
+       buffer = self._pending + chunk
+       split = self._TRAILING.search(buffer).start()
+       ready, self._pending = buffer[:split], buffer[split:]
+       return self._emit(ready)
+
+   def flush(self) -> str:
+       ready, self._pending = self._pending, ""
+       return self._emit(ready).rstrip()
+
+   def _emit(self, text: str) -> str:
+       text = text.replace('**', '').replace('#', '')
+       if not self._started:
+           text = text.lstrip()
+           self._started = bool(text)
+       return text
+
+# Builds generation models; replaced by set_model_factory() to run against a stub.
+model_factory = genai.GenerativeModel
+_model = None
+
+# Every generation call in the process shares one slot pool, rate limit and queue.
+generation_scheduler = GenerationScheduler()
+
+def set_model_factory(factory) -> None:
+   """Replace the factory used to build generation models (e.g. with ai_stubs.StubGenerativeModel)."""
+   global model_factory, _model
+   model_factory = factory
+   _model = None
+
+def generation_model():
+   """The shared generation model, built on first use."""
+   global _model
+   if _model is None:
+       _model = model_factory(GENERATION_MODEL)
+   return _model
+
+async def _generate(prompt: str, priority: int = INTERACTIVE) -> str:
+   """Generate cleaned text for a prompt. Errors and empty responses raise; nothing is returned in their place."""
+   async def call() -> str:
+       response = await generation_model().generate_content_async(prompt)
+       return response.text
+
+   with span("generation"):
+       text = await generation_scheduler.run(call, priority)
+   if not text:
+       raise ValueError("Empty response from model")
+   return clean_explanation_text(text)
+
+async def _stream(prompt: str) -> AsyncIterator[str]:
+   """Yield cleaned text pieces as Gemini streams them, holding a generation slot throughout."""
+   async with generation_scheduler.slot(INTERACTIVE):
+       # Only opening the stream is retried; text already sent cannot be taken back.
+       with span("generation.first_chunk"):
+           response = await generation_scheduler.call(
+               lambda: generation_model().generate_content_async(prompt, stream=True)
+           )
+       cleaner = StreamingTextCleaner()
+       async for chunk in response:
+           piece = cleaner.feed(chunk.text or "")
+           if piece:
+               yield piece
+       tail = cleaner.flush()
+       if tail:
+           yield tail
+
+async def generate_event_explanation(query: str, theology_context: List[Dict], commentary_context: List[Dict], book: str, verse: str, theme: str,
+                                     priority: int = INTERACTIVE) -> str:
+   """Generate explanation using Google AI with RAG context. Errors propagate to the caller."""
+   prompt = build_event_prompt(theology_context, commentary_context, book, verse, theme)
+   return await _generate(prompt, priority)
+
+async def generate_verse_explanation(verse_text: str, theology_context: List[Dict], commentary_context: List[Dict], book: str, chapter: int, verse: int,
+                                     priority: int = INTERACTIVE) -> str:
+   """Generate verse explanation using Google AI with RAG context. Errors propagate to the caller."""
+   prompt = build_verse_prompt(verse_text, theology_context, commentary_context, book, chapter, verse)
+   return await _generate(prompt, priority)
+
+def stream_event_explanation(theology_context: List[Dict], commentary_context: List[Dict], book: str, verse: str, theme: str) -> AsyncIterator[str]:
+   """Stream a cleaned event explanation piece by piece. Errors propagate to the caller."""
+   return _stream(build_event_prompt(theology_context, commentary_context, book, verse, theme))
+
+def stream_verse_explanation(verse_text: str, theology_context: List[Dict], commentary_context: List[Dict], book: str, chapter: int, verse: int) -> AsyncIterator[str]:
+   """Stream a cleaned verse explanation piece by piece. Errors propagate to the caller."""
+   return _stream(build_verse_prompt(verse_text, theology_context, commentary_context, book, chapter, verse))
@@ -0,0 +1,74 @@
+# This module provides offline stand-ins for the Google embedding and generation APIs.
+#
+# They let batch jobs and benchmarks run the real pipeline without an API key:
+# embeddings are deterministic hash-derived unit vectors and generation returns a
+# fixed-shape explanation after a configurable delay.
+
+import asyncio
+import hashlib
+import time
+from typing import List
+
+import numpy as np
+
+STUB_EMBEDDING_DIM = 768
+STUB_EMBEDDING_MODEL = "stub/text-embedding"
+
+STUB_EXPLANATION = (
+   "**Literal Meaning:** A stub explanation generated offline. "
+   "**Historical and Cultural Context:** No model was called. "
+   "**Theological Significance:** The text has the same structure as a real response. "
+   "**Immediate Context:** It is returned after a configurable delay. "
+   "**Practical Application:** Use it to test throughput and caching."
+)
+
+def stub_embedding(text: str, dim: int = STUB_EMBEDDING_DIM) -> List[float]:
+   """Returns a deterministic unit vector derived from a hash of the text."""
+   seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+   vector = np.random.default_rng(seed).normal(size=dim).astype(np.float32)
+   return (vector / np.linalg.norm(vector)).tolist()
+
+def make_stub_embed_batch(latency_ms: float = 0.0, dim: int = STUB_EMBEDDING_DIM):
+   """Returns a synchronous batch embedding function with a fixed per-call latency."""
+   def embed_batch(texts: List[str]) -> List[List[float]]:
+       if latency_ms:
+           time.sleep(latency_ms / 1000.0)
+       return [stub_embedding(text, dim) for text in texts]
+   return embed_batch
+
+class _StubResponse:
+   def __init__(self, text: str):
+       self.text = text
+
+class StubGenerativeModel:
+   """Mimics genai.GenerativeModel.generate_content_async, including stream=True."""
+
+   latency_ms = 0.0
+   text = STUB_EXPLANATION
+
+   def __init__(self, model_name: str = "stub", *args, **kwargs):
+       self.model_name = model_name
+
+   async def generate_content_async(self, prompt: str, stream: bool = False, **kwargs):
+       if not stream:
+           await asyncio.sleep(self.latency_ms / 1000.0)
+           return _StubResponse(self.text)
+       return self._stream()
+
+   async def _stream(self):
+       words = self.text.split(" ")
+       step = self.latency_ms / 1000.0 / max(1, len(words))
+       for i, word in enumerate(words):
+           await asyncio.sleep(step)
+           yield _StubResponse(word if i == 0 else " " + word)
+
+def install_stubs(generation_latency_ms: float = 0.0, embedding_latency_ms: float = 0.0) -> None:
+   """
+   Routes ai_services embedding and generation calls to the stubs. The embedding
+   model name changes too, so stub vectors never share cache keys with real ones.
+   """
+   import ai_services
+   ai_services.EMBEDDING_MODEL = STUB_EMBEDDING_MODEL
+   StubGenerativeModel.latency_ms = generation_latency_ms
+   ai_services.set_model_factory(StubGenerativeModel)
+   ai_services.embedding_batcher.embed_fn = make_stub_embed_batch(embedding_latency_ms)
@@ -0,0 +1 @@
+# INIT FILE
\ No newline at end of file
@@ -0,0 +1,348 @@
+"""
+Load test of the whole API with local stand-ins for MongoDB and Gemini.
+
+The real app (routers, middleware and lifespan) runs in-process behind httpx's
+ASGI transport. MongoDB is replaced by benchmarks.memory_db, or by a local
+mongod given with --mongo-uri, which is seeded first. Embedding and generation
+calls go to ai_stubs with the latencies given. Each scenario sends --requests
+requests to one endpoint at every --concurrency level (after --warmup unmeasured
+ones) and reports p50/p95/p99/max latency, requests/sec and status counts as JSON.
+The client shares the app's event loop, so the numbers are the capacity of one
+worker, client overhead included. So does the memory database's own query work,
+which matters only for the routes that fall back to MongoDB (e.g. with
+VERSE_STORE_ENABLED=false); measure those against a mongod.
+
+The explain scenarios come in two kinds: '_cached' ones cycle through a few keys
+that the warm-up generates, and '_generate' ones use a new key per request, so
+every request goes through retrieval and the generation scheduler. Admin reload
+and profile are not driven: one replaces the live data and the other sleeps for
+its sampling window.
+
+A run can be saved as a baseline and later runs compared against it. A scenario
+regresses when its p95 grows, or its requests/sec drop, by more than
+--tolerance; changes of less than --min-delta-ms in p95, or in the time per
+request implied by requests/sec, are ignored as noise. The comparison is added
+to the output and the exit status is 1 on any regression.
+Baselines are specific to the machine they were recorded on, so none is checked
+in: record one on the machine you compare on (from the commit you compare
+against), with the same flags, before measuring a change.
+
+Usage (from the backend directory; needs httpx):
+    python -m benchmarks.bench_load --concurrency 1 8 32 --requests 100
+    python -m benchmarks.bench_load --scenarios verses search explain_verse_cached --out load.json
+    python -m benchmarks.bench_load --save-baseline benchmarks/baselines/local.json
+    python -m benchmarks.bench_load --compare benchmarks/baselines/local.json --tolerance 0.25
+"""
+
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.synthetic import BOOK_NAMES
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+ADMIN_TOKEN = "bench-admin-token"
+# Every synthetic book has at least 18 chapters of at least 12 verses.
+CHAPTERS, VERSES = 18, 12
+CACHED_KEYS = 16
+
+def load_ids():
+    with open(DATA_DIR / "themes.json", encoding="utf-8") as f:
+        themes = [theme["id"] for theme in json.load(f)]
+    with open(DATA_DIR / "biblical_books.json", encoding="utf-8") as f:
+        books = json.load(f)
+    with open(DATA_DIR / "book_insights.json", encoding="utf-8") as f:
+        insights = sorted(int(book_id) for book_id in json.load(f))
+    return themes, [book["id"] for book in books], [book["name"] for book in books], insights
+
+def verse_key(n):
+    """The n-th distinct (book, chapter, verse) of the synthetic Bible."""
+    book = BOOK_NAMES[n % len(BOOK_NAMES)]
+    n //= len(BOOK_NAMES)
+    return book, 1 + n % CHAPTERS, 1 + (n // CHAPTERS) % VERSES
+
+def build_scenarios():
+    """name -> (method, route template, request(i) -> (path, json body))."""
+    themes, book_ids, book_names, insight_ids = load_ids()
+    fresh_verses = itertools.count(CACHED_KEYS)
+    fresh_events = itertools.count(CACHED_KEYS)
+    refs = [f"{book} {1 + i % CHAPTERS}:1-{VERSES}" for i, book in enumerate(book_names)] + ["John 3:16-21; 4:1-5"]
+    queries = ["steadfast love", "covenant", '"the land of egypt"', "faith righteousness", "temple king priest"]
+
+    def verse_body(n):
+        book, chapter, verse = verse_key(n)
+        return {"book": book, "chapter": chapter, "verse": verse}
+
+    def event_body(n):
+        return {"book": book_names[n % len(book_names)], "verse": f"Benchmark event {n}", "theme": themes[n % len(themes)]}
+
+    def get(path):
+        return lambda i: (path(i), None)
+
+    def post(path, body):
+        return lambda i: (path, body(i))
+
+    return {
+        "health": ("GET", "/api/v1/health", get(lambda i: "/api/v1/health")),
+        "books": ("GET", "/api/v1/books", get(lambda i: "/api/v1/books")),
+        "book": ("GET", "/api/v1/books/{book_id}", get(lambda i: f"/api/v1/books/{book_ids[i % len(book_ids)]}")),
+        "book_insights": ("GET", "/api/v1/books/{book_id}/insights",
+                          get(lambda i: f"/api/v1/books/{insight_ids[i % len(insight_ids)]}/insights")),
+        "book_themes": ("GET", "/api/v1/books/{book_id}/themes", get(lambda i: f"/api/v1/books/{book_ids[i % len(book_ids)]}/themes")),
+        "chapters": ("GET", "/api/v1/books/{book}/chapters", get(lambda i: f"/api/v1/books/{BOOK_NAMES[i % len(BOOK_NAMES)]}/chapters")),
+        "verses": ("GET", "/api/v1/books/{book}/chapters/{chapter_number}/verses",
+                   get(lambda i: "/api/v1/books/{}/chapters/{}/verses".format(*verse_key(i)[:2]))),
+        "passage": ("GET", "/api/v1/passages", get(lambda i: f"/api/v1/passages?ref={refs[i % len(refs)]}")),
+        "themes": ("GET", "/api/v1/themes", get(lambda i: "/api/v1/themes")),
+        "theme_connections": ("GET", "/api/v1/themes/{theme_id}/connections",
+                              get(lambda i: f"/api/v1/themes/{themes[i % len(themes)]}/connections")),
+        "theme_overlay": ("GET", "/api/v1/themes/overlay",
+                          get(lambda i: f"/api/v1/themes/overlay?themes={themes[i % len(themes)]},{themes[(i + 1) % len(themes)]}&mode=union")),
+        "similar_themes": ("GET", "/api/v1/themes/{theme_id}/similar", get(lambda i: f"/api/v1/themes/{themes[i % len(themes)]}/similar")),
+        "search": ("GET", "/api/v1/search", get(lambda i: f"/api/v1/search?q={queries[i % len(queries)]}")),
+        "search_vector": ("GET", "/api/v1/search", get(lambda i: f"/api/v1/search?q={queries[i % len(queries)]}&vector=true")),
+        "explain_verse_cached": ("POST", "/api/v1/explain-verse", post("/api/v1/explain-verse", lambda i: verse_body(i % CACHED_KEYS))),
+        "explain_verse_generate": ("POST", "/api/v1/explain-verse", post("/api/v1/explain-verse", lambda i: verse_body(next(fresh_verses)))),
+        "explain_verse_stream": ("POST", "/api/v1/explain-verse/stream",
+                                 post("/api/v1/explain-verse/stream", lambda i: verse_body(next(fresh_verses)))),
+        "explain_event_cached": ("POST", "/api/v1/explain-event", post("/api/v1/explain-event", lambda i: event_body(i % CACHED_KEYS))),
+        "explain_event_generate": ("POST", "/api/v1/explain-event", post("/api/v1/explain-event", lambda i: event_body(next(fresh_events)))),
+        "explain_event_stream": ("POST", "/api/v1/explain-event/stream",
+                                 post("/api/v1/explain-event/stream", lambda i: event_body(next(fresh_events)))),
+        "explain_batch": ("POST", "/api/v1/explain/batch", post("/api/v1/explain/batch", lambda i: {
+            "verses": [verse_body((i + k) % CACHED_KEYS) for k in range(6)],
+            "events": [event_body((i + k) % CACHED_KEYS) for k in range(2)],
+        })),
+        "stats": ("GET", "/api/v1/stats", get(lambda i: "/api/v1/stats")),
+        "metrics": ("GET", "/api/v1/metrics", get(lambda i: "/api/v1/metrics")),
+        "admin_data": ("GET", "/api/v1/admin/data", get(lambda i: "/api/v1/admin/data")),
+    }
+
+def summarize(latencies, statuses, elapsed, concurrency):
+    ms = np.asarray(latencies) * 1000
+    errors = sum(count for status, count in statuses.items() if not str(status).startswith("2"))
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": {str(status): count for status, count in sorted(statuses.items(), key=lambda item: str(item[0]))},
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+async def drive(client, method, request, total, concurrency):
+    """Sends `total` requests from `concurrency` concurrent workers; returns latencies, statuses and wall time."""
+    counter = itertools.count()
+    latencies, statuses = [], Counter()
+    headers = {"X-Admin-Token": ADMIN_TOKEN}
+
+    async def worker():
+        while True:
+            i = next(counter)
+            if i >= total:
+                return
+            path, body = request(i)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body, headers=headers)
+                await response.aread()
+                statuses[response.status_code] += 1
+            except Exception as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, statuses, time.perf_counter() - start
+
+def configure_environment(args, tmp):
+    """Points every on-disk artifact at a scratch directory and sets up the app before it is imported."""
+    os.environ["DATA_SNAPSHOT_ENABLED"] = "false"
+    os.environ["DATA_REFRESH_MODE"] = "off"
+    os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(tmp, "embedding_cache.sqlite3")
+    os.environ["SEARCH_INDEX_PATH"] = os.path.join(tmp, "search_index")
+    os.environ["VERSE_STORE_PATH"] = os.path.join(tmp, "verse_store")
+    os.environ["VECTOR_INDEX_DIR"] = os.path.join(tmp, "vector_index")
+    os.environ["RETRIEVAL_BACKEND"] = args.retrieval
+    os.environ["ADMIN_TOKEN"] = ADMIN_TOKEN
+    # The stub has no quota, so the token bucket would only measure itself.
+    os.environ.setdefault("GENERATION_RATE_PER_MINUTE", "0")
+    if args.mongo_uri:
+        os.environ["MONGO_DB_URI"] = args.mongo_uri
+        os.environ["MONGO_DB_NAME"] = args.mongo_db
+
+async def prepare_database(args):
+    """Seeds the memory database (installed as the app's client) or the local mongod."""
+    import database
+    from benchmarks.memory_db import MemoryClient, seed_database
+    if args.mongo_uri:
+        db = await database.connect_db()
+    else:
+        database.client = MemoryClient(args.db_latency_ms)
+        db = database.db = database.client[database.MONGO_DB_NAME]
+    sizes = await seed_database(db, args.commentary_chunks)
+    if args.retrieval == "local":
+        from vector_index import COLLECTION_FIELDS, VECTOR_INDEX_DIR, export_collection
+        for name in COLLECTION_FIELDS:
+            (await export_collection(db, name)).save(os.path.join(VECTOR_INDEX_DIR, name))
+    return sizes
+
+async def wait_for_search_index(timeout=120.0):
+    from search_index import get_search_index
+    deadline = time.monotonic() + timeout
+    while get_search_index() is None and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+
+async def run(args):
+    import httpx
+    from ai_stubs import install_stubs
+
+    sizes = await prepare_database(args)
+    install_stubs(args.generation_latency_ms, args.embedding_latency_ms)
+    from main import app
+
+    scenarios = build_scenarios()
+    unknown = set(args.scenarios or ()) - set(scenarios)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    selected = [name for name in scenarios if not args.scenarios or name in args.scenarios]
+
+    results = {}
+    async with app.router.lifespan_context(app):
+        await wait_for_search_index()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for name in selected:
+                method, route, request = scenarios[name]
+                # The cached scenarios' warm-up generates every key they cycle through.
+                warmup = max(args.warmup, CACHED_KEYS) if name.endswith("_cached") else args.warmup
+                if warmup:
+                    await drive(client, method, request, warmup, min(warmup, max(args.concurrency)))
+                levels = {}
+                for concurrency in args.concurrency:
+                    latencies, statuses, elapsed = await drive(client, method, request, args.requests, concurrency)
+                    levels[str(concurrency)] = summarize(latencies, statuses, elapsed, concurrency)
+                results[name] = {"method": method, "route": route, "levels": levels}
+                print(f"{name}: " + ", ".join(
+                    f"c={level['concurrency']} {level['rps']} rps p95 {level['p95_ms']} ms"
+                    + (f" ({level['errors']} errors)" if level["errors"] else "")
+                    for level in levels.values()
+                ), file=sys.stderr)
+
+    return {
+        "meta": {
+            "recorded_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "database": "mongod" if args.mongo_uri else "memory",
+            "retrieval": args.retrieval,
+            "seeded": sizes,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "db_latency_ms": 0.0 if args.mongo_uri else args.db_latency_ms,
+            "embedding_latency_ms": args.embedding_latency_ms,
+            "generation_latency_ms": args.generation_latency_ms,
+        },
+        "scenarios": results,
+    }
+
+def compare(current, baseline, tolerance, min_delta_ms):
+    """Per scenario and concurrency level present in both runs: p95 and rps changes, flagged past tolerance."""
+    rows = []
+    for name, scenario in current["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        for level, now in scenario["levels"].items():
+            before = previous["levels"].get(level)
+            if before is None:
+                continue
+            p95_change = now["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0.0
+            rps_change = now["rps"] / before["rps"] - 1 if before["rps"] else 0.0
+            regressed = []
+            if p95_change > tolerance and now["p95_ms"] - before["p95_ms"] >= min_delta_ms:
+                regressed.append("p95_ms")
+            # Time per request implied by the throughput, so sub-millisecond routes are not flagged for noise.
+            level_ms = (now["concurrency"] / now["rps"] - now["concurrency"] / before["rps"]) * 1000 if now["rps"] and before["rps"] else 0.0
+            if rps_change < -tolerance and level_ms >= min_delta_ms:
+                regressed.append("rps")
+            if now["errors"] > before["errors"]:
+                regressed.append("errors")
+            rows.append({
+                "scenario": name,
+                "concurrency": now["concurrency"],
+                "p95_ms": [before["p95_ms"], now["p95_ms"]],
+                "p95_change": round(p95_change, 4),
+                "rps": [before["rps"], now["rps"]],
+                "rps_change": round(rps_change, 4),
+                "regressed": regressed,
+            })
+    return {
+        "tolerance": tolerance,
+        "min_delta_ms": min_delta_ms,
+        "regressions": sum(1 for row in rows if row["regressed"]),
+        "levels": rows,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100, help="Requests per scenario and concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured requests before each scenario")
+    parser.add_argument("--scenarios", nargs="+", help="Run only these scenarios (default: all)")
+    parser.add_argument("--db-latency-ms", type=float, default=1.0, help="Round-trip latency of the memory database")
+    parser.add_argument("--embedding-latency-ms", type=float, default=50.0, help="Latency of one stub embedding batch")
+    parser.add_argument("--generation-latency-ms", type=float, default=250.0, help="Latency of one stub generation")
+    parser.add_argument("--mongo-uri", help="Seed and use this (local) MongoDB instead of the memory database")
+    parser.add_argument("--mongo-db", default="bible_bench", help="Database name used with --mongo-uri; it is overwritten")
+    parser.add_argument("--retrieval", choices=["atlas", "local"],
+                        help="Vector search through the database ($vectorSearch) or local indexes "
+                             "(default: atlas on the memory database, local on mongod)")
+    parser.add_argument("--commentary-chunks", type=int, default=1300)
+    parser.add_argument("--out", help="Write the results to this file instead of stdout")
+    parser.add_argument("--save-baseline", help="Also write the results to this baseline file")
+    parser.add_argument("--compare", help="Compare against this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative p95 growth / rps drop")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Ignore p95 growth smaller than this")
+    args = parser.parse_args()
+    args.retrieval = args.retrieval or ("local" if args.mongo_uri else "atlas")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_environment(args, tmp)
+        # The app logs with print(); keep stdout for the results.
+        with contextlib.redirect_stdout(sys.stderr):
+            result = asyncio.run(run(args))
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            result["comparison"] = compare(result, json.load(f), args.tolerance, args.min_delta_ms)
+    output = json.dumps(result, indent=2)
+    if args.save_baseline:
+        Path(args.save_baseline).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.save_baseline).write_text(output + "\n", encoding="utf-8")
+    if args.out:
+        Path(args.out).write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output)
+    if args.compare and result["comparison"]["regressions"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark concurrent throughput of the Bible reader queries.
+
+Compares the old blocking pymongo access pattern (sync calls made from inside
+async handlers) against the async motor client now used by the routers. Each
+run issues the same chapter-verse and chapter-list queries the reader endpoints
+send, at several concurrency levels, and reports requests/sec plus the worst
+event loop stall seen by a heartbeat task.
+
+Usage (from the backend directory, with MONGO_DB_URI set):
+    python -m benchmarks.bench_reader_concurrency --requests 200 --concurrency 1 8 32
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from pymongo import MongoClient
+
+from database import MONGO_DB_URI, MONGO_DB_NAME, create_client
+
+SAMPLE_CHAPTERS = [("Genesis", 1), ("Psalms", 23), ("Isaiah", 53), ("John", 3), ("Romans", 8)]
+
+def chapters_pipeline(book):
+    return [
+        {"$match": {"book": book}},
+        {"$group": {"_id": {"chapter": "$chapter", "book": "$book"}, "verseCount": {"$sum": 1}}},
+        {"$sort": {"_id.chapter": 1}},
+    ]
+
+async def blocking_query(db, i):
+    """The pre-motor access pattern: a sync pymongo call inside a coroutine."""
+    book, chapter = SAMPLE_CHAPTERS[i % len(SAMPLE_CHAPTERS)]
+    if i % 2:
+        list(db["bible_esv"].aggregate(chapters_pipeline(book)))
+    else:
+        list(db["bible_esv"].find({"book": book, "chapter": chapter}, {"_id": 0}).sort("verse", 1))
+
+async def async_query(db, i):
+    """The motor access pattern used by the routers."""
+    book, chapter = SAMPLE_CHAPTERS[i % len(SAMPLE_CHAPTERS)]
+    if i % 2:
+        await db["bible_esv"].aggregate(chapters_pipeline(book)).to_list(length=None)
+    else:
+        await db["bible_esv"].find({"book": book, "chapter": chapter}, {"_id": 0}).sort("verse", 1).to_list(length=None)
+
+async def heartbeat(stop, interval=0.005):
+    """Measures the largest delay between scheduled ticks of the event loop."""
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+async def run_level(query, db, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(heartbeat(stop))
+
+    async def one(i):
+        async with semaphore:
+            await query(db, i)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    worst_stall = await ticker
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "seconds": round(elapsed, 3),
+        "requests_per_sec": round(total / elapsed, 1),
+        "max_loop_stall_ms": round(worst_stall * 1000, 1),
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=MONGO_DB_URI)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    args = parser.parse_args()
+
+    sync_client = MongoClient(args.uri)
+    async_client = create_client(args.uri)
+    sync_db = sync_client[MONGO_DB_NAME]
+    async_db = async_client[MONGO_DB_NAME]
+
+    # Warm both pools so connection setup is not measured.
+    await async_query(async_db, 0)
+    await blocking_query(sync_db, 0)
+
+    report = {"blocking_pymongo": [], "async_motor": []}
+    for level in args.concurrency:
+        report["blocking_pymongo"].append(await run_level(blocking_query, sync_db, args.requests, level))
+        report["async_motor"].append(await run_level(async_query, async_db, args.requests, level))
+
+    print(json.dumps(report, indent=2))
+    sync_client.close()
+    async_client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+"""
+Benchmark the related passages graph: build time and per-lookup latency.
+
+Builds the graph from random unit embeddings for the verses of a synthetic
+Bible (--verses of them, all by default) and --commentary chunks, once per
+--block-rows value, and reports the build time and graph size. The last graph is
+saved, reloaded memory-mapped and timed on random verse lookups, unfiltered and
+by kind, and compared with exact brute-force search for the same verse.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_related --verses 8000 --block-rows 256 512 1024
+"""
+
+import argparse
+import json
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import synthetic_bible_esv
+from related_graph import RelatedGraph
+
+def time_lookup(fn, keys, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for key in keys:
+            fn(*key)
+    return (time.perf_counter() - start) / (repeat * len(keys)) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--verses", type=int, help="Verses to embed (default: the whole synthetic Bible)")
+    parser.add_argument("--commentary", type=int, default=1300)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--block-rows", type=int, nargs="+", default=[512])
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    verses = [[doc["book"], doc["chapter"], doc["verse"]] for doc in synthetic_bible_esv()][:args.verses]
+    commentary = [{"text": f"Commentary chunk {i}", "source": "Synthetic commentary", "page": 21 + i} for i in range(args.commentary)]
+    rng = np.random.default_rng(0)
+    verse_embeddings = rng.normal(size=(len(verses), args.dim)).astype(np.float32)
+    commentary_embeddings = rng.normal(size=(len(commentary), args.dim)).astype(np.float32)
+
+    builds = {}
+    for block_rows in args.block_rows:
+        start = time.perf_counter()
+        graph = RelatedGraph.from_embeddings(verses, verse_embeddings, commentary, commentary_embeddings, args.k, block_rows)
+        builds[str(block_rows)] = round(time.perf_counter() - start, 3)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        graph.save(tmp)
+        loaded = RelatedGraph.load(tmp, mmap=True)
+        keys = [tuple(key) for key in random.Random(1).sample(verses, min(args.lookups, len(verses)))]
+        lookups = {
+            "related_us": round(time_lookup(loaded.related, keys, args.repeat), 2),
+            "related_verse_us": round(time_lookup(lambda *key: loaded.related(*key, kind="verse"), keys, args.repeat), 2),
+            "related_commentary_us": round(time_lookup(lambda *key: loaded.related(*key, kind="commentary"), keys, args.repeat), 2),
+        }
+
+    nodes = np.concatenate([verse_embeddings, commentary_embeddings])
+    nodes /= np.linalg.norm(nodes, axis=1, keepdims=True)
+    exact_keys = keys[:50]
+    start = time.perf_counter()
+    for book, chapter, verse in exact_keys:
+        scores = nodes @ nodes[graph.verse_nodes[(book, chapter, verse)]]
+        np.argpartition(-scores, args.k)[:args.k + 1]
+    exact_us = (time.perf_counter() - start) / len(exact_keys) * 1e6
+
+    print(json.dumps({
+        "verses": len(verses),
+        "commentary": len(commentary),
+        "dim": args.dim,
+        "k": graph.k,
+        "build_seconds_by_block_rows": builds,
+        "graph_kib": round(graph.nbytes / 1024, 1),
+        "lookup": lookups,
+        "exact_search_us": round(exact_us, 2),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
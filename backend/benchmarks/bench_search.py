@@ -0,0 +1,84 @@
+"""
+Benchmark the full-text search index: build time, size and per-query latency.
+
+Builds the index from MongoDB (--source mongo, needs MONGO_DB_URI) or from a
+synthetic Bible and commentary of the same size (--source synthetic, the
+default), saves it, reloads it memory-mapped and times term and phrase queries.
+The synthetic vocabulary is tiny, so every term is common: it is a worst case.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_search --source synthetic
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+import time
+
+from search_index import SearchIndex, build_search_index_from_db
+from benchmarks.synthetic import synthetic_bible_esv, synthetic_commentary_chunks
+
+QUERIES = [
+    "covenant",
+    "steadfast love",
+    "the lord god said unto his people",
+    '"steadfast love endures"',
+    '"land of egypt" covenant',
+    '"in the beginning"',
+    "faith hope love",
+]
+
+async def build_from_mongo():
+    from database import connect_db, close_db_connection
+    db = await connect_db()
+    try:
+        return await build_search_index_from_db(db)
+    finally:
+        close_db_connection()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", choices=["synthetic", "mongo"], default="synthetic")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.source == "mongo":
+        built = asyncio.run(build_from_mongo())
+    else:
+        built = SearchIndex.from_documents(synthetic_bible_esv(), synthetic_commentary_chunks())
+    build_seconds = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        built.save(tmp)
+        start = time.perf_counter()
+        index = SearchIndex.load(tmp, mmap=True)
+        load_ms = (time.perf_counter() - start) * 1000
+
+        latencies = {}
+        for query in QUERIES:
+            index.search(query)
+            samples = []
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                total, _ = index.search(query, 10)
+                samples.append((time.perf_counter() - t0) * 1000)
+            latencies[query] = {"matches": total, "median_ms": round(statistics.median(samples), 3)}
+
+        report = {
+            "source": args.source,
+            "documents": index.doc_count,
+            "verses": index.verse_count,
+            "terms": len(index.terms),
+            "postings": int(len(index.posting_docs)),
+            "array_bytes": index.nbytes,
+            "build_seconds": round(build_seconds, 2),
+            "mmap_load_ms": round(load_ms, 2),
+            "queries": latencies,
+        }
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark the three ways the API can fill app.state.DATA at startup.
+
+- sequential: four scans, one per key, awaited one after another (the old path)
+- concurrent: load_all_data, one pass over 'theology' and one over 'books' run together
+- snapshot: read_snapshot from a local file written from the concurrent load
+
+The database paths need MONGO_DB_URI; each path is run --repeat times and the
+median is reported.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_startup --repeat 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from data_loader import finalize_data, insight_from_doc, load_all_data, theme_from_doc
+from data_snapshot import read_snapshot, write_snapshot
+
+async def load_sequential(db):
+    """The startup load before load_all_data: one full scan per key, one after another."""
+    themes = [theme_from_doc(doc) async for doc in db["theology"].find({}, {"_id": 0})]
+    books = []
+    async for book in db["books"].find({}, {"_id": 0}).sort("id", 1):
+        book["testament"] = book.get("testament", "").lower()
+        books.append(book)
+    insights = {
+        str(doc["id"]): insight_from_doc(doc)
+        async for doc in db["books"].find({}, {"_id": 0}) if doc.get("id")
+    }
+    connections = {
+        doc["id"]: doc["connections"]
+        async for doc in db["theology"].find({"id": {"$exists": True}, "connections": {"$exists": True}}, {"_id": 0, "id": 1, "connections": 1})
+    }
+    data = {"themes": themes, "books": books, "book_insights": insights, "theme_connections": connections}
+    return finalize_data(data, {key: "db" for key in data}, 0.0)
+
+async def time_async(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = await fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return result, round(statistics.median(samples), 2)
+
+def time_sync(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(samples), 2)
+
+async def run(repeat):
+    from database import connect_db, close_db_connection
+    db = await connect_db()
+    try:
+        _, sequential_ms = await time_async(lambda: load_sequential(db), repeat)
+        data, concurrent_ms = await time_async(lambda: load_all_data(db), repeat)
+    finally:
+        close_db_connection()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "data_snapshot.json")
+        write_snapshot(data, path)
+        snapshot_bytes = os.path.getsize(path)
+        snapshot_ms = time_sync(lambda: read_snapshot(path), repeat)
+
+    return {
+        "books": len(data["books"]),
+        "themes": len(data["themes"]),
+        "snapshot_bytes": snapshot_bytes,
+        "median_ms": {
+            "sequential": sequential_ms,
+            "concurrent": concurrent_ms,
+            "snapshot": snapshot_ms,
+        },
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.repeat)), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark the local vector index: recall and latency.
+
+--source synthetic (default) builds clustered random embeddings and measures
+recall@k of the float32/float16/int8 indexes against exact brute-force search.
+
+--source mongo exports a collection (needs MONGO_DB_URI) and measures recall@k
+of each local index against the Atlas $vectorSearch results for the same
+queries, plus the Atlas round-trip latency for comparison.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_vector_index --source synthetic --rows 5000
+    python -m benchmarks.bench_vector_index --source mongo --collection commentary_chunks
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+
+from vector_index import LocalVectorIndex, SUPPORTED_DTYPES, export_collection
+
+def synthetic_embeddings(rows, dim, clusters=64, seed=3):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=rows)
+    return centers[labels] + 0.35 * rng.normal(size=(rows, dim)).astype(np.float32)
+
+def make_queries(embeddings, count, seed=5):
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(embeddings), size=count)
+    return embeddings[picks] + 0.2 * rng.normal(size=(count, embeddings.shape[1])).astype(np.float32)
+
+def recall(expected_ids, got_ids):
+    hits = sum(len(set(e) & set(g)) for e, g in zip(expected_ids, got_ids))
+    total = sum(len(e) for e in expected_ids)
+    return hits / total if total else 1.0
+
+def time_queries(index, queries, k):
+    start = time.perf_counter()
+    for query in queries:
+        index.search(query, k)
+    single_ms = (time.perf_counter() - start) / len(queries) * 1000
+    start = time.perf_counter()
+    index.search_batch(queries, k)
+    batch_ms = (time.perf_counter() - start) / len(queries) * 1000
+    return round(single_ms, 3), round(batch_ms, 3)
+
+def evaluate(embeddings, ids, queries, expected, k):
+    report = {}
+    for dtype in SUPPORTED_DTYPES:
+        index = LocalVectorIndex.from_embeddings(embeddings, [{"id": i} for i in ids], dtype=dtype, ids=ids)
+        got = [[doc["id"] for doc in result] for result in index.search_batch(queries, k)]
+        single_ms, batch_ms = time_queries(index, queries, k)
+        report[dtype] = {
+            "recall_at_k": round(recall(expected, got), 4),
+            "matrix_bytes": index.nbytes,
+            "ms_per_query": single_ms,
+            "ms_per_query_batched": batch_ms,
+        }
+    return report
+
+async def atlas_results(db, collection, queries, k, candidates):
+    results, start = [], time.perf_counter()
+    for query in queries:
+        pipeline = [
+            {"$vectorSearch": {"index": "vector_index", "path": "embedding", "queryVector": query.tolist(),
+                               "numCandidates": candidates, "limit": k}},
+            {"$project": {"_id": 1}},
+        ]
+        docs = await db[collection].aggregate(pipeline).to_list(length=None)
+        results.append([str(doc["_id"]) for doc in docs])
+    return results, (time.perf_counter() - start) / len(queries) * 1000
+
+async def run_mongo(args):
+    from database import connect_db, close_db_connection
+    db = await connect_db()
+    try:
+        exported = await export_collection(db, args.collection, dtype="float32")
+        embeddings = np.asarray(exported.vectors, dtype=np.float32)
+        queries = make_queries(embeddings, args.queries)
+        expected, atlas_ms = await atlas_results(db, args.collection, queries, args.k, args.num_candidates)
+    finally:
+        close_db_connection()
+    report = evaluate(embeddings, exported.ids, queries, expected, args.k)
+    report["atlas"] = {"num_candidates": args.num_candidates, "ms_per_query": round(atlas_ms, 3)}
+    return report
+
+def run_synthetic(args):
+    embeddings = synthetic_embeddings(args.rows, args.dim)
+    ids = [str(i) for i in range(args.rows)]
+    queries = make_queries(embeddings, args.queries)
+    exact = LocalVectorIndex.from_embeddings(embeddings, [{"id": i} for i in ids], dtype="float32")
+    expected = [[doc["id"] for doc in result] for result in exact.search_batch(queries, args.k)]
+    return evaluate(embeddings, ids, queries, expected, args.k)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", choices=["synthetic", "mongo"], default="synthetic")
+    parser.add_argument("--collection", default="commentary_chunks")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--num-candidates", type=int, default=20)
+    args = parser.parse_args()
+
+    report = asyncio.run(run_mongo(args)) if args.source == "mongo" else run_synthetic(args)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark the in-memory verse store: memory footprint and per-lookup latency.
+
+Builds the store from MongoDB (--source mongo, needs MONGO_DB_URI) or from a
+synthetic Bible of the same size (--source synthetic, the default), saves it,
+reloads it memory-mapped and times the three lookups the routers use.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_verse_store --source synthetic
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import resource
+import tempfile
+import time
+
+from verse_store import VerseStore, build_verse_store_from_db
+from benchmarks.synthetic import synthetic_bible_esv
+
+def max_rss_kib():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def time_lookup(fn, keys, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for key in keys:
+            fn(*key)
+    return (time.perf_counter() - start) / (repeat * len(keys)) * 1e6
+
+async def build_from_mongo():
+    from database import connect_db, close_db_connection
+    db = await connect_db()
+    try:
+        return await build_verse_store_from_db(db)
+    finally:
+        close_db_connection()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", choices=["synthetic", "mongo"], default="synthetic")
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.source == "mongo":
+        built = asyncio.run(build_from_mongo())
+    else:
+        built = VerseStore.from_documents(synthetic_bible_esv())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        built.save(tmp)
+        rss_before = max_rss_kib()
+        store = VerseStore.load(tmp, mmap=True)
+
+        rng = random.Random(1)
+        chapter_keys, verse_keys = [], []
+        for _ in range(args.lookups):
+            book = rng.choice(store.books)
+            chapters = store.chapters(book)
+            chapter = rng.choice(chapters)
+            chapter_keys.append((book, chapter["number"]))
+            verse_keys.append((book, chapter["number"], rng.randint(1, chapter["verseCount"])))
+        book_keys = [(book,) for book, _ in chapter_keys]
+
+        report = {
+            "source": args.source,
+            "books": len(store.books),
+            "chapters": int(len(store.chapter_numbers)),
+            "verses": store.verse_count,
+            "array_bytes": store.nbytes,
+            "text_bytes": int(store.text.nbytes),
+            "rss_growth_kib_after_mmap_load": max_rss_kib() - rss_before,
+            "us_per_lookup": {
+                "chapters": round(time_lookup(store.chapters, book_keys, args.repeat), 2),
+                "verses": round(time_lookup(store.verses, chapter_keys, args.repeat), 2),
+                "verse_text": round(time_lookup(store.verse_text, verse_keys, args.repeat), 2),
+            },
+        }
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Benchmark multi-worker serving: throughput and per-worker memory by worker count.
+
+The datasets are prepared once, as the serve.py supervisor would, from the
+seeded memory database into a scratch directory: data snapshot, verse store,
+search index and local vector indexes. For each --workers count,
+`serve.py --no-prepare` then serves benchmarks.offline_app with that many
+uvicorn workers, and --clients load processes send a mix of read requests
+(catalog, chapters, verses, passages, search) over HTTP for --seconds after a
+--warmup period. Reported per worker count: requests/sec, speedup over the
+smallest count, p50/p95/p99 latency, and each process's RSS, PSS and shared and
+private memory from /proc/<pid>/smaps_rollup (Linux). PSS divides shared pages
+between the processes that map them, so the memory-mapped datasets should add
+to total PSS once, not once per worker.
+
+Scaling stops at the number of cores; the clients run on the same machine and
+take cores too.
+
+Usage (from the backend directory; needs httpx):
+    python -m benchmarks.bench_workers --workers 1 2 4 --clients 2 --seconds 10
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.synthetic import BOOK_NAMES
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+MEMORY_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+def request_path(i):
+    book = BOOK_NAMES[i % len(BOOK_NAMES)]
+    chapter = 1 + (i // len(BOOK_NAMES)) % 18
+    paths = (
+        "/api/v1/books",
+        "/api/v1/themes",
+        f"/api/v1/books/{book}/chapters",
+        f"/api/v1/books/{book}/chapters/{chapter}/verses",
+        f"/api/v1/passages?ref={book} {chapter}:1-12",
+        "/api/v1/search?q=steadfast love",
+    )
+    return paths[i % len(paths)]
+
+async def client_loop(base_url, concurrency, seconds):
+    import httpx
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + seconds
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        async def worker(offset):
+            nonlocal errors
+            i = offset
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(request_path(i))
+                    if response.status_code != 200:
+                        errors += 1
+                except Exception:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+                i += concurrency
+        await asyncio.gather(*(worker(offset) for offset in range(concurrency)))
+    return latencies, errors
+
+def run_client(arguments):
+    """One load process: (base_url, concurrency, seconds) -> (latencies, errors)."""
+    return asyncio.run(client_loop(*arguments))
+
+def drive(base_url, clients, concurrency, seconds):
+    with multiprocessing.get_context("spawn").Pool(clients) as pool:
+        start = time.perf_counter()
+        results = pool.map(run_client, [(base_url, concurrency, seconds)] * clients)
+        elapsed = time.perf_counter() - start
+    latencies = [latency for part, _ in results for latency in part]
+    return latencies, sum(errors for _, errors in results), elapsed
+
+def memory_of(pid):
+    """Memory counters of one process in MiB, from smaps_rollup."""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="utf-8") as f:
+            for line in f:
+                name, _, rest = line.partition(":")
+                if name in MEMORY_FIELDS:
+                    values[name] = int(rest.split()[0]) / 1024
+    except OSError:
+        return None
+    return {
+        "pid": pid,
+        "rss_mb": round(values.get("Rss", 0.0), 1),
+        "pss_mb": round(values.get("Pss", 0.0), 1),
+        "shared_mb": round(values.get("Shared_Clean", 0.0) + values.get("Shared_Dirty", 0.0), 1),
+        "private_mb": round(values.get("Private_Clean", 0.0) + values.get("Private_Dirty", 0.0), 1),
+    }
+
+def worker_pids(supervisor):
+    """The uvicorn worker processes started by the supervisor (spawned multiprocessing children)."""
+    pids = []
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+            cmdline = (entry / "cmdline").read_bytes()
+        except OSError:
+            continue
+        parent = int(stat.rsplit(")", 1)[1].split()[1])
+        if parent == supervisor and b"spawn_main" in cmdline:
+            pids.append(int(entry.name))
+    return sorted(pids)
+
+def wait_until_ready(base_url, process, timeout=120.0):
+    import httpx
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"serve.py exited with status {process.returncode}")
+        try:
+            if httpx.get(f"{base_url}/api/v1/search?q=love", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Server did not become ready")
+
+def measure(workers, args, env):
+    base_url = f"http://127.0.0.1:{args.port}"
+    command = [sys.executable, "serve.py", "--no-prepare", "--app", "benchmarks.offline_app:app",
+               "--host", "127.0.0.1", "--port", str(args.port), "--workers", str(workers)]
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_ready(base_url, process)
+        drive(base_url, args.clients, args.concurrency, args.warmup)
+        latencies, errors, elapsed = drive(base_url, args.clients, args.concurrency, args.seconds)
+        pids = worker_pids(process.pid) if workers > 1 else [process.pid]
+        processes = [memory_of(pid) for pid in pids]
+        processes = [usage for usage in processes if usage is not None]
+        supervisor = memory_of(process.pid) if workers > 1 else None
+    finally:
+        process.send_signal(signal.SIGINT)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    ms = np.asarray(latencies) * 1000
+    return {
+        "workers": workers,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "memory": {
+            "supervisor": supervisor,
+            "workers": processes,
+            "total_rss_mb": round(sum(usage["rss_mb"] for usage in processes), 1),
+            "total_pss_mb": round(sum(usage["pss_mb"] for usage in processes), 1),
+        },
+    }
+
+def configure_environment(tmp):
+    env = {
+        "DATA_SNAPSHOT_PATH": os.path.join(tmp, "data_snapshot.json"),
+        "VERSE_STORE_PATH": os.path.join(tmp, "verse_store"),
+        "SEARCH_INDEX_PATH": os.path.join(tmp, "search_index"),
+        "VECTOR_INDEX_DIR": os.path.join(tmp, "vector_index"),
+        "EMBEDDING_CACHE_PATH": os.path.join(tmp, "embedding_cache.sqlite3"),
+        "RETRIEVAL_BACKEND": "local",
+        "DATA_REFRESH_MODE": "off",
+        # The workers start later than the supervisor would start them; keep the snapshot fresh for the run.
+        "DATA_SNAPSHOT_FRESH_SECONDS": "86400",
+    }
+    os.environ.update(env)
+    return {**os.environ, **env}
+
+async def prepare(tmp):
+    from benchmarks.memory_db import MemoryDatabase, seed_database
+    from serve import prepare_datasets
+    db = MemoryDatabase()
+    await seed_database(db)
+    report = await prepare_datasets(db)
+    sizes = {
+        path.name: round(sum(f.stat().st_size for f in path.rglob("*") if f.is_file()) / 2**20, 2)
+        for path in Path(tmp).iterdir() if path.is_dir()
+    }
+    return report, sizes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=2, help="Load generator processes")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent requests per load process")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unmeasured seconds of load before each run")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = configure_environment(tmp)
+        report, sizes = asyncio.run(prepare(tmp))
+        levels = {}
+        for workers in sorted(args.workers):
+            levels[str(workers)] = measure(workers, args, env)
+            print(f"workers={workers}: {levels[str(workers)]['rps']} rps, "
+                  f"total PSS {levels[str(workers)]['memory']['total_pss_mb']} MiB", file=sys.stderr)
+
+    base = levels[str(min(args.workers))]["rps"]
+    for level in levels.values():
+        level["speedup"] = round(level["rps"] / base, 2) if base else 0.0
+    print(json.dumps({
+        "cpu_count": os.cpu_count(),
+        "clients": args.clients,
+        "concurrency": args.concurrency,
+        "seconds": args.seconds,
+        "datasets": report,
+        "dataset_mb": sizes,
+        "levels": levels,
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,625 @@
+"""
+In-memory stand-in for the motor database, so the whole app can run offline.
+
+It implements the subset of the motor API the backend uses, with the same
+semantics: find/find_one with equality, $exists, $in, $nin, $ne, comparison,
+$or and $and filters, inclusion or exclusion projections, sort/skip/limit;
+insert_one/insert_many, update_one, find_one_and_update, delete_one/delete_many,
+count_documents, bulk_write of InsertOne/UpdateOne/DeleteOne, create_index
+(unique indexes are enforced, and the first key of every index buckets documents
+for equality lookups); and aggregate pipelines of $vectorSearch (exact cosine,
+scored like Atlas), $match, $addFields, $project, $group, $sort, $skip and
+$limit with the expression operators the routers use. Anything else raises
+NotImplementedError, so a benchmark never quietly measures a different query
+than production runs.
+
+Every operation first awaits `latency_ms`, to stand in for the round-trip to
+Atlas.
+
+seed_database() fills this or a real database (e.g. a local mongod) with the
+JSON files in data/, synthetic bible_esv verses and commentary, and stub
+embeddings for the vector-searched collections.
+"""
+
+import asyncio
+import copy
+import json
+import math
+import operator
+from pathlib import Path
+
+import numpy as np
+from bson import ObjectId
+from pymongo import DeleteOne, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pymongo.results import BulkWriteResult, DeleteResult
+
+from ai_stubs import stub_embedding
+from benchmarks.synthetic import synthetic_bible_esv, synthetic_commentary_chunks
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+DUPLICATE_KEY = 11000
+SCORE_FIELD = "__vector_search_score"
+
+MISSING = object()
+
+def get_path(doc, path):
+    """The value at a dotted path, or MISSING."""
+    value = doc
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return MISSING
+        value = value[part]
+    return value
+
+def _compare(op, left, right):
+    if left is MISSING or left is None or right is None:
+        return False
+    try:
+        return op(left, right)
+    except TypeError:
+        return False
+
+def _equals(value, expected):
+    if value is MISSING:
+        return expected is None
+    if isinstance(value, list) and not isinstance(expected, list):
+        return expected in value
+    return value == expected
+
+FILTER_OPERATORS = {
+    "$eq": _equals,
+    "$ne": lambda value, expected: not _equals(value, expected),
+    "$in": lambda value, options: any(_equals(value, option) for option in options),
+    "$nin": lambda value, options: not any(_equals(value, option) for option in options),
+    "$exists": lambda value, wanted: (value is not MISSING) == bool(wanted),
+    "$lt": lambda value, bound: _compare(operator.lt, value, bound),
+    "$lte": lambda value, bound: _compare(operator.le, value, bound),
+    "$gt": lambda value, bound: _compare(operator.gt, value, bound),
+    "$gte": lambda value, bound: _compare(operator.ge, value, bound),
+}
+
+def matches(doc, query):
+    """True if a document satisfies a MongoDB query filter."""
+    for key, condition in (query or {}).items():
+        if key == "$or":
+            if not any(matches(doc, clause) for clause in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(doc, clause) for clause in condition):
+                return False
+        elif key.startswith("$"):
+            raise NotImplementedError(f"Query operator {key} is not supported by MemoryDatabase")
+        elif isinstance(condition, dict) and condition and all(op.startswith("$") for op in condition):
+            value = get_path(doc, key)
+            for op, argument in condition.items():
+                test = FILTER_OPERATORS.get(op)
+                if test is None:
+                    raise NotImplementedError(f"Query operator {op} is not supported by MemoryDatabase")
+                if not test(value, argument):
+                    return False
+        elif not _equals(get_path(doc, key), condition):
+            return False
+    return True
+
+def _operands(argument, doc):
+    return [evaluate(item, doc) for item in argument]
+
+EXPRESSION_OPERATORS = {
+    "$eq": lambda arg, doc: operator.eq(*_operands(arg, doc)),
+    "$ne": lambda arg, doc: operator.ne(*_operands(arg, doc)),
+    "$lt": lambda arg, doc: _compare(operator.lt, *_operands(arg, doc)),
+    "$lte": lambda arg, doc: _compare(operator.le, *_operands(arg, doc)),
+    "$gt": lambda arg, doc: _compare(operator.gt, *_operands(arg, doc)),
+    "$gte": lambda arg, doc: _compare(operator.ge, *_operands(arg, doc)),
+    "$and": lambda arg, doc: all(_operands(arg, doc)),
+    "$or": lambda arg, doc: any(_operands(arg, doc)),
+    "$add": lambda arg, doc: sum(_operands(arg, doc)),
+    "$multiply": lambda arg, doc: math.prod(_operands(arg, doc)),
+    "$switch": lambda arg, doc: next(
+        (evaluate(branch["then"], doc) for branch in arg["branches"] if evaluate(branch["case"], doc)),
+        evaluate(arg.get("default"), doc),
+    ),
+    "$cond": lambda arg, doc: evaluate(arg[1] if evaluate(arg[0], doc) else arg[2], doc),
+    "$concatArrays": lambda arg, doc: [item for part in _operands(arg, doc) for item in (part or [])],
+    "$meta": lambda arg, doc: doc.get(SCORE_FIELD) if arg == "vectorSearchScore" else None,
+}
+
+def evaluate(expression, doc):
+    """Evaluates an aggregation expression against a document."""
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = get_path(doc, expression[1:])
+        return None if value is MISSING else value
+    if isinstance(expression, list):
+        return [evaluate(item, doc) for item in expression]
+    if isinstance(expression, dict):
+        if len(expression) == 1:
+            (op, argument), = expression.items()
+            if op.startswith("$"):
+                handler = EXPRESSION_OPERATORS.get(op)
+                if handler is None:
+                    raise NotImplementedError(f"Expression operator {op} is not supported by MemoryDatabase")
+                return handler(argument, doc)
+        return {key: evaluate(value, doc) for key, value in expression.items()}
+    return expression
+
+def _is_flag(value):
+    return isinstance(value, (bool, int)) and not isinstance(value, float)
+
+def project(doc, spec):
+    """Applies a find projection or a $project stage; returns a new document."""
+    if not spec:
+        return copy.deepcopy({key: value for key, value in doc.items() if key != SCORE_FIELD})
+    fields = {key: value for key, value in spec.items() if key != "_id"}
+    if all(_is_flag(value) and not value for value in fields.values()):
+        result = {key: value for key, value in doc.items() if key not in fields and key != SCORE_FIELD}
+        if "_id" in spec and not spec["_id"]:
+            result.pop("_id", None)
+        return copy.deepcopy(result)
+    result = {}
+    if spec.get("_id", 1) and "_id" in doc:
+        result["_id"] = copy.deepcopy(doc["_id"]) if _is_flag(spec.get("_id", 1)) else evaluate(spec["_id"], doc)
+    for key, value in fields.items():
+        if _is_flag(value):
+            if not value:
+                raise NotImplementedError("Mixed inclusion and exclusion projections are not supported")
+            found = get_path(doc, key)
+            if found is not MISSING:
+                result[key] = copy.deepcopy(found)
+        else:
+            result[key] = evaluate(value, doc)
+    return result
+
+def _sort_key(value):
+    # MISSING and None sort first, as in MongoDB; other types are grouped by type name.
+    if value is MISSING or value is None:
+        return (0, "", 0)
+    if isinstance(value, (int, float)):
+        return (1, "", value)
+    return (2, type(value).__name__, value)
+
+def sort_documents(docs, keys):
+    for field, direction in reversed(keys):
+        docs.sort(key=lambda doc: _sort_key(get_path(doc, field)), reverse=direction < 0)
+    return docs
+
+def _sort_spec(key, direction=None):
+    if isinstance(key, str):
+        return [(key, direction or 1)]
+    if isinstance(key, dict):
+        return list(key.items())
+    return list(key)
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple((key, _freeze(inner)) for key, inner in value.items())
+    if isinstance(value, list):
+        return tuple(_freeze(inner) for inner in value)
+    return value
+
+ACCUMULATORS = {
+    "$sum": (lambda: 0, lambda total, value: total + (value if isinstance(value, (int, float)) else 0)),
+    "$first": (lambda: MISSING, lambda first, value: value if first is MISSING else first),
+    "$push": (list, lambda values, value: values + [value]),
+    "$max": (lambda: None, lambda best, value: value if best is None or (value is not None and value > best) else best),
+    "$min": (lambda: None, lambda best, value: value if best is None or (value is not None and value < best) else best),
+}
+
+def group_documents(docs, spec):
+    groups = {}
+    for doc in docs:
+        key = evaluate(spec["_id"], doc)
+        frozen = _freeze(key)
+        if frozen not in groups:
+            groups[frozen] = {"_id": key}
+            for field, accumulator in spec.items():
+                if field != "_id":
+                    (op, _), = accumulator.items()
+                    if op not in ACCUMULATORS:
+                        raise NotImplementedError(f"Accumulator {op} is not supported by MemoryDatabase")
+                    groups[frozen][field] = ACCUMULATORS[op][0]()
+        group = groups[frozen]
+        for field, accumulator in spec.items():
+            if field != "_id":
+                (op, expression), = accumulator.items()
+                group[field] = ACCUMULATORS[op][1](group[field], evaluate(expression, doc))
+    return list(groups.values())
+
+def apply_update(doc, update, inserting=False):
+    for op, fields in update.items():
+        if op == "$set" or (op == "$setOnInsert" and inserting):
+            for key, value in fields.items():
+                doc[key] = copy.deepcopy(value)
+        elif op == "$setOnInsert":
+            continue
+        elif op == "$unset":
+            for key in fields:
+                doc.pop(key, None)
+        elif op == "$inc":
+            for key, value in fields.items():
+                doc[key] = doc.get(key, 0) + value
+        else:
+            raise NotImplementedError(f"Update operator {op} is not supported by MemoryDatabase")
+
+class MemoryCursor:
+    """A find() or aggregate() cursor; results are computed on first use."""
+
+    def __init__(self, collection, compute):
+        self._collection = collection
+        self._compute = compute
+        self._sort = []
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key, direction=None):
+        self._sort = _sort_spec(key, direction)
+        return self
+
+    def skip(self, count):
+        self._skip = count
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    async def _results(self):
+        await self._collection.database.round_trip()
+        docs = self._compute(self._sort)
+        docs = docs[self._skip:]
+        return docs[:self._limit] if self._limit else docs
+
+    async def to_list(self, length=None):
+        docs = await self._results()
+        return docs[:length] if length else docs
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in await self._results():
+            yield doc
+
+class MemoryCollection:
+    """One collection: documents by _id, unique keys, and buckets on indexed first keys."""
+
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self._docs = {}
+        self._unique = {}
+        self._buckets = {}
+        self._vectors = {}
+        self.version = 0
+
+    def _unique_key(self, fields, doc):
+        return tuple(_freeze(get_path(doc, field)) for field in fields)
+
+    def _check_unique(self, doc, ignore_id=MISSING):
+        if doc["_id"] in self._docs and doc["_id"] != ignore_id:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: _id_", DUPLICATE_KEY)
+        for name, (fields, seen) in self._unique.items():
+            owner = seen.get(self._unique_key(fields, doc), MISSING)
+            if owner is not MISSING and owner != ignore_id:
+                raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: {name}", DUPLICATE_KEY)
+
+    def _add(self, doc):
+        self._docs[doc["_id"]] = doc
+        for fields, seen in self._unique.values():
+            seen[self._unique_key(fields, doc)] = doc["_id"]
+        for field, buckets in self._buckets.items():
+            buckets.setdefault(_freeze(get_path(doc, field)), {})[doc["_id"]] = doc
+        self.version += 1
+
+    def _remove(self, doc):
+        del self._docs[doc["_id"]]
+        for fields, seen in self._unique.values():
+            seen.pop(self._unique_key(fields, doc), None)
+        for field, buckets in self._buckets.items():
+            buckets.get(_freeze(get_path(doc, field)), {}).pop(doc["_id"], None)
+        self.version += 1
+
+    def _insert(self, doc):
+        doc = copy.deepcopy(doc)
+        doc.setdefault("_id", ObjectId())
+        self._check_unique(doc)
+        self._add(doc)
+        return doc["_id"]
+
+    def _update(self, doc, update):
+        updated = copy.deepcopy(doc)
+        apply_update(updated, update)
+        self._check_unique(updated, ignore_id=doc["_id"])
+        self._remove(doc)
+        self._add(updated)
+
+    def _upsert(self, query, update):
+        doc = {key: copy.deepcopy(value) for key, value in query.items()
+               if not key.startswith("$") and not (isinstance(value, dict) and any(op.startswith("$") for op in value))}
+        apply_update(doc, update, inserting=True)
+        return self._insert(doc)
+
+    def _candidates(self, query):
+        key = (query or {}).get("_id", MISSING)
+        if key is not MISSING and not isinstance(key, dict):
+            return [self._docs[key]] if key in self._docs else []
+        for field, buckets in self._buckets.items():
+            value = (query or {}).get(field, MISSING)
+            if value is not MISSING and not isinstance(value, (dict, list)):
+                return list(buckets.get(_freeze(value), {}).values())
+        return list(self._docs.values())
+
+    def _find(self, query, projection=None, sort=()):
+        docs = [doc for doc in self._candidates(query) if matches(doc, query)]
+        if sort:
+            docs = sort_documents(docs, list(sort))
+        return [project(doc, projection) for doc in docs]
+
+    def find(self, filter=None, projection=None):
+        return MemoryCursor(self, lambda sort: self._find(filter, projection, sort))
+
+    async def find_one(self, filter=None, projection=None):
+        await self.database.round_trip()
+        for doc in self._candidates(filter):
+            if matches(doc, filter):
+                return project(doc, projection)
+        return None
+
+    async def count_documents(self, filter=None):
+        await self.database.round_trip()
+        return sum(1 for doc in self._candidates(filter) if matches(doc, filter))
+
+    async def insert_one(self, document):
+        await self.database.round_trip()
+        document["_id"] = self._insert(document)
+        return document["_id"]
+
+    async def insert_many(self, documents, ordered=True):
+        await self.database.round_trip()
+        for document in documents:
+            document["_id"] = self._insert(document)
+
+    async def update_one(self, filter, update, upsert=False):
+        await self.database.round_trip()
+        doc = next((doc for doc in self._candidates(filter) if matches(doc, filter)), None)
+        if doc is not None:
+            self._update(doc, update)
+        elif upsert:
+            self._upsert(filter, update)
+
+    async def find_one_and_update(self, filter, update, projection=None, upsert=False, **kwargs):
+        """Returns the document as it was before the update, as motor does by default."""
+        await self.database.round_trip()
+        doc = next((doc for doc in self._candidates(filter) if matches(doc, filter)), None)
+        if doc is None:
+            if upsert:
+                self._upsert(filter, update)
+            return None
+        before = project(doc, projection)
+        self._update(doc, update)
+        return before
+
+    async def delete_one(self, filter):
+        await self.database.round_trip()
+        doc = next((doc for doc in self._candidates(filter) if matches(doc, filter)), None)
+        if doc is not None:
+            self._remove(doc)
+        return DeleteResult({"n": int(doc is not None)}, True)
+
+    async def delete_many(self, filter):
+        await self.database.round_trip()
+        docs = [doc for doc in self._candidates(filter) if matches(doc, filter)]
+        for doc in docs:
+            self._remove(doc)
+        return DeleteResult({"n": len(docs)}, True)
+
+    async def bulk_write(self, requests, ordered=True):
+        await self.database.round_trip()
+        counts = {"nInserted": 0, "nUpserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0}
+        upserted, errors = [], []
+        for index, request in enumerate(requests):
+            try:
+                if isinstance(request, InsertOne):
+                    self._insert(request._doc)
+                    counts["nInserted"] += 1
+                elif isinstance(request, UpdateOne):
+                    doc = next((doc for doc in self._candidates(request._filter) if matches(doc, request._filter)), None)
+                    if doc is not None:
+                        self._update(doc, request._doc)
+                        counts["nMatched"] += 1
+                        counts["nModified"] += 1
+                    elif request._upsert:
+                        upserted.append({"index": index, "_id": self._upsert(request._filter, request._doc)})
+                        counts["nUpserted"] += 1
+                elif isinstance(request, DeleteOne):
+                    doc = next((doc for doc in self._candidates(request._filter) if matches(doc, request._filter)), None)
+                    if doc is not None:
+                        self._remove(doc)
+                        counts["nRemoved"] += 1
+                else:
+                    raise NotImplementedError(f"{type(request).__name__} is not supported by MemoryDatabase")
+            except DuplicateKeyError as e:
+                errors.append({"index": index, "code": DUPLICATE_KEY, "errmsg": str(e), "op": request})
+                if ordered:
+                    break
+        result = {**counts, "upserted": upserted, "writeErrors": errors, "writeConcernErrors": []}
+        if errors:
+            raise BulkWriteError(result)
+        return BulkWriteResult(result, True)
+
+    async def create_index(self, keys, unique=False, name=None, **kwargs):
+        await self.database.round_trip()
+        fields = [key for key, _ in _sort_spec(keys)]
+        name = name or "_".join(f"{key}_1" for key in fields)
+        if unique and name not in self._unique:
+            seen = {}
+            for doc in self._docs.values():
+                key = self._unique_key(fields, doc)
+                if key in seen:
+                    raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: {name}", DUPLICATE_KEY)
+                seen[key] = doc["_id"]
+            self._unique[name] = (fields, seen)
+        if fields[0] not in self._buckets and fields[0] != "_id":
+            buckets = self._buckets[fields[0]] = {}
+            for doc in self._docs.values():
+                buckets.setdefault(_freeze(get_path(doc, fields[0])), {})[doc["_id"]] = doc
+        return name
+
+    def _vector_matrix(self, path):
+        cached = self._vectors.get(path)
+        if cached is not None and cached[0] == self.version:
+            return cached[1], cached[2]
+        docs = [doc for doc in self._docs.values() if isinstance(get_path(doc, path), list)]
+        matrix = np.array([get_path(doc, path) for doc in docs], dtype=np.float32).reshape(len(docs), -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1, norms)
+        self._vectors[path] = (self.version, matrix, docs)
+        return matrix, docs
+
+    def _vector_search(self, spec):
+        if spec.get("filter"):
+            raise NotImplementedError("$vectorSearch filters are not supported by MemoryDatabase")
+        matrix, docs = self._vector_matrix(spec["path"])
+        if not docs:
+            return []
+        query = np.asarray(spec["queryVector"], dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        scores = (1.0 + matrix @ query) / 2.0
+        top = np.argsort(-scores, kind="stable")[:spec["limit"]]
+        return [{**docs[i], SCORE_FIELD: float(scores[i])} for i in top]
+
+    def _aggregate(self, pipeline):
+        docs = None
+        for position, stage in enumerate(pipeline):
+            (name, spec), = stage.items()
+            if name == "$vectorSearch":
+                if position:
+                    raise ValueError("$vectorSearch must be the first stage of a pipeline")
+                docs = self._vector_search(spec)
+                continue
+            if docs is None:
+                docs = list(self._candidates(spec if name == "$match" else None))
+            if name == "$match":
+                docs = [doc for doc in docs if matches(doc, spec)]
+            elif name == "$addFields":
+                docs = [{**doc, **{key: evaluate(value, doc) for key, value in spec.items()}} for doc in docs]
+            elif name == "$project":
+                docs = [project(doc, spec) for doc in docs]
+            elif name == "$unwind":
+                path = (spec if isinstance(spec, str) else spec["path"])[1:]
+                docs = [
+                    {**doc, path: item}
+                    for doc in docs if isinstance(get_path(doc, path), list)
+                    for item in get_path(doc, path)
+                ]
+            elif name == "$group":
+                docs = group_documents(docs, spec)
+            elif name == "$sort":
+                docs = sort_documents(list(docs), list(spec.items()))
+            elif name == "$skip":
+                docs = docs[spec:]
+            elif name == "$limit":
+                docs = docs[:spec]
+            else:
+                raise NotImplementedError(f"Pipeline stage {name} is not supported by MemoryDatabase")
+        if docs is None:
+            docs = list(self._docs.values())
+        return [project(doc, None) for doc in docs]
+
+    def aggregate(self, pipeline, **kwargs):
+        return MemoryCursor(self, lambda sort: sort_documents(self._aggregate(pipeline), sort))
+
+class MemoryDatabase:
+    """A motor-like database of MemoryCollections, created on first access."""
+
+    def __init__(self, name="bible_rag_db", latency_ms=0.0):
+        self.name = name
+        self.latency = latency_ms / 1000.0
+        self._collections = {}
+        self.operations = 0
+
+    def __getitem__(self, name):
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = MemoryCollection(self, name)
+        return collection
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    async def round_trip(self):
+        self.operations += 1
+        await asyncio.sleep(self.latency)
+
+    def watch(self, *args, **kwargs):
+        # Like a standalone mongod: the data refresher falls back to polling.
+        raise NotImplementedError("Change streams are not supported by MemoryDatabase")
+
+    async def list_collection_names(self):
+        return [name for name, collection in self._collections.items() if collection._docs]
+
+class MemoryClient:
+    """Stands in for AsyncIOMotorClient: one MemoryDatabase per name, and a no-op close()."""
+
+    def __init__(self, latency_ms=0.0):
+        self.latency_ms = latency_ms
+        self._databases = {}
+
+    def __getitem__(self, name):
+        database = self._databases.get(name)
+        if database is None:
+            database = self._databases[name] = MemoryDatabase(name, self.latency_ms)
+        return database
+
+    def close(self):
+        pass
+
+def _load_json(filename):
+    with open(DATA_DIR / filename, encoding="utf-8") as f:
+        return json.load(f)
+
+def seed_documents(commentary_chunks=1300):
+    """
+    The documents of every collection the API reads: theology and books from the
+    JSON files in data/, synthetic bible_esv and commentary_chunks, and stub
+    embeddings on theology and commentary_chunks.
+    """
+    connections = _load_json("theme_connections.json")
+    theology = [
+        {
+            "id": theme["id"],
+            "concept": theme["name"],
+            "summary": theme["description"],
+            "description": theme["description"],
+            "color": theme["color"],
+            "arcColor": theme["arcColor"],
+            "connections": connections.get(theme["id"], []),
+            "embedding": stub_embedding(f"{theme['name']}: {theme['description']}"),
+        }
+        for theme in _load_json("themes.json")
+    ]
+    insights = _load_json("book_insights.json")
+    books = [{**book, **insights.get(str(book["id"]), {})} for book in _load_json("biblical_books.json")]
+    commentary = [
+        {**chunk, "book": chunk["sub_section"], "source": "Synthetic commentary", "embedding": stub_embedding(chunk["text"])}
+        for chunk in synthetic_commentary_chunks(chunks=commentary_chunks)
+    ]
+    return {
+        "theology": theology,
+        "books": books,
+        "bible_esv": synthetic_bible_esv(),
+        "commentary_chunks": commentary,
+    }
+
+async def seed_database(db, commentary_chunks=1300):
+    """Replaces the seeded collections of db (memory or motor) and returns their sizes."""
+    sizes = {}
+    for name, docs in seed_documents(commentary_chunks).items():
+        await db[name].delete_many({})
+        await db[name].insert_many(docs, ordered=False)
+        sizes[name] = len(docs)
+    for name in ("event_explanations", "verse_explanations", "explanation_leases"):
+        await db[name].delete_many({})
+    return sizes
@@ -0,0 +1,20 @@
+"""
+The API app on an empty in-memory database and the AI stubs, for benchmarks that
+serve it from real worker processes:
+
+    python serve.py --no-prepare --app benchmarks.offline_app:app
+
+Nothing is seeded: the catalog, verse store, search index and vector indexes
+must be prebuilt on disk (see serve.prepare_datasets), and the explanation
+caches start empty.
+"""
+
+import database
+from ai_stubs import install_stubs
+from benchmarks.memory_db import MemoryClient
+
+database.client = MemoryClient()
+database.db = database.client[database.MONGO_DB_NAME]
+install_stubs()
+
+from main import app
@@ -0,0 +1,64 @@
+"""
+Synthetic stand-in data for benchmarks that must run without Atlas.
+
+The generated bible_esv documents use the 66 canonical book names and
+roughly the real shape of the ESV text: 1,189 chapters and about 31,000
+verses of ~130 characters each.
+"""
+
+import random
+
+BOOK_NAMES = [
+    "Genesis", "Exodus", "Leviticus", "Numbers", "Deuteronomy", "Joshua", "Judges", "Ruth",
+    "1 Samuel", "2 Samuel", "1 Kings", "2 Kings", "1 Chronicles", "2 Chronicles", "Ezra",
+    "Nehemiah", "Esther", "Job", "Psalms", "Proverbs", "Ecclesiastes", "Song of Solomon",
+    "Isaiah", "Jeremiah", "Lamentations", "Ezekiel", "Daniel", "Hosea", "Joel", "Amos",
+    "Obadiah", "Jonah", "Micah", "Nahum", "Habakkuk", "Zephaniah", "Haggai", "Zechariah",
+    "Malachi", "Matthew", "Mark", "Luke", "John", "Acts", "Romans", "1 Corinthians",
+    "2 Corinthians", "Galatians", "Ephesians", "Philippians", "Colossians", "1 Thessalonians",
+    "2 Thessalonians", "1 Timothy", "2 Timothy", "Titus", "Philemon", "Hebrews", "James",
+    "1 Peter", "2 Peter", "1 John", "2 John", "3 John", "Jude", "Revelation",
+]
+
+WORDS = (
+    "the lord god said unto his people and they went out of the land of egypt "
+    "covenant grace faith righteousness kingdom heaven earth light darkness spirit "
+    "water bread life love mercy justice temple king prophet priest sacrifice "
+    "blessed are those who hear the word and keep it for his steadfast love endures forever"
+).split()
+
+TOTAL_CHAPTERS = 1189
+AVERAGE_VERSES_PER_CHAPTER = 26
+
+def synthetic_verse_text(rng, words=22):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+def synthetic_bible_esv(seed=7):
+    """Returns a list of bible_esv-shaped documents ({book, chapter, verse, text})."""
+    rng = random.Random(seed)
+    names = BOOK_NAMES
+    chapters_per_book = [TOTAL_CHAPTERS // len(names)] * len(names)
+    for i in range(TOTAL_CHAPTERS - sum(chapters_per_book)):
+        chapters_per_book[i] += 1
+
+    docs = []
+    for name, chapter_count in zip(names, chapters_per_book):
+        for chapter in range(1, chapter_count + 1):
+            verse_count = rng.randint(AVERAGE_VERSES_PER_CHAPTER - 14, AVERAGE_VERSES_PER_CHAPTER + 14)
+            for verse in range(1, verse_count + 1):
+                docs.append({"book": name, "chapter": chapter, "verse": verse, "text": synthetic_verse_text(rng)})
+    return docs
+
+def synthetic_commentary_chunks(seed=11, chunks=1300, words=450):
+    """Returns commentary_chunks-shaped documents ({page, section, sub_section, chapter_title, text})."""
+    rng = random.Random(seed)
+    return [
+        {
+            "page": 21 + i,
+            "section": "Old Testament" if i < chunks * 3 // 4 else "New Testament",
+            "sub_section": rng.choice(BOOK_NAMES),
+            "chapter_title": f"{i // 20 + 1}. OVERVIEW",
+            "text": " ".join(synthetic_verse_text(rng) for _ in range(words // 22)),
+        }
+        for i in range(chunks)
+    ]
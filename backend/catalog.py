@@ -0,0 +1,128 @@
+# This module precompiles the static catalog responses (themes, books, insights, connections).
+#
+# When data is loaded, every catalog response is validated once against its
+# pydantic model, serialized to bytes, gzip-compressed when that helps, and given
+# a strong ETag. Handlers then answer with the stored bytes, or with 304 when the
+# client already has the current version.
+
+import gzip
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional, Type
+
+from fastapi import Request, Response, status
+from pydantic import BaseModel, ValidationError
+
+from models import Book, BookInsight, Theme, ThemeConnection
+
+CATALOG_CACHE_CONTROL = os.getenv("CATALOG_CACHE_CONTROL", "public, max-age=300")
+GZIP_MIN_BYTES = 1024
+
+class PrecompiledResponse:
+   """A serialized JSON body with its gzip variant and strong ETags (one per encoding)."""
+
+   __slots__ = ("body", "gzip_body", "etag", "gzip_etag")
+
+   def __init__(self, payload: Any):
+       self.body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+       digest = hashlib.sha256(self.body).hexdigest()[:32]
+       self.etag = f'"{digest}"'
+       self.gzip_etag = f'"{digest}-gzip"'
+       self.gzip_body = None
+       if len(self.body) >= GZIP_MIN_BYTES:
+           compressed = gzip.compress(self.body, compresslevel=9, mtime=0)
+           if len(compressed) < len(self.body):
+               self.gzip_body = compressed
+
+def _validated(model: Type[BaseModel], item: Any, label: str) -> Optional[Dict]:
+   """Validates an item as the endpoint's response_model would, dropping unknown fields."""
+   try:
+       return model.model_validate(item).model_dump(mode="json")
+   except ValidationError as e:
+       print(f"Skipping invalid {label}: {e.error_count()} validation error(s)")
+       return None
+
+def _validated_list(model: Type[BaseModel], items: List[Any], label: str) -> List[Dict]:
+   return [doc for doc in (_validated(model, item, label) for item in items) if doc is not None]
+
+def _has_content(insight: Optional[Dict]) -> bool:
+   return bool(insight) and any(value for value in insight.values())
+
+def fallback_book_insight(book: Dict) -> Dict:
+   """Generic insight shown for books without a stored one."""
+   return {
+       "overview": f"{book.get('name')} is part of the {book.get('category')} "
+                     f"section of the {book.get('testament', '').title()} Testament.",
+       "key_scriptures": [],
+       "theological_context": f"Theological insights for {book.get('name')} would be displayed here."
+   }
+
+class Catalog:
+   """Lookup indexes and precompiled responses built from app.state.DATA."""
+
+   def __init__(self, data: Dict[str, Any]):
+       books = data.get("books", [])
+       self.books_by_id = {book.get("id"): book for book in books}
+       self.books_by_name = {str(book.get("name", "")).lower(): book for book in books}
+       self.themes_by_id = {theme.get("id"): theme for theme in data.get("themes", [])}
+
+       self.themes = PrecompiledResponse(_validated_list(Theme, data.get("themes", []), "theme"))
+       self.books = PrecompiledResponse(_validated_list(Book, books, "book"))
+
+       self.book: Dict[int, PrecompiledResponse] = {}
+       self.book_insights: Dict[int, PrecompiledResponse] = {}
+       for book_id, book in self.books_by_id.items():
+           validated = _validated(Book, book, "book")
+           if validated is not None:
+               self.book[book_id] = PrecompiledResponse(validated)
+           # Books whose stored insight is missing or empty get the generic one.
+           insight = data.get("book_insights", {}).get(str(book_id))
+           validated = _validated(BookInsight, insight, f"insight for book {book_id}") if _has_content(insight) else None
+           if validated is None:
+               validated = _validated(BookInsight, fallback_book_insight(book), f"fallback insight for book {book_id}")
+           if validated is not None:
+               self.book_insights[book_id] = PrecompiledResponse(validated)
+
+       # Insights stored for ids that are not in the books list are still served.
+       for key, insight in data.get("book_insights", {}).items():
+           if key.isdigit() and int(key) not in self.book_insights and _has_content(insight):
+               validated = _validated(BookInsight, insight, f"insight for book {key}")
+               if validated is not None:
+                   self.book_insights[int(key)] = PrecompiledResponse(validated)
+
+       self.theme_connections: Dict[str, PrecompiledResponse] = {
+           theme_id: PrecompiledResponse(_validated_list(ThemeConnection, connections, f"connection of {theme_id}"))
+           for theme_id, connections in data.get("theme_connections", {}).items()
+           if connections is not None
+       }
+
+   def book_by_name(self, name: str) -> Optional[Dict]:
+       return self.books_by_name.get(name.lower())
+
+def build_catalog(data: Dict[str, Any]) -> Catalog:
+   return Catalog(data)
+
+def _etag_matches(if_none_match: str, compiled: PrecompiledResponse) -> bool:
+   # Either encoding's tag identifies the same content, so both count as a match.
+   for candidate in if_none_match.split(","):
+       candidate = candidate.strip().removeprefix("W/")
+       if candidate in ("*", compiled.etag, compiled.gzip_etag):
+           return True
+   return False
+
+def catalog_response(request: Request, compiled: PrecompiledResponse) -> Response:
+   """Serves a precompiled response, honouring If-None-Match and Accept-Encoding."""
+   use_gzip = compiled.gzip_body is not None and "gzip" in request.headers.get("accept-encoding", "")
+   headers = {
+       "ETag": compiled.gzip_etag if use_gzip else compiled.etag,
+       "Cache-Control": CATALOG_CACHE_CONTROL,
+       "Vary": "Accept-Encoding",
+   }
+   if_none_match = request.headers.get("if-none-match")
+   if if_none_match and _etag_matches(if_none_match, compiled):
+       return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+   if use_gzip:
+       headers["Content-Encoding"] = "gzip"
+       return Response(content=compiled.gzip_body, media_type="application/json", headers=headers)
+   return Response(content=compiled.body, media_type="application/json", headers=headers)
@@ -1,8 +1,16 @@
 # This module is responsible for loading data from the database and fallback JSON files.
 
+import asyncio
+import hashlib
 import json
+import time
+from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, List, Tuple
+
+from catalog import build_catalog
+from metrics import span
+from theme_matrix import build_theme_matrix
 
 DATA_DIR = Path(__file__).parent / "data"
 
@@ -19,81 +27,110 @@ def load_json_file(filename: str) -> Any:
        print(f"Error decoding {filename}: {e}")
        return None
 
-async def load_themes_from_db(db):
-   """Loads themes from the 'theology' collection in MongoDB."""
-   collection = db["theology"]
-   themes_list = []
-   for doc in collection.find({}, {"_id": 0}):
-       themes_list.append({
-           "id": doc.get("id"),
-           "name": doc.get("concept"),
-           "description": doc.get("description"),
-           "color": doc.get("color"),
-           "arcColor": doc.get("arcColor")
-       })
-   return themes_list
-
-async def load_books_from_db(db):
-   """Loads books from the 'books' collection in MongoDB, ordered by 'id'."""
-   collection = db["books"]
-   books_list = []
-   for book in collection.find({}, {"_id": 0}).sort("id", 1):
+DATA_KEYS = ("themes", "books", "book_insights", "theme_connections")
+THEOLOGY_FIELDS = {"_id": 0, "id": 1, "concept": 1, "description": 1, "color": 1, "arcColor": 1, "connections": 1}
+
+def theme_from_doc(doc: Dict) -> Dict:
+   return {
+       "id": doc.get("id"),
+       "name": doc.get("concept"),
+       "description": doc.get("description"),
+       "color": doc.get("color"),
+       "arcColor": doc.get("arcColor")
+   }
+
+def insight_from_doc(doc: Dict) -> Dict:
+   return {
+       "overview": doc.get("overview"),
+       "key_scriptures": doc.get("key_scriptures"),
+       "theological_context": doc.get("theological_context")
+   }
+
+async def load_theology_from_db(db) -> Tuple[List[Dict], Dict[str, List]]:
+   """Loads themes and theme connections in a single pass over the 'theology' collection."""
+   themes_list, connections_map = [], {}
+   async for doc in db["theology"].find({}, THEOLOGY_FIELDS):
+       themes_list.append(theme_from_doc(doc))
+       if doc.get("id") and "connections" in doc:
+           connections_map[doc["id"]] = doc["connections"]
+   return themes_list, connections_map
+
+async def load_books_and_insights_from_db(db) -> Tuple[List[Dict], Dict[str, Dict]]:
+   """Loads books (ordered by 'id') and book insights in a single pass over the 'books' collection."""
+   books_list, insights = [], {}
+   async for book in db["books"].find({}, {"_id": 0}).sort("id", 1):
+       if book.get("id"):
+           insights[str(book.get("id"))] = insight_from_doc(book)
        book["testament"] = book.get("testament", "").lower()
        books_list.append(book)
-   return books_list
-
-async def load_book_insights_from_db(db):
-   """Loads book insights from the 'books' collection in MongoDB."""
-   collection = db["books"]
-   insights = {}
-   for doc in collection.find({}, {"_id": 0}):
-       if doc.get("id"):
-           insights[str(doc.get("id"))] = {
-               "overview": doc.get("overview"),
-               "key_scriptures": doc.get("key_scriptures"),
-               "theological_context": doc.get("theological_context")
-           }
-   return insights
-
-async def load_theme_connections_from_db(db):
-   """Loads theme connections from the 'theology' collection in MongoDB."""
-   collection = db["theology"]
-   connections_map = {}
-   for doc in collection.find({"id": {"$exists": True}, "connections": {"$exists": True}}, {"_id": 0, "id": 1, "connections": 1}):
-       theme_id = doc["id"]
-       connections_list = doc["connections"]
-       connections_map[theme_id] = connections_list
-   return connections_map
+   return books_list, insights
+
+def data_version(data: Dict[str, Any]) -> str:
+   """Content hash of the loaded data, used to tell snapshots and reloads apart."""
+   payload = json.dumps([data.get(key) for key in DATA_KEYS], sort_keys=True, default=str)
+   return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+def finalize_data(data: Dict[str, Any], sources: Dict[str, str], load_ms: float) -> Dict[str, Any]:
+   """Adds derived structures and load metadata to freshly loaded data."""
+   # Lookup indexes, precompiled catalog responses and the theme matrix, rebuilt whenever data is loaded.
+   data["catalog"] = build_catalog(data)
+   data["theme_matrix"] = build_theme_matrix(data)
+   data["meta"] = {
+       "version": data_version(data),
+       "sources": sources,
+       "loaded_at": datetime.utcnow().isoformat(),
+       "load_ms": round(load_ms, 2),
+   }
+   return data
+
+def loaded_from_db(data: Dict[str, Any]) -> bool:
+   """True if every part of the data came from MongoDB rather than a fallback."""
+   return all(source == "db" for source in data.get("meta", {}).get("sources", {}).values())
 
 async def load_all_data(db) -> Dict[str, Any]:
-   """Load all data from various sources with fallbacks to JSON."""
-   data = {}
-   try:
-       data["themes"] = await load_themes_from_db(db)
-       if not data["themes"]: raise ValueError("No themes found in database.")
-   except Exception as e:
-       print(f"Error loading themes from database: {e}. Falling back to JSON.")
+   """
+   Load all data with one concurrent pass over 'theology' and one over 'books',
+   with fallbacks to JSON.
+   """
+   start = time.perf_counter()
+   with span("data.load_db"):
+       theology, books = await asyncio.gather(
+           load_theology_from_db(db), load_books_and_insights_from_db(db), return_exceptions=True
+       )
+   if isinstance(theology, Exception):
+       print(f"Error loading theology from database: {theology}")
+       theology = ([], {})
+   if isinstance(books, Exception):
+       print(f"Error loading books from database: {books}")
+       books = ([], {})
+
+   data = {
+       "themes": theology[0],
+       "theme_connections": theology[1],
+       "books": books[0],
+       "book_insights": books[1],
+   }
+   sources = {key: "db" for key in DATA_KEYS}
+
+   if not data["themes"]:
+       print("No themes found in database. Falling back to JSON.")
        data["themes"] = load_json_file("themes.json") or []
+       sources["themes"] = "json"
 
-   try:
-       data["book_insights"] = await load_book_insights_from_db(db)
-       if not data["book_insights"]: raise ValueError("No book insights found in database.")
-   except Exception as e:
-       print(f"Error loading book insights from database: {e}. Falling back to JSON.")
+   if not data["book_insights"]:
+       print("No book insights found in database. Falling back to JSON.")
        data["book_insights"] = load_json_file("book_insights.json") or {}
+       sources["book_insights"] = "json"
 
-   try:
-       data["books"] = await load_books_from_db(db)
-       if not data["books"]: raise ValueError("No books found in database.")
-   except Exception as e:
-       print(f"Error loading books from database: {e}. No JSON fallback available.")
-       data["books"] = []
+   if not data["books"]:
+       print("No books found in database. No JSON fallback available.")
+       sources["books"] = "none"
 
-   try:
-       data["theme_connections"] = await load_theme_connections_from_db(db)
-       if not data["theme_connections"]: raise ValueError("No theme connections found in database.")
-   except Exception as e:
-       print(f"Error loading theme connections from database: {e}. Falling back to JSON.")
+   if not data["theme_connections"]:
+       print("No theme connections found in database. Falling back to JSON.")
        data["theme_connections"] = load_json_file("theme_connections.json") or {}
+       sources["theme_connections"] = "json"
 
-   return data
\ No newline at end of file
+   # Building the catalog is CPU-bound (validation, serialization, gzip); keep it off the event loop.
+   with span("data.finalize"):
+       return await asyncio.to_thread(finalize_data, data, sources, (time.perf_counter() - start) * 1000)
@@ -0,0 +1,160 @@
+# This module reloads app.state.DATA from MongoDB while the API keeps serving.
+#
+# A reload builds a complete new data dict (catalog included) off the request
+# path, diffs it against the live one and, if anything changed, swaps it in with
+# a single assignment, so a request sees either the old data or the new data and
+# never a half-built mix. Reloads are triggered by polling on an interval, by
+# change streams on 'theology' and 'books' when MongoDB is a replica set, or on
+# demand through the admin endpoint.
+
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from data_loader import DATA_KEYS, load_all_data, loaded_from_db
+from data_snapshot import SNAPSHOT_ENABLED, write_snapshot
+
+DATA_REFRESH_MODE = os.getenv("DATA_REFRESH_MODE", "auto")  # auto, change_stream, poll or off
+DATA_REFRESH_INTERVAL_SECONDS = float(os.getenv("DATA_REFRESH_INTERVAL_SECONDS", "300"))
+DATA_REFRESH_DEBOUNCE_SECONDS = float(os.getenv("DATA_REFRESH_DEBOUNCE_SECONDS", "1"))
+WATCHED_COLLECTIONS = ["theology", "books"]
+
+def _keyed(key: str, value: Any) -> Dict[str, Any]:
+   """Maps a DATA entry to {id: item} so two versions can be compared item by item."""
+   if key in ("themes", "books"):
+       return {str(item.get("id")): item for item in value or []}
+   return {str(k): v for k, v in (value or {}).items()}
+
+def diff_data(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Dict[str, List[str]]]:
+   """Ids added, removed and changed in each part of the data."""
+   diff = {}
+   for key in DATA_KEYS:
+       before, after = _keyed(key, old.get(key)), _keyed(key, new.get(key))
+       changes = {
+           "added": sorted(set(after) - set(before)),
+           "removed": sorted(set(before) - set(after)),
+           "changed": sorted(k for k in set(before) & set(after) if before[k] != after[k]),
+       }
+       if any(changes.values()):
+           diff[key] = changes
+   return diff
+
+class DataRefresher:
+   """Reloads and atomically swaps app.state.DATA; one reload runs at a time."""
+
+   def __init__(self, app, db, mode: str = DATA_REFRESH_MODE,
+                interval_seconds: float = DATA_REFRESH_INTERVAL_SECONDS):
+       self.app = app
+       self.db = db
+       self.mode = mode
+       self.interval = interval_seconds
+       self._lock = asyncio.Lock()
+       self._task: Optional[asyncio.Task] = None
+       self.active_mode = "off"
+       self.reloads = 0
+       self.swaps = 0
+       self.failures = 0
+       self.last_result: Optional[Dict[str, Any]] = None
+
+   async def reload(self, reason: str = "manual") -> Dict[str, Any]:
+       """Loads fresh data and swaps it in if it differs; returns a report."""
+       async with self._lock:
+           self.reloads += 1
+           start = time.perf_counter()
+           live = self.app.state.DATA
+           report = {
+               "reason": reason,
+               "previous_version": live["meta"]["version"],
+               "swapped": False,
+               "started_at": datetime.utcnow().isoformat(),
+           }
+           try:
+               data = await load_all_data(self.db)
+           except Exception as e:
+               self.failures += 1
+               report.update({"error": str(e), "version": live["meta"]["version"]})
+               self.last_result = report
+               print(f"Error reloading data ({reason}): {e}")
+               return report
+
+           report["version"] = data["meta"]["version"]
+           report["sources"] = data["meta"]["sources"]
+           if not loaded_from_db(data):
+               # Never replace data with JSON fallbacks because of a transient database problem.
+               self.failures += 1
+               report["version"] = live["meta"]["version"]
+               report["error"] = "Database load incomplete; keeping current data"
+           else:
+               from_snapshot = any(source == "snapshot" for source in live["meta"]["sources"].values())
+               changed = data["meta"]["version"] != live["meta"]["version"]
+               if changed or from_snapshot:
+                   report["diff"] = diff_data(live, data) if changed else {}
+                   self.app.state.DATA = data
+                   self.swaps += 1
+                   report["swapped"] = True
+                   if SNAPSHOT_ENABLED and changed:
+                       await asyncio.to_thread(write_snapshot, data)
+           report["load_ms"] = round((time.perf_counter() - start) * 1000, 2)
+           self.last_result = report
+           if report["swapped"]:
+               print(f"Data reloaded ({reason}): {report['previous_version']} -> {report['version']}")
+           return report
+
+   def start(self, reload_now: bool = False) -> None:
+       """Starts the background refresh loop for the configured mode."""
+       if self.mode == "off" and not reload_now:
+           return
+       self._task = asyncio.create_task(self._run(reload_now))
+
+   async def _run(self, reload_now: bool) -> None:
+       if reload_now:
+           await self.reload("startup")
+       if self.mode in ("auto", "change_stream"):
+           try:
+               await self._watch()
+               return
+           except asyncio.CancelledError:
+               raise
+           except Exception as e:
+               # Change streams need a replica set; standalone servers fall back to polling.
+               print(f"Change streams unavailable ({e}); polling for data changes instead.")
+       if self.mode != "off" and self.interval > 0:
+           await self._poll()
+
+   async def _poll(self) -> None:
+       self.active_mode = "poll"
+       while True:
+           await asyncio.sleep(self.interval)
+           await self.reload("poll")
+
+   async def _watch(self) -> None:
+       pipeline = [{"$match": {"ns.coll": {"$in": WATCHED_COLLECTIONS}}}]
+       async with self.db.watch(pipeline) as stream:
+           self.active_mode = "change_stream"
+           async for _ in stream:
+               # Let a burst of edits settle, then reload once for all of them.
+               await asyncio.sleep(DATA_REFRESH_DEBOUNCE_SECONDS)
+               while stream.alive and await stream.try_next() is not None:
+                   pass
+               await self.reload("change_stream")
+
+   def stats(self) -> Dict[str, Any]:
+       return {
+           "mode": self.active_mode,
+           "version": self.app.state.DATA["meta"]["version"],
+           "reloads": self.reloads,
+           "swaps": self.swaps,
+           "failures": self.failures,
+           "last_result": self.last_result,
+       }
+
+   async def close(self) -> None:
+       if self._task is not None:
+           self._task.cancel()
+           try:
+               await self._task
+           except (asyncio.CancelledError, Exception):
+               pass
+           self._task = None
@@ -0,0 +1,103 @@
+# This module saves and restores a versioned local snapshot of the catalog data.
+#
+# Booting from the snapshot fills app.state.DATA in milliseconds instead of
+# waiting on MongoDB; the data refresher then reloads it from the database and
+# rewrites the snapshot. The snapshot is written after every complete load from
+# MongoDB, or on demand with `python data_snapshot.py`. A snapshot younger than
+# DATA_SNAPSHOT_FRESH_SECONDS is served without that startup reload, which lets
+# the workers started by serve.py boot from the snapshot the supervisor has just
+# written instead of each loading the same data from MongoDB again.
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from data_loader import DATA_KEYS, finalize_data, load_all_data, loaded_from_db
+
+SNAPSHOT_SCHEMA_VERSION = 1
+SNAPSHOT_PATH = os.getenv("DATA_SNAPSHOT_PATH", str(Path(__file__).parent / "data" / "data_snapshot.json"))
+SNAPSHOT_ENABLED = os.getenv("DATA_SNAPSHOT_ENABLED", "true").lower() == "true"
+SNAPSHOT_FRESH_SECONDS = float(os.getenv("DATA_SNAPSHOT_FRESH_SECONDS", "0"))
+
+def write_snapshot(data: Dict[str, Any], path: str = SNAPSHOT_PATH) -> None:
+   """Atomically writes the loaded data to a snapshot file."""
+   payload = {
+       "schema_version": SNAPSHOT_SCHEMA_VERSION,
+       "version": data.get("meta", {}).get("version"),
+       "created_at": datetime.utcnow().isoformat(),
+       "data": {key: data[key] for key in DATA_KEYS},
+   }
+   target = Path(path)
+   target.parent.mkdir(parents=True, exist_ok=True)
+   # Per-process temporary name: several workers may rewrite the snapshot at once.
+   tmp = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+   with open(tmp, "w", encoding="utf-8") as f:
+       json.dump(payload, f, ensure_ascii=False, separators=(",", ":"), default=str)
+   os.replace(tmp, target)
+
+def read_snapshot(path: str = SNAPSHOT_PATH) -> Optional[Dict[str, Any]]:
+   """Returns data loaded from the snapshot, or None if it is missing, outdated or unreadable."""
+   start = time.perf_counter()
+   try:
+       with open(path, "r", encoding="utf-8") as f:
+           payload = json.load(f)
+   except FileNotFoundError:
+       return None
+   except (OSError, json.JSONDecodeError) as e:
+       print(f"Error reading data snapshot {path}: {e}")
+       return None
+
+   if payload.get("schema_version") != SNAPSHOT_SCHEMA_VERSION:
+       print(f"Ignoring data snapshot {path}: schema version {payload.get('schema_version')}")
+       return None
+
+   data = {key: payload["data"].get(key) or ([] if key in ("themes", "books") else {}) for key in DATA_KEYS}
+   data = finalize_data(data, {key: "snapshot" for key in DATA_KEYS}, (time.perf_counter() - start) * 1000)
+   data["meta"]["snapshot_created_at"] = payload.get("created_at")
+   return data
+
+def is_fresh_snapshot(data: Dict[str, Any]) -> bool:
+   """True if data was booted from a snapshot written less than DATA_SNAPSHOT_FRESH_SECONDS ago."""
+   created_at = data.get("meta", {}).get("snapshot_created_at")
+   if SNAPSHOT_FRESH_SECONDS <= 0 or not created_at:
+       return False
+   try:
+       age = (datetime.utcnow() - datetime.fromisoformat(created_at)).total_seconds()
+   except ValueError:
+       return False
+   return age < SNAPSHOT_FRESH_SECONDS
+
+async def load_initial_data(db) -> Dict[str, Any]:
+   """Boots from the snapshot when available, otherwise loads from MongoDB and writes one."""
+   if SNAPSHOT_ENABLED:
+       data = read_snapshot()
+       if data is not None:
+           return data
+   data = await load_all_data(db)
+   if SNAPSHOT_ENABLED and loaded_from_db(data):
+       await asyncio.to_thread(write_snapshot, data)
+   return data
+
+async def _snapshot_cli(out: str) -> None:
+   from database import connect_db, close_db_connection
+   db = await connect_db()
+   try:
+       data = await load_all_data(db)
+   finally:
+       close_db_connection()
+   if not loaded_from_db(data):
+       print(f"Refusing to write a snapshot from fallback data (sources: {data['meta']['sources']})")
+       return
+   write_snapshot(data, out)
+   print(f"Wrote data snapshot {data['meta']['version']} to {out}")
+
+if __name__ == "__main__":
+   parser = argparse.ArgumentParser(description="Write a local snapshot of the catalog data from MongoDB.")
+   parser.add_argument("--out", default=SNAPSHOT_PATH, help="Snapshot file")
+   args = parser.parse_args()
+   asyncio.run(_snapshot_cli(args.out))
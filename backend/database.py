@@ -1,28 +1,87 @@
 import os
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
 
 load_dotenv()
 MONGO_DB_URI = os.getenv("MONGO_DB_URI")
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "bible_rag_db")
+
+# Connection pool sizing and timeouts. A single async client is shared by every
+# request handled by this process, so the pool bounds concurrent Atlas round-trips.
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "5"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "60000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "20000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))
 
 client = None
 db = None
 
+def create_client(uri: str = None) -> AsyncIOMotorClient:
+   """
+   Creates an async MongoDB client with the configured pool sizing and timeouts.
+   """
+   return AsyncIOMotorClient(
+       uri or MONGO_DB_URI,
+       maxPoolSize=MONGO_MAX_POOL_SIZE,
+       minPoolSize=MONGO_MIN_POOL_SIZE,
+       maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+       connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+       serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+       socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+       waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+   )
+
+async def connect_db():
+   """
+   Opens the async MongoDB connection. Called once from the application lifespan.
+   """
+   global client, db
+   if client is None:
+       client = create_client()
+       db = client[MONGO_DB_NAME]
+       try:
+           await client.admin.command("ping")
+       except Exception as e:
+           print(f"Warning: MongoDB ping failed during startup: {e}")
+   return db
+
 def get_db():
    """
-   Initializes and returns the MongoDB database connection.
+   Returns the async MongoDB database, creating the client lazily if needed.
    """
    global client, db
    if client is None:
-       client = MongoClient(MONGO_DB_URI)
-       db = client["bible_rag_db"]
+       client = create_client()
+       db = client[MONGO_DB_NAME]
    return db
 
 def close_db_connection():
    """
    Closes the MongoDB connection if it's open.
    """
-   global client
+   global client, db
    if client:
        client.close()
-       client = None
\ No newline at end of file
+       client = None
+       db = None
+
+INDEXES = [
+   ("event_explanations", [("book", 1), ("verse", 1), ("theme", 1)], {"unique": True, "name": "event_key"}),
+   ("verse_explanations", [("book", 1), ("chapter", 1), ("verse", 1)], {"unique": True, "name": "verse_key"}),
+   ("bible_esv", [("book", 1), ("chapter", 1), ("verse", 1)], {"name": "book_chapter_verse"}),
+   ("explanation_leases", [("expires_at", 1)], {"expireAfterSeconds": 0, "name": "lease_ttl"}),
+]
+
+async def ensure_indexes(db):
+   """
+   Creates the indexes the API relies on. Failures (e.g. existing duplicates that
+   block a unique index) are logged so startup can continue.
+   """
+   for collection_name, keys, options in INDEXES:
+       try:
+           await db[collection_name].create_index(keys, **options)
+       except Exception as e:
+           print(f"Error creating index {options.get('name')} on {collection_name}: {e}")
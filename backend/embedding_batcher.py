@@ -0,0 +1,146 @@
+# This module coalesces concurrent single-text embedding requests into batched API calls.
+#
+# Callers await `embed(text)`. A background task collects queued texts until the
+# batch is full or the oldest one has waited `max_wait_ms`, sends them as one
+# request through the synchronous `embed_fn` in a worker thread, and resolves
+# each caller's future with its own vector.
+
+import asyncio
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32"))
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5"))
+EMBEDDING_BATCH_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_BATCH_MAX_CONCURRENCY", "4"))
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 100)
+
+class EmbeddingBatcher:
+   """Micro-batching front end for a batch embedding function."""
+
+   def __init__(self, embed_fn: Callable[[List[str]], List[List[float]]],
+                max_batch_size: int = EMBEDDING_BATCH_MAX_SIZE,
+                max_wait_ms: float = EMBEDDING_BATCH_MAX_WAIT_MS,
+                max_concurrent_batches: int = EMBEDDING_BATCH_MAX_CONCURRENCY):
+       self.embed_fn = embed_fn
+       self.max_batch_size = max(1, max_batch_size)
+       self.max_wait = max_wait_ms / 1000.0
+       self.max_concurrent_batches = max(1, max_concurrent_batches)
+       self._queue: Optional[asyncio.Queue] = None
+       self._worker: Optional[asyncio.Task] = None
+       self._slots: Optional[asyncio.Semaphore] = None
+       self._in_flight = set()
+       self._loop = None
+       self.batches = 0
+       self.items = 0
+       self.failed_batches = 0
+       self.max_observed_batch = 0
+       self.batch_size_counts = {str(bucket): 0 for bucket in BATCH_SIZE_BUCKETS}
+       self.batch_size_counts["+Inf"] = 0
+
+   def _ensure_worker(self) -> None:
+       loop = asyncio.get_running_loop()
+       if self._worker is None or self._worker.done() or self._loop is not loop:
+           self._loop = loop
+           self._queue = asyncio.Queue()
+           self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+           self._worker = loop.create_task(self._run())
+
+   async def embed(self, text: str) -> List[float]:
+       """Embeds one text, sharing an API call with other concurrent callers."""
+       self._ensure_worker()
+       future = self._loop.create_future()
+       await self._queue.put((text, future))
+       return await future
+
+   async def embed_many(self, texts: List[str]) -> List[List[float]]:
+       """Embeds many texts (e.g. during ingestion) in full-size batches."""
+       return list(await asyncio.gather(*(self.embed(text) for text in texts)))
+
+   async def _collect(self) -> List[Tuple[str, asyncio.Future]]:
+       batch = [await self._queue.get()]
+       deadline = time.monotonic() + self.max_wait
+       while len(batch) < self.max_batch_size:
+           remaining = deadline - time.monotonic()
+           if remaining <= 0:
+               break
+           try:
+               batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+           except asyncio.TimeoutError:
+               break
+       # Take anything that is already waiting without extending the deadline.
+       while len(batch) < self.max_batch_size and not self._queue.empty():
+           batch.append(self._queue.get_nowait())
+       return batch
+
+   async def _run(self) -> None:
+       while True:
+           batch = await self._collect()
+           try:
+               await self._slots.acquire()
+           except asyncio.CancelledError:
+               for _, future in batch:
+                   if not future.done():
+                       future.set_exception(RuntimeError("Embedding batcher closed"))
+               raise
+           task = asyncio.create_task(self._dispatch(batch))
+           self._in_flight.add(task)
+           task.add_done_callback(self._in_flight.discard)
+
+   async def _dispatch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+       try:
+           texts = [text for text, _ in batch]
+           self._record(len(texts))
+           try:
+               vectors = await asyncio.to_thread(self.embed_fn, texts)
+               if len(vectors) != len(texts):
+                   raise ValueError(f"Embedding batch returned {len(vectors)} vectors for {len(texts)} texts")
+           except Exception as e:
+               self.failed_batches += 1
+               for _, future in batch:
+                   if not future.done():
+                       future.set_exception(e)
+               return
+           for (_, future), vector in zip(batch, vectors):
+               if not future.done():
+                   future.set_result(vector)
+       finally:
+           self._slots.release()
+
+   def _record(self, size: int) -> None:
+       self.batches += 1
+       self.items += size
+       self.max_observed_batch = max(self.max_observed_batch, size)
+       label = next((str(bucket) for bucket in BATCH_SIZE_BUCKETS if size <= bucket), "+Inf")
+       self.batch_size_counts[label] += 1
+
+   def stats(self) -> Dict:
+       """Returns batch counters and a histogram of batch sizes (bucket upper bounds)."""
+       return {
+           "batches": self.batches,
+           "items": self.items,
+           "failed_batches": self.failed_batches,
+           "average_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+           "max_batch_size_seen": self.max_observed_batch,
+           "batch_size_histogram": dict(self.batch_size_counts),
+           "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+           "max_batch_size": self.max_batch_size,
+           "max_wait_ms": self.max_wait * 1000.0,
+       }
+
+   async def close(self) -> None:
+       """Stops the background worker and waits for in-flight batches."""
+       if self._worker is not None:
+           self._worker.cancel()
+           try:
+               await self._worker
+           except (asyncio.CancelledError, Exception):
+               pass
+           self._worker = None
+       while self._queue is not None and not self._queue.empty():
+           _, future = self._queue.get_nowait()
+           if not future.done():
+               future.set_exception(RuntimeError("Embedding batcher closed"))
+       if self._in_flight:
+           await asyncio.gather(*self._in_flight, return_exceptions=True)
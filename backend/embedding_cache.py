@@ -0,0 +1,116 @@
+# This module provides a two-tier cache for text embeddings.
+#
+# Tier one is an in-process LRU. Tier two is a SQLite file keyed by the model name
+# and a SHA-256 of the text, so embeddings survive restarts. Disk access runs in
+# a worker thread to keep the event loop free.
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", str(Path(__file__).parent / "data" / "embedding_cache.sqlite3"))
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+
+def cache_key(model: str, text: str) -> str:
+   """Returns the cache key for an embedding: the model name plus a hash of the text."""
+   return f"{model}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+class EmbeddingCache:
+   """In-process LRU in front of a persistent SQLite store of float32 vectors."""
+
+   def __init__(self, path: Optional[str] = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_SIZE):
+       self.path = path
+       self.max_entries = max_entries
+       self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+       self._conn = None
+       self._lock = threading.Lock()
+       self.memory_hits = 0
+       self.disk_hits = 0
+       self.misses = 0
+
+   def _connection(self) -> sqlite3.Connection:
+       if self._conn is None:
+           Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+           self._conn = sqlite3.connect(self.path, check_same_thread=False)
+           self._conn.execute("PRAGMA journal_mode=WAL")
+           self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+       return self._conn
+
+   def _remember(self, key: str, embedding: List[float]) -> None:
+       self._memory[key] = embedding
+       self._memory.move_to_end(key)
+       while len(self._memory) > self.max_entries:
+           self._memory.popitem(last=False)
+
+   def _read_disk(self, key: str) -> Optional[List[float]]:
+       with self._lock:
+           row = self._connection().execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+       if row is None:
+           return None
+       return array("f", row[0]).tolist()
+
+   def _write_disk(self, key: str, embedding: List[float]) -> None:
+       with self._lock:
+           conn = self._connection()
+           conn.execute("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", (key, array("f", embedding).tobytes()))
+           conn.commit()
+
+   async def get(self, model: str, text: str) -> Optional[List[float]]:
+       """Returns a cached embedding from memory or disk, or None on a miss."""
+       key = cache_key(model, text)
+       embedding = self._memory.get(key)
+       if embedding is not None:
+           self._memory.move_to_end(key)
+           self.memory_hits += 1
+           return embedding
+
+       if self.path:
+           try:
+               embedding = await asyncio.to_thread(self._read_disk, key)
+           except Exception as e:
+               print(f"Error reading embedding cache: {e}")
+               embedding = None
+           if embedding is not None:
+               self._remember(key, embedding)
+               self.disk_hits += 1
+               return embedding
+
+       self.misses += 1
+       return None
+
+   async def put(self, model: str, text: str, embedding: List[float]) -> None:
+       """Stores an embedding in memory and on disk."""
+       key = cache_key(model, text)
+       self._remember(key, embedding)
+       if self.path:
+           try:
+               await asyncio.to_thread(self._write_disk, key, embedding)
+           except Exception as e:
+               print(f"Error writing embedding cache: {e}")
+
+   def stats(self) -> Dict[str, int]:
+       """Returns hit/miss counters and the current LRU size."""
+       return {
+           "memory_hits": self.memory_hits,
+           "disk_hits": self.disk_hits,
+           "misses": self.misses,
+           "memory_entries": len(self._memory),
+           "max_memory_entries": self.max_entries,
+       }
+
+   def close(self) -> None:
+       """Closes the SQLite connection."""
+       with self._lock:
+           if self._conn is not None:
+               self._conn.close()
+               self._conn = None
+
+embedding_cache = EmbeddingCache(EMBEDDING_CACHE_PATH if EMBEDDING_CACHE_ENABLED else None,
+                                 EMBEDDING_CACHE_SIZE if EMBEDDING_CACHE_ENABLED else 0)
@@ -0,0 +1,241 @@
+# This module provides a two-tier cache for generated explanations.
+#
+# Tier one is a bounded in-process LRU whose entries expire after a TTL. Tier two
+# is the MongoDB collection (event_explanations / verse_explanations, with unique
+# compound indexes on their keys). New explanations are written to memory at once
+# and to MongoDB by a write-behind task that batches them into one bulk_write.
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+EXPLANATION_CACHE_SIZE = int(os.getenv("EXPLANATION_CACHE_SIZE", "2048"))
+EXPLANATION_CACHE_TTL_SECONDS = float(os.getenv("EXPLANATION_CACHE_TTL_SECONDS", "3600"))
+EXPLANATION_WRITE_BATCH_SIZE = int(os.getenv("EXPLANATION_WRITE_BATCH_SIZE", "100"))
+EXPLANATION_WRITE_MAX_DELAY_MS = float(os.getenv("EXPLANATION_WRITE_MAX_DELAY_MS", "50"))
+
+DUPLICATE_KEY = 11000
+
+# Stored event explanations carry their query embedding for the semantic cache; responses never do.
+EXPLANATION_PROJECTION = {"_id": 0, "query_embedding": 0}
+
+class ExplanationCache:
+   """LRU/TTL memory tier over one explanations collection, with write-behind persistence."""
+
+   def __init__(self, collection_name: str, key_fields: Tuple[str, ...],
+                max_entries: int = EXPLANATION_CACHE_SIZE, ttl_seconds: float = EXPLANATION_CACHE_TTL_SECONDS):
+       self.collection_name = collection_name
+       self.key_fields = key_fields
+       self.max_entries = max_entries
+       self.ttl = ttl_seconds
+       self._memory: "OrderedDict[Tuple, Tuple[float, Dict]]" = OrderedDict()
+       self._db = None
+       self._queue: Optional[asyncio.Queue] = None
+       self._worker: Optional[asyncio.Task] = None
+       self._flushing: Optional[asyncio.Future] = None
+       self._unflushed: List[Tuple[Tuple, Dict, asyncio.Future]] = []
+       self._loop = None
+       self.memory_hits = 0
+       self.db_hits = 0
+       self.misses = 0
+       self.evictions = 0
+       self.expirations = 0
+       self.writes_queued = 0
+       self.writes_flushed = 0
+       self.flushes = 0
+       self.write_errors = 0
+
+   def query(self, key: Tuple) -> Dict:
+       """The MongoDB filter for a key."""
+       return dict(zip(self.key_fields, key))
+
+   def _recall(self, key: Tuple) -> Optional[Dict]:
+       entry = self._memory.get(key)
+       if entry is None:
+           return None
+       expires, doc = entry
+       if expires < time.monotonic():
+           del self._memory[key]
+           self.expirations += 1
+           return None
+       self._memory.move_to_end(key)
+       return doc
+
+   def _remember(self, key: Tuple, doc: Dict) -> None:
+       if self.max_entries <= 0:
+           return
+       self._memory[key] = (time.monotonic() + self.ttl, doc)
+       self._memory.move_to_end(key)
+       while len(self._memory) > self.max_entries:
+           self._memory.popitem(last=False)
+           self.evictions += 1
+
+   async def get(self, db, key: Tuple) -> Optional[Dict]:
+       """Returns the stored explanation for a key from memory, else MongoDB, else None."""
+       doc = self._recall(key)
+       if doc is not None:
+           self.memory_hits += 1
+           return doc
+       doc = await db[self.collection_name].find_one(self.query(key), EXPLANATION_PROJECTION)
+       if doc is None:
+           self.misses += 1
+           return None
+       self.db_hits += 1
+       self._remember(key, doc)
+       return doc
+
+   async def get_many(self, db, keys: List[Tuple]) -> Dict[Tuple, Dict]:
+       """
+       Returns the stored explanations for many keys. Keys missing from memory are
+       fetched in one query: an $or of clauses that share every key field but
+       'verse', each with an $in on 'verse'.
+       """
+       found, remaining = {}, []
+       for key in dict.fromkeys(keys):
+           doc = self._recall(key)
+           if doc is not None:
+               self.memory_hits += 1
+               found[key] = doc
+           else:
+               remaining.append(key)
+       if not remaining:
+           return found
+
+       position = self.key_fields.index("verse")
+       others = self.key_fields[:position] + self.key_fields[position + 1:]
+       groups: Dict[Tuple, set] = {}
+       for key in remaining:
+           groups.setdefault(key[:position] + key[position + 1:], set()).add(key[position])
+       query = {"$or": [
+           {**dict(zip(others, prefix)), "verse": {"$in": sorted(values)}}
+           for prefix, values in groups.items()
+       ]}
+       async for doc in db[self.collection_name].find(query, EXPLANATION_PROJECTION):
+           key = tuple(doc.get(field) for field in self.key_fields)
+           if key not in found:
+               self.db_hits += 1
+               found[key] = doc
+               self._remember(key, doc)
+       self.misses += sum(1 for key in remaining if key not in found)
+       return found
+
+   def put(self, db, key: Tuple, doc: Dict, stored_fields: Optional[Dict] = None) -> asyncio.Future:
+       """
+       Caches an explanation in memory now and queues it, plus any stored_fields kept
+       only in MongoDB, for the next bulk write. The returned future resolves to True
+       once it is in MongoDB (False if the write failed).
+       """
+       self._remember(key, doc)
+       self._db = db
+       self._ensure_worker()
+       stored = self._loop.create_future()
+       self._queue.put_nowait((key, {**doc, **(stored_fields or {})}, stored))
+       self.writes_queued += 1
+       return stored
+
+   def _ensure_worker(self) -> None:
+       loop = asyncio.get_running_loop()
+       if self._worker is None or self._worker.done() or self._loop is not loop:
+           self._loop = loop
+           self._queue = asyncio.Queue()
+           self._worker = loop.create_task(self._run())
+
+   async def _run(self) -> None:
+       while True:
+           batch = [await self._queue.get()]
+           deadline = time.monotonic() + EXPLANATION_WRITE_MAX_DELAY_MS / 1000.0
+           try:
+               while len(batch) < EXPLANATION_WRITE_BATCH_SIZE:
+                   remaining = deadline - time.monotonic()
+                   if remaining <= 0:
+                       break
+                   try:
+                       batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                   except asyncio.TimeoutError:
+                       break
+           except asyncio.CancelledError:
+               self._unflushed = batch
+               raise
+           # Shielded so that close() cannot interrupt a bulk write halfway.
+           self._flushing = asyncio.ensure_future(self._flush(batch))
+           await asyncio.shield(self._flushing)
+
+   async def _flush(self, batch: List[Tuple[Tuple, Dict, asyncio.Future]]) -> None:
+       # $setOnInsert keeps the first stored explanation if another worker wrote the key first.
+       operations = [
+           UpdateOne(self.query(key), {"$setOnInsert": dict(doc)}, upsert=True)
+           for key, doc, _ in batch
+       ]
+       self.flushes += 1
+       failed = set()
+       try:
+           await self._db[self.collection_name].bulk_write(operations, ordered=False)
+       except BulkWriteError as e:
+           # Concurrent upserts of the same key race on the unique index; the loser is redundant.
+           errors = [error for error in e.details.get("writeErrors", []) if error.get("code") != DUPLICATE_KEY]
+           if errors:
+               failed = {error.get("index") for error in errors}
+               print(f"Error writing {len(errors)} explanations to {self.collection_name}: {errors[0].get('errmsg')}")
+       except Exception as e:
+           failed = set(range(len(batch)))
+           print(f"Error writing {len(batch)} explanations to {self.collection_name}: {e}")
+       self.write_errors += len(failed)
+       self.writes_flushed += len(batch) - len(failed)
+       for i, (_, _, stored) in enumerate(batch):
+           if not stored.done():
+               stored.set_result(i not in failed)
+
+   def invalidate(self, key: Tuple) -> None:
+       self._memory.pop(key, None)
+
+   def stats(self) -> Dict:
+       lookups = self.memory_hits + self.db_hits + self.misses
+       return {
+           "entries": len(self._memory),
+           "max_entries": self.max_entries,
+           "ttl_seconds": self.ttl,
+           "memory_hits": self.memory_hits,
+           "db_hits": self.db_hits,
+           "misses": self.misses,
+           "memory_hit_ratio": round(self.memory_hits / lookups, 4) if lookups else 0.0,
+           "hit_ratio": round((self.memory_hits + self.db_hits) / lookups, 4) if lookups else 0.0,
+           "evictions": self.evictions,
+           "expirations": self.expirations,
+           "write_queue_depth": self._queue.qsize() if self._queue is not None else 0,
+           "writes_queued": self.writes_queued,
+           "writes_flushed": self.writes_flushed,
+           "flushes": self.flushes,
+           "write_errors": self.write_errors,
+       }
+
+   async def close(self) -> None:
+       """Stops the write-behind task and flushes everything still queued."""
+       if self._worker is not None:
+           self._worker.cancel()
+           try:
+               await self._worker
+           except (asyncio.CancelledError, Exception):
+               pass
+           self._worker = None
+       if self._flushing is not None and not self._flushing.done():
+           await self._flushing
+       pending, self._unflushed = self._unflushed, []
+       while self._queue is not None and not self._queue.empty():
+           pending.append(self._queue.get_nowait())
+       if pending:
+           await self._flush(pending)
+
+verse_explanation_cache = ExplanationCache("verse_explanations", ("book", "chapter", "verse"))
+event_explanation_cache = ExplanationCache("event_explanations", ("book", "verse", "theme"))
+
+def explanation_cache_stats() -> Dict:
+   return {"verse": verse_explanation_cache.stats(), "event": event_explanation_cache.stats()}
+
+async def close_explanation_caches() -> None:
+   await verse_explanation_cache.close()
+   await event_explanation_cache.close()
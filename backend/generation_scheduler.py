@@ -0,0 +1,185 @@
+# This module schedules calls to the generation model.
+#
+# Every generation takes a slot from one process-wide pool: at most
+# GENERATION_MAX_CONCURRENCY calls run at once and a token bucket holds them to
+# GENERATION_RATE_PER_MINUTE. Waiting callers are served by priority (interactive
+# before background) and then in arrival order. When too many callers are already
+# waiting, new ones are rejected at once with a Retry-After estimate instead of
+# queueing into a quota error. Transient API errors are retried with jittered
+# exponential backoff.
+
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, List, Tuple, TypeVar
+
+from google.api_core import exceptions as api_exceptions
+
+from metrics import record
+
+GENERATION_MAX_CONCURRENCY = int(os.getenv("GENERATION_MAX_CONCURRENCY", "8"))
+GENERATION_RATE_PER_MINUTE = float(os.getenv("GENERATION_RATE_PER_MINUTE", "600"))
+GENERATION_MAX_QUEUE = int(os.getenv("GENERATION_MAX_QUEUE", "64"))
+GENERATION_MAX_RETRIES = int(os.getenv("GENERATION_MAX_RETRIES", "3"))
+GENERATION_RETRY_BASE_MS = float(os.getenv("GENERATION_RETRY_BASE_MS", "500"))
+GENERATION_RETRY_MAX_MS = float(os.getenv("GENERATION_RETRY_MAX_MS", "8000"))
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+# Quota, overload and timeout errors are worth retrying; bad requests are not.
+RETRYABLE_ERRORS = (
+   api_exceptions.TooManyRequests,
+   api_exceptions.ResourceExhausted,
+   api_exceptions.ServiceUnavailable,
+   api_exceptions.InternalServerError,
+   api_exceptions.DeadlineExceeded,
+   asyncio.TimeoutError,
+   ConnectionError,
+)
+
+T = TypeVar("T")
+
+class GenerationOverloaded(Exception):
+   """Raised instead of queueing when the generation queue is full."""
+
+   def __init__(self, retry_after: int):
+       super().__init__(f"Generation queue is full; retry in {retry_after}s")
+       self.retry_after = retry_after
+
+class RateLimiter:
+   """Token bucket allowing `rate_per_minute` acquisitions per minute (0 disables it)."""
+
+   def __init__(self, rate_per_minute: float, burst: int = 1):
+       self.rate = rate_per_minute / 60.0
+       self.capacity = max(1, burst)
+       self.tokens = float(self.capacity)
+       self.updated = time.monotonic()
+       self._lock = asyncio.Lock()
+
+   async def acquire(self) -> None:
+       if self.rate <= 0:
+           return
+       async with self._lock:
+           while True:
+               now = time.monotonic()
+               self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+               self.updated = now
+               if self.tokens >= 1:
+                   self.tokens -= 1
+                   return
+               await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class GenerationScheduler:
+   """Priority queue of generation calls in front of a concurrency cap and a token bucket."""
+
+   def __init__(self, max_concurrency: int = GENERATION_MAX_CONCURRENCY,
+                rate_per_minute: float = GENERATION_RATE_PER_MINUTE,
+                max_queue: int = GENERATION_MAX_QUEUE,
+                max_retries: int = GENERATION_MAX_RETRIES,
+                retry_base_ms: float = GENERATION_RETRY_BASE_MS,
+                retry_max_ms: float = GENERATION_RETRY_MAX_MS):
+       self.max_concurrency = max(1, max_concurrency)
+       self.max_queue = max_queue
+       self.max_retries = max(0, max_retries)
+       self.retry_base = retry_base_ms / 1000.0
+       self.retry_max = retry_max_ms / 1000.0
+       self.limiter = RateLimiter(rate_per_minute, burst=self.max_concurrency)
+       self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+       self._order = itertools.count()
+       self.active = 0
+       # Smoothed seconds per call, used to estimate Retry-After.
+       self.average_seconds = 5.0
+       self.admitted = {name: 0 for name in PRIORITY_NAMES.values()}
+       self.rejected = 0
+       self.retries = 0
+       self.failures = 0
+
+   @property
+   def waiting(self) -> int:
+       return sum(1 for _, _, waiter in self._waiters if not waiter.done())
+
+   def retry_after(self) -> int:
+       """Seconds until the current queue should have drained through the slots."""
+       return max(1, math.ceil(self.waiting / self.max_concurrency * self.average_seconds))
+
+   async def _acquire(self, priority: int) -> None:
+       if self.active < self.max_concurrency and not self.waiting:
+           self.active += 1
+           return
+       if self.waiting >= self.max_queue:
+           self.rejected += 1
+           raise GenerationOverloaded(self.retry_after())
+       waiter = asyncio.get_running_loop().create_future()
+       heapq.heappush(self._waiters, (priority, next(self._order), waiter))
+       try:
+           await waiter
+       except asyncio.CancelledError:
+           # If the slot was handed over just as this caller gave up, pass it on.
+           if waiter.done() and not waiter.cancelled():
+               self._release()
+           raise
+
+   def _release(self) -> None:
+       while self._waiters:
+           _, _, waiter = heapq.heappop(self._waiters)
+           if not waiter.done():
+               waiter.set_result(None)
+               return
+       self.active -= 1
+
+   @asynccontextmanager
+   async def slot(self, priority: int = INTERACTIVE):
+       """Holds one generation slot; raises GenerationOverloaded if the queue is full."""
+       queued = time.perf_counter()
+       await self._acquire(priority)
+       record("generation.queue", time.perf_counter() - queued)
+       self.admitted[PRIORITY_NAMES.get(priority, "background")] += 1
+       started = time.monotonic()
+       try:
+           yield
+       finally:
+           self.average_seconds = 0.8 * self.average_seconds + 0.2 * (time.monotonic() - started)
+           self._release()
+
+   async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+       """Awaits fn() under the rate limit, retrying transient errors with full-jitter backoff."""
+       for attempt in range(self.max_retries + 1):
+           await self.limiter.acquire()
+           try:
+               return await fn()
+           except RETRYABLE_ERRORS as e:
+               if attempt == self.max_retries:
+                   self.failures += 1
+                   raise
+               self.retries += 1
+               delay = random.uniform(0, min(self.retry_max, self.retry_base * 2 ** attempt))
+               print(f"Generation failed ({type(e).__name__}); retrying in {delay:.2f}s")
+               await asyncio.sleep(delay)
+           except Exception:
+               self.failures += 1
+               raise
+
+   async def run(self, fn: Callable[[], Awaitable[T]], priority: int = INTERACTIVE) -> T:
+       """Runs one generation call in a slot."""
+       async with self.slot(priority):
+           return await self.call(fn)
+
+   def stats(self) -> Dict:
+       return {
+           "active": self.active,
+           "waiting": self.waiting,
+           "max_concurrency": self.max_concurrency,
+           "max_queue": self.max_queue,
+           "admitted": dict(self.admitted),
+           "rejected": self.rejected,
+           "retries": self.retries,
+           "failures": self.failures,
+           "average_seconds": round(self.average_seconds, 3),
+       }
@@ -0,0 +1,6 @@
+# This package builds the commentary_chunks, theology and books collections.
+#
+# It replaces the notebook cells that did this by hand: sources.py reads the
+# commentary PDF and the JSON files, chunking.py splits long pages, and
+# pipeline.py embeds what changed in concurrent batches and upserts it with
+# bulk_write. Run it with `python -m ingest` from the backend directory.
@@ -0,0 +1,118 @@
+# This module is the ingestion command line.
+#
+# Each command streams its source through the pipeline into one collection and
+# prints a JSON report; progress lines go to stderr. --stub-embeddings uses the
+# offline stub embedder and --mongo-uri a local database, so a run needs neither
+# an API key nor Atlas. Stub vectors are stored with their own model name and
+# are replaced by real ones on the next run with the real embedder.
+#
+# Usage (from the backend directory):
+#    python -m ingest commentary --pdf mycommentary.pdf --start-page 21 --end-page 1318
+#    python -m ingest commentary --json commentary_chunks.json --prune
+#    python -m ingest theology --json theology_export.json
+#    python -m ingest books
+#    python -m ingest commentary --json commentary_chunks.json --stub-embeddings --mongo-uri mongodb://localhost:27017
+
+import argparse
+import asyncio
+import json
+from pathlib import Path
+
+from embedding_batcher import EmbeddingBatcher
+from ingest.chunking import CHUNK_MAX_CHARS, CHUNK_OVERLAP_CHARS, chunk_pages
+from ingest.pipeline import PROGRESS_SECONDS, WRITE_BATCH_SIZE, Ingestion, Progress
+from ingest.sources import (
+   DATA_DIR, book_documents, read_page_json, read_pdf_pages, theology_documents, theology_text,
+)
+
+# The embedding API takes at most 100 texts per call.
+EMBED_BATCH_SIZE = 100
+EMBED_CONCURRENCY = 4
+
+def make_embedder(args):
+   """Returns (batcher, model name) for the real or the stub embedding model."""
+   if args.stub_embeddings:
+       from ai_stubs import STUB_EMBEDDING_MODEL, make_stub_embed_batch
+       embed_fn, model = make_stub_embed_batch(args.stub_latency_ms), STUB_EMBEDDING_MODEL
+   else:
+       import ai_services
+       embed_fn, model = ai_services.embed_batch, ai_services.EMBEDDING_MODEL
+   return EmbeddingBatcher(embed_fn, args.batch_size, max_concurrent_batches=args.concurrency), model
+
+def commentary_source(args):
+   if args.pdf:
+       pages = read_pdf_pages(args.pdf, args.start_page, args.end_page)
+   else:
+       pages = read_page_json(args.json, args.start_page, args.end_page)
+   source = args.source or Path(args.pdf or args.json).stem
+   return chunk_pages(pages, source, args.max_chars, args.overlap)
+
+async def ingest(args) -> dict:
+   from database import MONGO_DB_NAME, close_db_connection, connect_db, create_client
+
+   client = None
+   if args.mongo_uri:
+       client = create_client(args.mongo_uri)
+       db = client[args.db_name or MONGO_DB_NAME]
+   else:
+       db = await connect_db()
+   embedder, model = make_embedder(args) if args.command != "books" else (None, None)
+   try:
+       if args.command == "commentary":
+           collection_name, key_field, embed_text = "commentary_chunks", "chunk_id", lambda doc: doc["text"]
+           documents = commentary_source(args)
+       elif args.command == "theology":
+           collection_name, key_field, embed_text = "theology", "id", theology_text
+           documents = theology_documents(args.json, args.connections)
+       else:
+           collection_name, key_field, embed_text = "books", "id", None
+           documents = book_documents(args.json, args.insights)
+       ingestion = Ingestion(
+           db[collection_name], key_field, embed_text, embedder, model,
+           write_batch_size=args.write_batch, dry_run=args.dry_run,
+           progress=Progress(collection_name, args.progress_seconds),
+       )
+       return await ingestion.run(documents, prune=args.prune)
+   finally:
+       if embedder is not None:
+           await embedder.close()
+       if client is not None:
+           client.close()
+       else:
+           close_db_connection()
+
+if __name__ == "__main__":
+   common = argparse.ArgumentParser(add_help=False)
+   common.add_argument("--mongo-uri", help="MongoDB to write to instead of MONGO_DB_URI (e.g. a local mongod)")
+   common.add_argument("--db-name", help="Database name (default: MONGO_DB_NAME)")
+   common.add_argument("--stub-embeddings", action="store_true", help="Embed with the offline stub model")
+   common.add_argument("--stub-latency-ms", type=float, default=0, help="Stub latency per embedding call")
+   common.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="Texts per embedding call")
+   common.add_argument("--concurrency", type=int, default=EMBED_CONCURRENCY, help="Embedding calls in flight")
+   common.add_argument("--write-batch", type=int, default=WRITE_BATCH_SIZE, help="Documents per bulk_write")
+   common.add_argument("--prune", action="store_true", help="Delete stored documents this run did not produce")
+   common.add_argument("--dry-run", action="store_true", help="Read and embed but write nothing")
+   common.add_argument("--progress-seconds", type=float, default=PROGRESS_SECONDS, help="Seconds between progress lines (0 for none)")
+
+   parser = argparse.ArgumentParser(prog="python -m ingest", description="Build the commentary_chunks, theology and books collections.")
+   commands = parser.add_subparsers(dest="command", required=True)
+
+   commentary = commands.add_parser("commentary", parents=[common], help="Commentary pages, chunked and embedded")
+   inputs = commentary.add_mutually_exclusive_group(required=True)
+   inputs.add_argument("--pdf", help="Commentary PDF (needs PyMuPDF)")
+   inputs.add_argument("--json", help="Pages already extracted from the PDF ({page, section, subsection, chapter_title, text})")
+   commentary.add_argument("--source", help="Source name used in chunk ids (default: the file name)")
+   commentary.add_argument("--start-page", type=int, default=21)
+   commentary.add_argument("--end-page", type=int)
+   commentary.add_argument("--max-chars", type=int, default=CHUNK_MAX_CHARS, help="Longest chunk in characters")
+   commentary.add_argument("--overlap", type=int, default=CHUNK_OVERLAP_CHARS, help="Characters repeated between chunks of a page")
+
+   theology = commands.add_parser("theology", parents=[common], help="Theological concepts, embedded")
+   theology.add_argument("--json", default=str(DATA_DIR / "themes.json"), help="Theology export or themes.json")
+   theology.add_argument("--connections", default=str(DATA_DIR / "theme_connections.json"))
+
+   books = commands.add_parser("books", parents=[common], help="Book metadata and insights")
+   books.add_argument("--json", default=str(DATA_DIR / "biblical_books.json"))
+   books.add_argument("--insights", default=str(DATA_DIR / "book_insights.json"))
+
+   print(json.dumps(asyncio.run(ingest(parser.parse_args())), indent=2, default=str))
@@ -0,0 +1,66 @@
+# This module splits commentary pages into chunks small enough to embed.
+#
+# A page that fits in `max_chars` stays one chunk, as the notebook stored it.
+# Longer pages are cut at the last paragraph break, sentence end or space before
+# the limit, and each chunk repeats about `overlap_chars` of the previous one so
+# a passage cut in two is still retrievable from either half.
+
+import re
+from typing import Dict, Iterable, Iterator, List
+
+CHUNK_MAX_CHARS = 6000
+CHUNK_OVERLAP_CHARS = 300
+
+SENTENCE_END = re.compile(r"[.!?][\"')\]]*\s")
+
+def _cut_point(text: str, start: int, end: int) -> int:
+   """The best place to end a chunk in text[start:end], past its first half if possible."""
+   floor = start + (end - start) // 2
+   paragraph = text.rfind("\n\n", floor, end)
+   if paragraph != -1:
+       return paragraph
+   sentence = -1
+   for match in SENTENCE_END.finditer(text, floor, end):
+       sentence = match.end() - 1
+   if sentence != -1:
+       return sentence
+   space = text.rfind(" ", floor, end)
+   return space if space != -1 else end
+
+def split_text(text: str, max_chars: int = CHUNK_MAX_CHARS, overlap_chars: int = CHUNK_OVERLAP_CHARS) -> List[str]:
+   text = text.strip()
+   if len(text) <= max_chars:
+       return [text] if text else []
+   overlap_chars = min(overlap_chars, max_chars // 4)
+   chunks = []
+   start = 0
+   while start < len(text):
+       end = start + max_chars
+       if end >= len(text):
+           chunks.append(text[start:].strip())
+           break
+       cut = _cut_point(text, start, end)
+       chunks.append(text[start:cut].strip())
+       # Start the next chunk on a word boundary about overlap_chars before the cut.
+       next_start = text.find(" ", max(start + 1, cut - overlap_chars), cut)
+       start = next_start + 1 if next_start != -1 else cut
+   return [chunk for chunk in chunks if chunk]
+
+def chunk_pages(pages: Iterable[Dict], source: str, max_chars: int = CHUNK_MAX_CHARS,
+                overlap_chars: int = CHUNK_OVERLAP_CHARS) -> Iterator[Dict]:
+   """
+   Yields commentary_chunks documents for the pages, keyed by `chunk_id`
+   ("<source>:<page>:<chunk>"), with the notebook's fields.
+   """
+   for page in pages:
+       for i, text in enumerate(split_text(page["text"], max_chars, overlap_chars)):
+           yield {
+               "chunk_id": f"{source}:{page['page']}:{i}",
+               "source": source,
+               "page": page["page"],
+               "chunk": i,
+               "section": page.get("section"),
+               "sub_section": page.get("subsection"),
+               "chapter_title": page.get("chapter_title"),
+               "text": text,
+           }
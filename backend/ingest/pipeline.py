@@ -0,0 +1,233 @@
+# This module runs a stream of documents through the embed and write stages of an ingestion.
+#
+# Documents are taken from the source in windows of `write_batch_size`. Each one
+# carries a content hash of the text it is embedded from (or, in collections
+# without embeddings, of the whole document). Before the run, the key, hash and
+# fields of every stored document (not its embedding) are read in one scan:
+# a document whose hash and embedding model match is rewritten only if another
+# field changed and is skipped otherwise, so a re-run only embeds what changed.
+# The rest are embedded through an EmbeddingBatcher, which sends full batches
+# with several API calls in flight, and upserted by key with unordered
+# bulk_write. The writes of one window overlap the parsing and embedding of the
+# next.
+
+import asyncio
+import hashlib
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Callable, Dict, Iterable, List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from embedding_batcher import EmbeddingBatcher
+
+WRITE_BATCH_SIZE = 256
+PROGRESS_SECONDS = 5.0
+# Fields the pipeline maintains itself, left out when comparing a document to the stored one.
+PIPELINE_FIELDS = ("_id", "embedding", "content_hash", "embedding_model", "ingested_at")
+
+def content_hash(text: str) -> str:
+   return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def document_hash(doc: Dict) -> str:
+   return content_hash(json.dumps(doc, sort_keys=True, ensure_ascii=False, default=str))
+
+def _take(iterator, count: int) -> List[Dict]:
+   return list(islice(iterator, count))
+
+class Progress:
+   """Counts what an ingestion did and prints its throughput to stderr every `interval` seconds."""
+
+   def __init__(self, label: str, interval: float = PROGRESS_SECONDS):
+       self.label = label
+       self.interval = interval
+       self.counts = {"read": 0, "embedded": 0, "updated": 0, "unchanged": 0, "failed": 0, "written": 0, "deleted": 0}
+       self.started = time.perf_counter()
+       self._last_report = self.started
+
+   def add(self, name: str, count: int = 1) -> None:
+       self.counts[name] += count
+
+   def rate(self, name: str) -> float:
+       return self.counts[name] / max(time.perf_counter() - self.started, 1e-9)
+
+   def line(self) -> str:
+       counts = self.counts
+       return (f"{self.label}: {counts['read']} read ({self.rate('read'):.1f}/s), "
+               f"{counts['embedded']} embedded ({self.rate('embedded'):.1f}/s), {counts['updated']} updated, "
+               f"{counts['unchanged']} unchanged, {counts['failed']} failed, {counts['written']} written")
+
+   def maybe_report(self) -> None:
+       now = time.perf_counter()
+       if self.interval and now - self._last_report >= self.interval:
+           self._last_report = now
+           print(self.line(), file=sys.stderr)
+
+   def summary(self) -> Dict:
+       return {
+           **self.counts,
+           "seconds": round(time.perf_counter() - self.started, 3),
+           "read_per_second": round(self.rate("read"), 1),
+           "embedded_per_second": round(self.rate("embedded"), 1),
+           "written_per_second": round(self.rate("written"), 1),
+       }
+
+class Ingestion:
+   """
+   Upserts documents into one collection by `key_field`. With `embed_text`,
+   each document gets the embedding of embed_text(doc) from `embedder`.
+   """
+
+   def __init__(self, collection, key_field: str, embed_text: Optional[Callable[[Dict], str]] = None,
+                embedder: Optional[EmbeddingBatcher] = None, embedding_model: Optional[str] = None,
+                write_batch_size: int = WRITE_BATCH_SIZE, dry_run: bool = False,
+                progress: Optional[Progress] = None):
+       self.collection = collection
+       self.key_field = key_field
+       self.embed_text = embed_text
+       self.embedder = embedder
+       self.embedding_model = embedding_model
+       self.write_batch_size = max(1, write_batch_size)
+       self.dry_run = dry_run
+       self.progress = progress or Progress(collection.name)
+       self.existing: Dict = {}
+       self.seen = set()
+
+   async def load_existing(self) -> None:
+       """Reads the stored documents, without their embeddings, by key."""
+       self.existing = {}
+       cursor = self.collection.find({self.key_field: {"$exists": True}}, {"_id": 0, "embedding": 0})
+       async for doc in cursor:
+           self.existing[doc[self.key_field]] = doc
+
+   def _plan(self, doc: Dict):
+       """Returns (action, hash, text to embed); action is embed, write, update or unchanged."""
+       text = self.embed_text(doc) if self.embed_text else None
+       digest = content_hash(text) if self.embed_text else document_hash(doc)
+       stored = self.existing.get(doc[self.key_field])
+       if stored is None or stored.get("content_hash") != digest:
+           return ("embed" if self.embed_text else "write"), digest, text
+       if self.embed_text and stored.get("embedding_model") != self.embedding_model:
+           return "embed", digest, text
+       if any(stored.get(field) != value for field, value in doc.items()):
+           return "update", digest, text
+       return "unchanged", digest, text
+
+   def _upsert(self, doc: Dict, fields: Dict) -> UpdateOne:
+       return UpdateOne({self.key_field: doc[self.key_field]}, {"$set": fields}, upsert=True)
+
+   async def _prepare(self, window: List[Dict]) -> List[UpdateOne]:
+       now = datetime.now(timezone.utc)
+       operations, to_embed = [], []
+       for doc in window:
+           self.progress.add("read")
+           if doc.get(self.key_field) is None:
+               print(f"Skipping document without a '{self.key_field}'", file=sys.stderr)
+               self.progress.add("failed")
+               continue
+           self.seen.add(doc[self.key_field])
+           action, digest, text = self._plan(doc)
+           if action == "unchanged":
+               self.progress.add("unchanged")
+           elif action == "update":
+               self.progress.add("updated")
+               operations.append(self._upsert(doc, {**doc, "ingested_at": now}))
+           elif action == "write":
+               operations.append(self._upsert(doc, {**doc, "content_hash": digest, "ingested_at": now}))
+           else:
+               to_embed.append((doc, digest, text))
+
+       if to_embed:
+           vectors = await asyncio.gather(*(self.embedder.embed(text) for _, _, text in to_embed), return_exceptions=True)
+           errors = [vector for vector in vectors if isinstance(vector, Exception)]
+           if errors:
+               print(f"Error embedding {len(errors)} of {len(to_embed)} documents: {errors[0]}", file=sys.stderr)
+               self.progress.add("failed", len(errors))
+           for (doc, digest, _), vector in zip(to_embed, vectors):
+               if isinstance(vector, Exception):
+                   continue
+               self.progress.add("embedded")
+               operations.append(self._upsert(doc, {
+                   **doc,
+                   "content_hash": digest,
+                   "embedding_model": self.embedding_model,
+                   "embedding": vector,
+                   "ingested_at": now,
+               }))
+       return operations
+
+   async def _write(self, operations: List[UpdateOne]) -> None:
+       if self.dry_run:
+           self.progress.add("written", len(operations))
+           return
+       try:
+           await self.collection.bulk_write(operations, ordered=False)
+           self.progress.add("written", len(operations))
+       except BulkWriteError as e:
+           errors = e.details.get("writeErrors", [])
+           print(f"Error writing {len(errors)} of {len(operations)} documents: {errors[0]['errmsg'] if errors else e}", file=sys.stderr)
+           self.progress.add("written", len(operations) - len(errors))
+           self.progress.add("failed", len(errors))
+       except Exception as e:
+           print(f"Error writing {len(operations)} documents: {e}", file=sys.stderr)
+           self.progress.add("failed", len(operations))
+
+   async def _prune(self) -> None:
+       """Deletes the documents this run did not produce, including ones stored without a key."""
+       failed = self.progress.counts["failed"]
+       if failed:
+           print(f"Not pruning {self.collection.name}: {failed} documents failed", file=sys.stderr)
+           return
+       stale = [key for key in self.existing if key not in self.seen]
+       query = {"$or": [{self.key_field: {"$exists": False}}, {self.key_field: {"$in": stale}}]}
+       if self.dry_run:
+           self.progress.add("deleted", await self.collection.count_documents(query))
+           return
+       result = await self.collection.delete_many(query)
+       self.progress.add("deleted", result.deleted_count)
+
+   async def run(self, documents: Iterable[Dict], prune: bool = False) -> Dict:
+       """Ingests the documents and returns the counts and throughput of the run."""
+       if not self.dry_run:
+           await self.collection.create_index([(self.key_field, 1)], name=f"ingest_{self.key_field}")
+       await self.load_existing()
+       queue: asyncio.Queue = asyncio.Queue(maxsize=2)
+
+       async def writer():
+           while True:
+               operations = await queue.get()
+               if operations is None:
+                   return
+               await self._write(operations)
+               self.progress.maybe_report()
+
+       writer_task = asyncio.create_task(writer())
+       iterator = iter(documents)
+       try:
+           while True:
+               # Sources may parse as they go (PDF pages); keep that off the event loop.
+               window = await asyncio.to_thread(_take, iterator, self.write_batch_size)
+               if not window:
+                   break
+               operations = await self._prepare(window)
+               if operations:
+                   await queue.put(operations)
+               self.progress.maybe_report()
+       finally:
+           await queue.put(None)
+           await writer_task
+
+       if prune:
+           await self._prune()
+       print(self.progress.line(), file=sys.stderr)
+       report = {"collection": self.collection.name, "dry_run": self.dry_run, **self.progress.summary()}
+       if self.embedder is not None:
+           stats = self.embedder.stats()
+           report["embedding_model"] = self.embedding_model
+           report["embedding_batches"] = stats["batches"]
+           report["average_batch_size"] = stats["average_batch_size"]
+       return report
@@ -0,0 +1,93 @@
+# This module reads the ingestion inputs (commentary PDF and JSON files) as streams of documents.
+
+import json
+import re
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+# Pages with fewer non-space characters than about four sentences are title or list pages.
+MIN_PAGE_CHARS = 360
+
+def read_json(path: str) -> List:
+   with open(path, "r", encoding="utf-8") as f:
+       return json.load(f)
+
+def read_pdf_pages(path: str, start_page: int = 1, end_page: Optional[int] = None) -> Iterator[Dict]:
+   """
+   Yields the content pages of the commentary PDF ({page, section, subsection,
+   chapter_title, text}) one at a time. Testament and subsection pages are not
+   yielded; they set the section and subsection of the pages that follow.
+   """
+   try:
+       import fitz
+   except ImportError:
+       raise RuntimeError("PDF parsing needs PyMuPDF (pip install PyMuPDF)")
+
+   section = "Unknown"
+   subsection = "Unknown"
+   chapter_title = "Unknown"
+   with fitz.open(path) as doc:
+       last_page = min(end_page or doc.page_count, doc.page_count)
+       for page_num in range(max(1, start_page), last_page + 1):
+           text = doc[page_num - 1].get_text("text").strip()
+           if not text:
+               continue
+           if re.fullmatch(r"I\s*\nOLD\s+TESTAMENT", text, re.IGNORECASE):
+               section = "The Old Testament"
+               continue
+           if re.fullmatch(r"II\s*\nNEW\s+TESTAMENT", text, re.IGNORECASE):
+               section = "The New Testament"
+               continue
+           lines = text.split("\n")
+           if len(lines) > 2 and lines[0].isupper() and re.search(r"^\d+\.", lines[2].strip()):
+               subsection = lines[0].strip()
+               chapter_title = "Introduction to Subsection"
+               continue
+           chapter_match = re.match(r"(?s)^\s*(\d+\.?\s+[A-Z0-9\s,&]+?)\n", text)
+           if chapter_match:
+               chapter_title = re.sub(r"\s+", " ", chapter_match.group(1)).strip()
+           if len("".join(text.split())) < MIN_PAGE_CHARS:
+               continue
+           yield {"page": page_num, "section": section, "subsection": subsection,
+                  "chapter_title": chapter_title, "text": text}
+
+def read_page_json(path: str, start_page: int = 1, end_page: Optional[int] = None) -> Iterator[Dict]:
+   """Yields pages from a JSON export of read_pdf_pages (the notebook's commentary_chunks.json)."""
+   for page in read_json(path):
+       if start_page <= page["page"] <= (end_page or page["page"]):
+           yield page
+
+def kebab_case(text: str) -> str:
+   return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+def theology_documents(path: str, connections_path: Optional[str] = None) -> Iterator[Dict]:
+   """
+   Yields theology documents keyed by `id`. Accepts either theology exports
+   ({concept, summary, ...}) or data/themes.json ({id, name, description, ...});
+   connections from theme_connections.json are added to themes without any.
+   """
+   connections = read_json(connections_path) if connections_path else {}
+   for item in read_json(path):
+       doc = {key: value for key, value in item.items() if key not in ("_id", "embedding")}
+       doc.setdefault("concept", doc.get("name"))
+       doc.setdefault("summary", doc.get("description"))
+       if not doc.get("concept") or not doc.get("summary"):
+           print(f"Skipping theology entry without a concept or summary: {item.get('id')}", file=sys.stderr)
+           continue
+       doc.setdefault("id", kebab_case(doc["concept"]))
+       if doc["id"] in connections:
+           doc.setdefault("connections", connections[doc["id"]])
+       yield doc
+
+def theology_text(doc: Dict) -> str:
+   """The text a theology entry is embedded from."""
+   return doc.get("standardized_summary") or doc["summary"]
+
+def book_documents(path: str, insights_path: Optional[str] = None) -> Iterable[Dict]:
+   """Yields the books with their insights (overview, key scriptures, ...) merged in."""
+   insights = read_json(insights_path) if insights_path else {}
+   for book in read_json(path):
+       yield {**book, **insights.get(str(book["id"]), {})}
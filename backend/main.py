@@ -1,22 +1,53 @@
 
 from fastapi import FastAPI, HTTPException, status, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
 from pathlib import Path
+import asyncio
 
-from database import get_db, close_db_connection
-from data_loader import load_all_data
-from routers import bible, themes, explanations
+from database import connect_db, close_db_connection, ensure_indexes
+from data_snapshot import is_fresh_snapshot, load_initial_data
+from data_refresher import DataRefresher
+from verse_store import load_verse_store
+from vector_index import load_vector_indexes
+from related_graph import load_related_graph
+from search_index import load_search_index
+from embedding_cache import embedding_cache
+from explanation_cache import close_explanation_caches, explanation_cache_stats
+from semantic_cache import load_semantic_cache, semantic_cache
+from ai_services import embedding_batcher, generation_scheduler
+from routers.explanations import explanation_flights
+from metrics import MetricsMiddleware, register_stats, render_metrics
+from profiler import PROFILER_ENABLED, ProfilerMiddleware
+from routers import admin, bible, themes, explanations, search
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
    # Startup
-   db = get_db()
-   app.state.DATA = await load_all_data(db)
+   db = await connect_db()
+   await ensure_indexes(db)
+   app.state.DATA = await load_initial_data(db)
+   app.state.refresher = DataRefresher(app, db)
+   # When booted from the snapshot, serve it right away and reload from MongoDB in the background,
+   # unless the snapshot was only just written (e.g. by the serve.py supervisor).
+   booted_from_snapshot = app.state.DATA["meta"]["sources"].get("books") == "snapshot"
+   app.state.refresher.start(reload_now=booted_from_snapshot and not is_fresh_snapshot(app.state.DATA))
+   await load_verse_store(db)
+   load_vector_indexes()
+   load_related_graph()
+   # Building the full-text index takes seconds; search answers 503 until it is ready.
+   search_index_task = asyncio.create_task(load_search_index(db))
+   semantic_cache_task = asyncio.create_task(load_semantic_cache(db))
    yield
    # Shutdown
+   search_index_task.cancel()
+   semantic_cache_task.cancel()
+   await app.state.refresher.close()
+   await embedding_batcher.close()
+   embedding_cache.close()
+   await close_explanation_caches()
    close_db_connection()
 
 app = FastAPI(
@@ -33,18 +64,32 @@ app.add_middleware(
    allow_methods=["*"],
    allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+if PROFILER_ENABLED:
+   app.add_middleware(ProfilerMiddleware)
+
+# Counters kept by the caches and schedulers, read when /api/v1/metrics is scraped.
+register_stats("embedding_cache", embedding_cache.stats)
+register_stats("embedding_batches", embedding_batcher.stats, label="size")
+register_stats("explanation_flights", explanation_flights.stats)
+register_stats("explanation_cache", explanation_cache_stats, label="kind")
+register_stats("semantic_cache", semantic_cache.stats)
+register_stats("generation", generation_scheduler.stats, label="priority")
 
 # Include routers
 app.include_router(bible.router)
 app.include_router(themes.router)
 app.include_router(explanations.router)
+app.include_router(search.router)
+app.include_router(admin.router)
 
 # Exception Handlers
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
    return JSONResponse(
        status_code=exc.status_code,
-       content={"detail": exc.detail}
+       content={"detail": exc.detail},
+       headers=exc.headers
    )
 
 @app.exception_handler(Exception)
@@ -60,6 +105,23 @@ async def health_check():
    """Health check endpoint to verify the API is running."""
    return {"status": "healthy"}
 
+@app.get("/api/v1/stats")
+async def get_stats():
+   """Cache counters for monitoring."""
+   return {
+       "embedding_cache": embedding_cache.stats(),
+       "embedding_batches": embedding_batcher.stats(),
+       "explanation_flights": explanation_flights.stats(),
+       "explanation_cache": explanation_cache_stats(),
+       "semantic_cache": semantic_cache.stats(),
+       "generation": generation_scheduler.stats(),
+   }
+
+@app.get("/api/v1/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+   """Request and stage latency histograms, in-flight requests and cache counters in Prometheus text format."""
+   return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 # Static files configuration
 frontend_dist_path = Path("frontend/dist")
 if frontend_dist_path.exists():
@@ -0,0 +1,193 @@
+# This module collects latency metrics and serves them as Prometheus text and Server-Timing headers.
+#
+# Code on the hot path wraps each stage in `span(stage)`. A span observes the
+# stage latency histogram and, inside a request, appends to that request's timing
+# list, which MetricsMiddleware turns into a `Server-Timing` header. The
+# middleware also records per-route request latency and the in-flight gauge.
+# Counters already kept by the caches and schedulers are read only when
+# /api/v1/metrics is scraped, so they add nothing to the request path.
+
+import bisect
+import os
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_PREFIX = "bible_api"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# (stage, seconds) pairs of the current request; None outside a request.
+_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("server_timings", default=None)
+
+def _format_labels(names: Tuple[str, ...], values: Tuple) -> str:
+   if not names:
+       return ""
+   pairs = ",".join(
+       f'{name}="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+       for name, value in zip(names, values)
+   )
+   return "{" + pairs + "}"
+
+class Histogram:
+   """Cumulative-bucket latency histogram per label set."""
+
+   def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+       self.name = name
+       self.help = help_text
+       self.label_names = label_names
+       self.buckets = buckets
+       self._series: Dict[Tuple, list] = {}
+
+   def observe(self, labels: Tuple, value: float) -> None:
+       series = self._series.get(labels)
+       if series is None:
+           series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+       series[0][bisect.bisect_left(self.buckets, value)] += 1
+       series[1] += value
+
+   def render(self) -> List[str]:
+       lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+       for labels, (counts, total) in sorted(self._series.items()):
+           cumulative = 0
+           for bound, count in zip(self.buckets + (float("inf"),), counts):
+               cumulative += count
+               le = "+Inf" if bound == float("inf") else repr(bound)
+               lines.append(f"{self.name}_bucket{_format_labels(self.label_names + ('le',), labels + (le,))} {cumulative}")
+           lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {total:.6f}")
+           lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {cumulative}")
+       return lines
+
+class Gauge:
+   """A value per label set that can go up and down."""
+
+   def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()):
+       self.name = name
+       self.help = help_text
+       self.label_names = label_names
+       self._values: Dict[Tuple, float] = {}
+
+   def inc(self, labels: Tuple = (), amount: float = 1) -> None:
+       self._values[labels] = self._values.get(labels, 0) + amount
+
+   def dec(self, labels: Tuple = (), amount: float = 1) -> None:
+       self._values[labels] = self._values.get(labels, 0) - amount
+
+   def render(self) -> List[str]:
+       lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+       for labels, value in sorted(self._values.items()):
+           lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {value:g}")
+       return lines
+
+REQUEST_SECONDS = Histogram(
+   f"{METRICS_PREFIX}_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status")
+)
+STAGE_SECONDS = Histogram(
+   f"{METRICS_PREFIX}_stage_duration_seconds", "Latency of instrumented stages (cache, embedding, retrieval, generation, ...).", ("stage",)
+)
+IN_FLIGHT = Gauge(f"{METRICS_PREFIX}_requests_in_flight", "HTTP requests being served.")
+
+_metrics = [REQUEST_SECONDS, STAGE_SECONDS, IN_FLIGHT]
+_collectors: List[Tuple[str, Callable[[], Dict], str]] = []
+
+def record(stage: str, seconds: float) -> None:
+   """Records a stage timing that was measured elsewhere."""
+   if not METRICS_ENABLED:
+       return
+   STAGE_SECONDS.observe((stage,), seconds)
+   timings = _timings.get()
+   if timings is not None:
+       timings.append((stage, seconds))
+
+class span:
+   """Times a block as one stage: `with span("embedding"): ...`."""
+
+   __slots__ = ("stage", "start")
+
+   def __init__(self, stage: str):
+       self.stage = stage
+
+   def __enter__(self) -> "span":
+       self.start = time.perf_counter()
+       return self
+
+   def __exit__(self, *exc) -> None:
+       record(self.stage, time.perf_counter() - self.start)
+
+def register_stats(name: str, stats: Callable[[], Dict], label: str = "key") -> None:
+   """
+   Exposes a stats() dict as gauges named <prefix>_<name>_<field>. A nested dict of
+   numbers becomes one gauge with a `label` dimension; a nested dict of dicts adds a
+   `label` dimension to every gauge inside it.
+   """
+   _collectors.append((name, stats, label))
+
+def _stats_lines(prefix: str, stats: Dict, label: str, labels: Tuple[Tuple[str, str], ...] = ()) -> List[str]:
+   lines = []
+   for field, value in stats.items():
+       if isinstance(value, dict):
+           if value and all(isinstance(inner, dict) for inner in value.values()):
+               for key, inner in value.items():
+                   lines += _stats_lines(prefix, inner, label, labels + ((label, key),))
+           else:
+               for key, inner in value.items():
+                   if isinstance(inner, (int, float)):
+                       names, values = zip(*(labels + ((label, key),)))
+                       lines.append(f"{prefix}_{field}{_format_labels(names, values)} {float(inner):g}")
+       elif isinstance(value, (int, float)):
+           names, values = zip(*labels) if labels else ((), ())
+           lines.append(f"{prefix}_{field}{_format_labels(names, values)} {float(value):g}")
+   return lines
+
+def render_metrics() -> str:
+   """All metrics in the Prometheus text exposition format."""
+   lines = []
+   for metric in _metrics:
+       lines += metric.render()
+   for name, stats, label in _collectors:
+       try:
+           lines += _stats_lines(f"{METRICS_PREFIX}_{name}", stats(), label)
+       except Exception as e:
+           print(f"Error collecting '{name}' metrics: {e}")
+   return "\n".join(lines) + "\n"
+
+def server_timing(timings: List[Tuple[str, float]], total: float) -> bytes:
+   entries = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in timings]
+   entries.append(f"total;dur={total * 1000:.2f}")
+   return ", ".join(entries).encode("latin-1")
+
+class MetricsMiddleware:
+   """Pure ASGI middleware: request latency, in-flight gauge and a Server-Timing header."""
+
+   def __init__(self, app):
+       self.app = app
+
+   async def __call__(self, scope, receive, send):
+       if scope["type"] != "http" or not METRICS_ENABLED:
+           await self.app(scope, receive, send)
+           return
+
+       timings: List[Tuple[str, float]] = []
+       token = _timings.set(timings)
+       start = time.perf_counter()
+       status = 500
+       IN_FLIGHT.inc()
+
+       async def send_with_timing(message):
+           nonlocal status
+           if message["type"] == "http.response.start":
+               status = message["status"]
+               headers = list(message.get("headers", []))
+               headers.append((b"server-timing", server_timing(timings, time.perf_counter() - start)))
+               message = {**message, "headers": headers}
+           await send(message)
+
+       try:
+           await self.app(scope, receive, send_with_timing)
+       finally:
+           IN_FLIGHT.dec()
+           # The router stores the matched route in the shared scope; label by its template, not the raw path.
+           route = getattr(scope.get("route"), "path", None) or "unmatched"
+           REQUEST_SECONDS.observe((scope["method"], route, str(status)), time.perf_counter() - start)
+           _timings.reset(token)
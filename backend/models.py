@@ -1,6 +1,6 @@
 # This file contains all the Pydantic data models.
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 
 class Theme(BaseModel):
@@ -21,6 +21,22 @@ class ThemeConnection(BaseModel):
    prominence: int
    events: List[str]
 
+class ThemeOverlayBook(BaseModel):
+   bookId: int
+   prominence: float
+   themes: Dict[str, int]
+   events: Dict[str, List[str]]
+
+class SimilarTheme(BaseModel):
+   themeId: str
+   similarity: float
+   sharedBooks: int
+
+class BookTheme(BaseModel):
+   themeId: str
+   prominence: int
+   events: List[str]
+
 class BookInsight(BaseModel):
    overview: str
    key_scriptures: List[str]
@@ -37,17 +53,64 @@ class VerseInfo(BaseModel):
    chapter: int
    book: str
 
+class PassageSection(BaseModel):
+   reference: str
+   verses: List[VerseInfo]
+
+class PassageResponse(BaseModel):
+   reference: str
+   passages: List[PassageSection]
+   verse_count: int
+   truncated: bool
+
+class SearchHit(BaseModel):
+   kind: str
+   text: str
+   score: float
+   book: Optional[str] = None
+   chapter: Optional[int] = None
+   verse: Optional[int] = None
+   metadata: Optional[Dict[str, Any]] = None
+   matched_by: List[str]
+
+class SearchResponse(BaseModel):
+   query: str
+   total: int
+   hits: List[SearchHit]
+   fused: bool
+   timings_ms: Dict[str, float]
+
+class RelatedPassage(BaseModel):
+   kind: str
+   score: float
+   text: str = ""
+   book: Optional[str] = None
+   chapter: Optional[int] = None
+   verse: Optional[int] = None
+   metadata: Optional[Dict[str, Any]] = None
+
+class RelatedPassagesResponse(BaseModel):
+   book: str
+   chapter: int
+   verse: int
+   related: List[RelatedPassage]
+
 class EventExplanationRequest(BaseModel):
    book: str
    verse: str
    theme: str
 
+class SemanticMatch(BaseModel):
+   verse: str
+   score: float
+
 class EventExplanationResponse(BaseModel):
    explanation: str
    book: str
    verse: str
    theme: str
    created_at: str = Field(default_factory=lambda: datetime.utcnow().isoformat())
+   semantic_match: Optional[SemanticMatch] = None
 
 class VerseExplanationRequest(BaseModel):
    book: str
@@ -60,3 +123,7 @@ class VerseExplanationResponse(BaseModel):
    chapter: int
    verse: int
    created_at: str = Field(default_factory=lambda: datetime.utcnow().isoformat())
+
+class BatchExplanationRequest(BaseModel):
+   verses: List[VerseExplanationRequest] = []
+   events: List[EventExplanationRequest] = []
@@ -0,0 +1,187 @@
+# This module is a batch job that pre-generates explanations so readers never wait on Gemini.
+#
+# It enumerates verse keys (from bible_esv, via the verse store) or event keys (from
+# theme_connections), skips keys that are already cached or already recorded in the
+# checkpoint file, and runs the same retrieval and generation pipeline as the
+# explain endpoints under a concurrency limit and a per-minute rate budget.
+#
+# Usage (from the backend directory):
+#    python prewarm.py verses --books John Romans --concurrency 4 --rate 60
+#    python prewarm.py events --themes covenant faith --stub-model
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from database import connect_db, close_db_connection
+from explanation_cache import close_explanation_caches
+from generation_scheduler import BACKGROUND, RateLimiter
+from data_loader import load_all_data
+from verse_store import build_verse_store_from_db, get_verse_store
+from routers.explanations import build_event_explanation, build_verse_explanation
+
+DEFAULT_CHECKPOINT = str(Path(__file__).parent / "data" / "prewarm_checkpoint.json")
+CHECKPOINT_EVERY = 10
+
+class Checkpoint:
+   """Records completed keys in a JSON file so an interrupted run can resume."""
+
+   def __init__(self, path: str):
+       self.path = Path(path)
+       self.done: Set[str] = set()
+       self._unsaved = 0
+       if self.path.exists():
+           with open(self.path, "r", encoding="utf-8") as f:
+               self.done = set(json.load(f).get("done", []))
+
+   def mark(self, key: str) -> None:
+       self.done.add(key)
+       self._unsaved += 1
+       if self._unsaved >= CHECKPOINT_EVERY:
+           self.save()
+
+   def save(self) -> None:
+       self.path.parent.mkdir(parents=True, exist_ok=True)
+       tmp = self.path.with_suffix(".tmp")
+       with open(tmp, "w", encoding="utf-8") as f:
+           json.dump({"done": sorted(self.done)}, f)
+       os.replace(tmp, self.path)
+       self._unsaved = 0
+
+async def verse_keys(db, books: Optional[List[str]]) -> List[Tuple]:
+   """
+   All (book, chapter, verse) keys for the chosen books (all books if None). Verse
+   numbers come from the text itself: ESV chapters skip omitted verses (Matthew 17:21).
+   """
+   store = get_verse_store() or await build_verse_store_from_db(db)
+   keys = []
+   for book in books or store.books:
+       for chapter in store.chapters(book) or []:
+           for verse in store.verses(book, chapter["number"]) or []:
+               keys.append(("verse", book, chapter["number"], verse["verse"]))
+   return keys
+
+async def event_keys(db, themes: Optional[List[str]]) -> List[Tuple]:
+   """All (book name, event, theme name) keys in theme_connections for the chosen theme ids."""
+   data = await load_all_data(db)
+   book_names = {book.get("id"): book.get("name") for book in data["books"]}
+   keys = []
+   for theme in data["themes"]:
+       if themes and theme["id"] not in themes:
+           continue
+       for connection in data["theme_connections"].get(theme["id"], []):
+           book = book_names.get(connection["bookId"])
+           if not book:
+               continue
+           for event in connection.get("events", []):
+               keys.append(("event", book, event, theme["name"]))
+   return keys
+
+def key_id(key: Tuple) -> str:
+   return "|".join(str(part) for part in key)
+
+async def is_cached(db, key: Tuple) -> bool:
+   if key[0] == "verse":
+       query = {"book": key[1], "chapter": key[2], "verse": key[3]}
+       return await db["verse_explanations"].find_one(query, {"_id": 1}) is not None
+   query = {"book": key[1], "verse": key[2], "theme": key[3]}
+   return await db["event_explanations"].find_one(query, {"_id": 1}) is not None
+
+async def generate(db, key: Tuple) -> Dict:
+   if key[0] == "verse":
+       return await build_verse_explanation(db, key[1], key[2], key[3], priority=BACKGROUND)
+   return await build_event_explanation(db, key[1], key[2], key[3], priority=BACKGROUND)
+
+async def prewarm(db, keys: List[Tuple], concurrency: int, rate_per_minute: float,
+                  checkpoint: Checkpoint, limit: Optional[int] = None) -> Dict:
+   """Generates every uncached key; returns a throughput report."""
+   report = {"keys": len(keys), "checkpointed": 0, "cached": 0, "generated": 0, "failed": 0}
+   latencies: List[float] = []
+   pending = []
+   for key in keys:
+       if key_id(key) in checkpoint.done:
+           report["checkpointed"] += 1
+       else:
+           pending.append(key)
+   if limit is not None:
+       pending = pending[:limit]
+
+   queue: asyncio.Queue = asyncio.Queue()
+   for key in pending:
+       queue.put_nowait(key)
+   limiter = RateLimiter(rate_per_minute, burst=concurrency)
+   started = time.perf_counter()
+
+   async def worker():
+       while True:
+           try:
+               key = queue.get_nowait()
+           except asyncio.QueueEmpty:
+               return
+           try:
+               if await is_cached(db, key):
+                   report["cached"] += 1
+               else:
+                   await limiter.acquire()
+                   t0 = time.perf_counter()
+                   await generate(db, key)
+                   latencies.append(time.perf_counter() - t0)
+                   report["generated"] += 1
+               checkpoint.mark(key_id(key))
+           except Exception as e:
+               report["failed"] += 1
+               print(f"Failed {key_id(key)}: {getattr(e, 'detail', e)}")
+           done = report["cached"] + report["generated"] + report["failed"]
+           if done % 25 == 0:
+               elapsed = time.perf_counter() - started
+               print(f"{done}/{len(pending)} processed, {report['generated'] / elapsed * 60:.1f} generations/min")
+
+   try:
+       await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+   finally:
+       checkpoint.save()
+
+   elapsed = time.perf_counter() - started
+   latencies.sort()
+   report.update({
+       "seconds": round(elapsed, 2),
+       "generations_per_minute": round(report["generated"] / elapsed * 60, 1) if elapsed else 0.0,
+       "p50_generation_seconds": round(latencies[len(latencies) // 2], 3) if latencies else None,
+       "max_generation_seconds": round(latencies[-1], 3) if latencies else None,
+   })
+   return report
+
+async def main(args) -> None:
+   if args.stub_model:
+       from ai_stubs import install_stubs
+       install_stubs(generation_latency_ms=args.stub_latency_ms)
+
+   db = await connect_db()
+   try:
+       if args.kind == "verses":
+           keys = await verse_keys(db, args.books)
+       else:
+           keys = await event_keys(db, args.themes)
+       checkpoint = Checkpoint(args.checkpoint)
+       report = await prewarm(db, keys, args.concurrency, args.rate, checkpoint, args.limit)
+   finally:
+       await close_explanation_caches()
+       close_db_connection()
+   print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+   parser = argparse.ArgumentParser(description="Pre-generate verse or event explanations.")
+   parser.add_argument("kind", choices=["verses", "events"])
+   parser.add_argument("--books", nargs="+", help="Books to pre-generate verses for (default: all)")
+   parser.add_argument("--themes", nargs="+", help="Theme ids to pre-generate events for (default: all)")
+   parser.add_argument("--concurrency", type=int, default=4, help="Concurrent generations")
+   parser.add_argument("--rate", type=float, default=60, help="Maximum generations per minute (0 for unlimited)")
+   parser.add_argument("--limit", type=int, help="Stop after this many keys")
+   parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="Checkpoint file for resuming")
+   parser.add_argument("--stub-model", action="store_true", help="Use offline stub embedding and generation models")
+   parser.add_argument("--stub-latency-ms", type=float, default=200, help="Stub generation latency")
+   asyncio.run(main(parser.parse_args()))
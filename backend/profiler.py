@@ -0,0 +1,167 @@
+# This module provides an on-demand sampling profiler for the event loop thread.
+#
+# While a session runs, an ITIMER_PROF timer sends SIGPROF every `interval_ms` of
+# process CPU time. Python runs the handler on the main thread, where uvicorn runs
+# the event loop, between two bytecodes of whatever it was executing, so each
+# sample is the loop's stack at an unbiased point in its CPU time. (A sampling
+# thread would only ever see the loop where it releases the GIL.) Samples are
+# attributed to a request when ProfilerMiddleware's frame for that request is on
+# the stack; the middleware registers its frame only for the chosen fraction of
+# requests, and other samples are counted as idle or other. Stacks are aggregated
+# in collapsed form ("route;outer;...;inner count"), which flame graph tools read
+# directly. Outside a session no timer runs and the middleware costs one global
+# lookup per request.
+
+import os
+import random
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() == "true"
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+
+MAX_STACK_DEPTH = 128
+MAX_DISTINCT_STACKS = 20000
+IDLE_FUNCTIONS = {"select", "poll", "epoll", "kqueue", "_run_once"}
+
+_session: Optional["ProfileSession"] = None
+
+def _frame_label(frame) -> str:
+   code = frame.f_code
+   name = getattr(code, "co_qualname", code.co_name)
+   return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class ProfileSession:
+   """One sampling window over the main thread."""
+
+   def __init__(self, seconds: float, interval_ms: float, request_fraction: float):
+       self.seconds = min(seconds, PROFILER_MAX_SECONDS)
+       self.interval = max(1.0, interval_ms) / 1000.0
+       self.request_fraction = request_fraction
+       # Middleware frame -> (ASGI scope, stacks so far) of each selected request in progress.
+       # Stacks are tagged with the route when the request ends, once routing has run.
+       self.requests: Dict[object, Tuple[dict, Counter]] = {}
+       self.stacks: Counter = Counter()
+       self.routes: Counter = Counter()
+       self.samples = 0
+       self.idle = 0
+       self.other = 0
+       self.selected_requests = 0
+       self.started = 0.0
+       self.elapsed = 0.0
+       self._previous_handler = None
+
+   def start(self) -> None:
+       self.started = time.perf_counter()
+       self._previous_handler = signal.signal(signal.SIGPROF, self._on_signal)
+       signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+   def stop(self) -> None:
+       signal.setitimer(signal.ITIMER_PROF, 0)
+       signal.signal(signal.SIGPROF, self._previous_handler or signal.SIG_DFL)
+       self.elapsed = time.perf_counter() - self.started
+       for frame in list(self.requests):
+           self.finish_request(frame)
+
+   def finish_request(self, frame) -> None:
+       """Adds a finished request's stacks to the totals under its route."""
+       entry = self.requests.pop(frame, None)
+       if entry is None:
+           return
+       scope, stacks = entry
+       route = getattr(scope.get("route"), "path", None) or "unmatched"
+       tag = f"{scope.get('method', '')} {route}"
+       for stack, count in stacks.items():
+           self.routes[tag] += count
+           key = f"{tag};{stack}"
+           if key in self.stacks or len(self.stacks) < MAX_DISTINCT_STACKS:
+               self.stacks[key] += count
+           else:
+               self.stacks[f"{tag};[other stacks]"] += count
+
+   def _on_signal(self, signum, frame) -> None:
+       if frame is not None:
+           self._sample(frame)
+
+   def _sample(self, frame) -> None:
+       self.samples += 1
+       labels: List[str] = []
+       entry = None
+       depth = 0
+       innermost = frame
+       while frame is not None and depth < MAX_STACK_DEPTH:
+           entry = self.requests.get(frame)
+           if entry is not None:
+               break
+           labels.append(_frame_label(frame))
+           frame = frame.f_back
+           depth += 1
+       if entry is None:
+           if innermost.f_code.co_name in IDLE_FUNCTIONS:
+               self.idle += 1
+           else:
+               self.other += 1
+           return
+       entry[1][";".join(reversed(labels))] += 1
+
+   def collapsed(self) -> str:
+       """Stacks in the collapsed format read by flamegraph.pl, speedscope and similar tools."""
+       return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+   def summary(self, top: int = 50) -> Dict:
+       return {
+           "seconds": round(self.elapsed, 3),
+           "interval_ms": round(self.interval * 1000, 3),
+           "request_fraction": self.request_fraction,
+           "samples": self.samples,
+           "request_samples": sum(self.routes.values()),
+           "idle_samples": self.idle,
+           "other_samples": self.other,
+           "selected_requests": self.selected_requests,
+           "routes": dict(self.routes.most_common()),
+           "stacks": [{"stack": stack, "count": count} for stack, count in self.stacks.most_common(top)],
+       }
+
+def active_session() -> Optional[ProfileSession]:
+   return _session
+
+def begin_session(seconds: float, interval_ms: float, request_fraction: float) -> ProfileSession:
+   """Starts sampling; must be called from the event loop, on the main thread."""
+   global _session
+   if _session is not None:
+       raise RuntimeError("A profiling session is already running")
+   if not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+       raise RuntimeError("Profiling needs SIGPROF and an event loop on the main thread")
+   session = ProfileSession(seconds, interval_ms, request_fraction)
+   _session = session
+   session.start()
+   return session
+
+def end_session(session: ProfileSession) -> None:
+   global _session
+   session.stop()
+   if _session is session:
+       _session = None
+
+class ProfilerMiddleware:
+   """Pure ASGI middleware marking the requests a running profiling session samples."""
+
+   def __init__(self, app):
+       self.app = app
+
+   async def __call__(self, scope, receive, send):
+       session = _session
+       if session is None or scope["type"] != "http" or random.random() >= session.request_fraction:
+           await self.app(scope, receive, send)
+           return
+       frame = sys._getframe()
+       session.requests[frame] = (scope, Counter())
+       session.selected_requests += 1
+       try:
+           await self.app(scope, receive, send)
+       finally:
+           session.finish_request(frame)
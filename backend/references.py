@@ -0,0 +1,258 @@
+# This module parses scripture references and fetches the passages they cover.
+#
+# A reference such as "John 3:16-21", "Romans 8; 12:1-2", "Matthew 5-7" or
+# "Genesis 50:20-Exodus 1:7" is parsed into ordered PassageRanges. The ranges are
+# then read from the verse store when it is loaded, or fetched from bible_esv with
+# a single aggregation that matches, orders and caps every range at once.
+
+import os
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+PASSAGE_MAX_VERSES = int(os.getenv("PASSAGE_MAX_VERSES", "500"))
+
+# A bare number after one of these books is a verse ("Jude 3"), not a chapter (names as normalized below).
+SINGLE_CHAPTER_BOOKS = {"obadiah", "philemon", "2john", "3john", "jude"}
+
+LAST = 999  # Stands for "to the end of the chapter" / "to the last chapter".
+
+_BOOK_PART = re.compile(r"^\s*((?:[1-3]\s*)?[A-Za-z][A-Za-z .]*?)\.?\s*(?=\d|$)(.*)$")
+_LOCATION = re.compile(r"^\s*(\d+)\s*(?::\s*(\d+))?\s*$")
+_DASHES = re.compile(r"\s*[-–—]\s*")
+
+class InvalidReference(ValueError):
+   """Raised when a reference cannot be parsed or names an unknown book."""
+
+class PassageRange:
+   """An inclusive range of verses; a None verse means the start or end of the chapter."""
+
+   __slots__ = ("start_book", "start_chapter", "start_verse", "end_book", "end_chapter", "end_verse")
+
+   def __init__(self, start_book: str, start_chapter: int, start_verse: Optional[int],
+                end_book: str, end_chapter: int, end_verse: Optional[int]):
+       self.start_book = start_book
+       self.start_chapter = start_chapter
+       self.start_verse = start_verse
+       self.end_book = end_book
+       self.end_chapter = end_chapter
+       self.end_verse = end_verse
+
+   def label(self) -> str:
+       """The canonical spelling of the range, e.g. 'John 3:16-21', 'Matthew 5-7' or 'Ruth'."""
+       whole_start = self.start_chapter == 1 and self.start_verse is None
+       whole_end = self.end_chapter == LAST
+       if self.end_book == self.start_book and whole_start and whole_end:
+           return self.start_book
+       start = f"{self.start_book} {self.start_chapter}" + (f":{self.start_verse}" if self.start_verse is not None else "")
+       if self.end_book != self.start_book:
+           if whole_end:
+               end = self.end_book
+           else:
+               end = f"{self.end_book} {self.end_chapter}" + (f":{self.end_verse}" if self.end_verse is not None else "")
+       elif whole_end:
+           end = "end"
+       elif self.end_chapter != self.start_chapter:
+           end = f"{self.end_chapter}" + (f":{self.end_verse}" if self.end_verse is not None else "")
+       elif self.end_verse != self.start_verse and self.end_verse is not None:
+           end = f"{self.end_verse}"
+       else:
+           return start
+       return f"{start}-{end}"
+
+   def bounds(self, book_order: Dict[str, int]) -> Tuple[Tuple[int, int, int], Tuple[int, int, int]]:
+       """(book position, chapter, verse) of the first and last verse the range can cover."""
+       return (
+           (book_order.get(self.start_book, -1), self.start_chapter, self.start_verse or 0),
+           (book_order.get(self.end_book, -1), self.end_chapter, self.end_verse or LAST),
+       )
+
+def _normalize(name: str) -> str:
+   return re.sub(r"[\s.]+", "", name).lower()
+
+class BookResolver:
+   """Resolves book names case-insensitively, ignoring spaces, and by unique prefix ('Rom', '1 Cor')."""
+
+   def __init__(self, books: Sequence[str]):
+       self.books = list(books)
+       self._exact = {_normalize(book): book for book in self.books}
+
+   def resolve(self, name: str) -> str:
+       key = _normalize(name)
+       if key in self._exact:
+           return self._exact[key]
+       matches = [book for normalized, book in self._exact.items() if normalized.startswith(key)]
+       if len(matches) == 1 and len(key) >= 2:
+           return matches[0]
+       raise InvalidReference(f"Unknown book '{name.strip()}'")
+
+def _split_book(text: str, resolver: BookResolver) -> Tuple[Optional[str], str]:
+   """Splits a leading book name off a reference part."""
+   if not re.match(r"^\s*(?:[1-3]\s*)?[A-Za-z]", text):
+       return None, text
+   match = _BOOK_PART.match(text)
+   if not match:
+       raise InvalidReference(f"Cannot parse '{text.strip()}'")
+   return resolver.resolve(match.group(1)), match.group(2)
+
+def _location(text: str) -> Tuple[int, Optional[int]]:
+   match = _LOCATION.match(text)
+   if not match:
+       raise InvalidReference(f"Cannot parse '{text.strip()}'")
+   return int(match.group(1)), int(match.group(2)) if match.group(2) else None
+
+def parse_reference(reference: str, books: Sequence[str]) -> List[PassageRange]:
+   """
+   Parses a reference into ranges, in the order written. Parts separated by ';'
+   start a new chapter context and parts separated by ',' continue the current
+   one, so 'Romans 8; 12:1-2' is two chapters of Romans and 'John 3:16, 18' is
+   two verses of John 3. A book name alone covers the whole book.
+   """
+   resolver = BookResolver(books)
+   positions = {name: i for i, name in enumerate(resolver.books)}
+   ranges: List[PassageRange] = []
+   book: Optional[str] = None
+   chapter: Optional[int] = None
+
+   for segment in reference.split(";"):
+       verse_context = False
+       for part in segment.split(","):
+           if not part.strip():
+               continue
+           pieces = _DASHES.split(part.strip(), maxsplit=1)
+           named, rest = _split_book(pieces[0], resolver)
+           if named:
+               book, verse_context = named, False
+           if book is None:
+               raise InvalidReference(f"'{part.strip()}' does not name a book")
+
+           if rest.strip():
+               first, second = _location(rest)
+               if second is not None:
+                   start_chapter, start_verse = first, second
+               elif verse_context:
+                   start_chapter, start_verse = chapter, first
+               elif _normalize(book) in SINGLE_CHAPTER_BOOKS:
+                   start_chapter, start_verse = 1, first
+               else:
+                   start_chapter, start_verse = first, None
+               end_chapter, end_verse = start_chapter, start_verse
+           else:
+               start_chapter, start_verse, end_chapter, end_verse = 1, None, LAST, None
+
+           end_book = book
+           if len(pieces) > 1:
+               end_named, end_rest = _split_book(pieces[1], resolver)
+               end_book = end_named or book
+               if not end_rest.strip():
+                   if not end_named:
+                       raise InvalidReference(f"Cannot parse '{part.strip()}'")
+                   end_chapter, end_verse = LAST, None
+               else:
+                   first, second = _location(end_rest)
+                   if second is not None:
+                       end_chapter, end_verse = first, second
+                   elif end_named:
+                       single = _normalize(end_named) in SINGLE_CHAPTER_BOOKS
+                       end_chapter, end_verse = (1, first) if single else (first, None)
+                   elif start_verse is not None:
+                       end_chapter, end_verse = start_chapter, first
+                   else:
+                       end_chapter, end_verse = first, None
+               start_key = (positions[book], start_chapter, start_verse or 0)
+               if (positions[end_book], end_chapter, end_verse or LAST) < start_key:
+                   raise InvalidReference(f"Range '{part.strip()}' ends before it starts")
+
+           ranges.append(PassageRange(book, start_chapter, start_verse, end_book, end_chapter, end_verse))
+           book, chapter = end_book, end_chapter
+           verse_context = end_verse is not None
+
+   if not ranges:
+       raise InvalidReference("Empty reference")
+   return ranges
+
+def canonical_book_order(books: List[Dict], store=None) -> List[str]:
+   """Book names ordered by book id, followed by any books only the verse store knows."""
+   order = [book.get("name") for book in books if book.get("name")]
+   if store is not None:
+       known = set(store.books)
+       order = [name for name in order if name in known]
+       order += [name for name in store.books if name not in set(order)]
+   return order
+
+def read_from_store(store, ranges: List[PassageRange], book_order: List[str],
+                    max_verses: int) -> Tuple[List[List[Dict]], bool]:
+   """Reads each range from the verse store; returns per-range verses and whether the cap was hit."""
+   positions = {book: i for i, book in enumerate(book_order)}
+   results: List[List[Dict]] = []
+   remaining, truncated = max_verses, False
+   for passage in ranges:
+       lo, hi = passage.bounds(positions)
+       verses: List[Dict] = []
+       for b in range(lo[0], hi[0] + 1) if lo[0] >= 0 else ():
+           first = lo[1:] if b == lo[0] else (0, 0)
+           last = hi[1:] if b == hi[0] else (LAST, LAST)
+           start, stop = store.verse_span(book_order[b], first, last)
+           take = min(stop - start, remaining)
+           verses.extend(store.verse_slice(start, start + take))
+           remaining -= take
+           if take < stop - start:
+               truncated = True
+               break
+       results.append(verses)
+       if truncated:
+           break
+   results += [[] for _ in range(len(ranges) - len(results))]
+   return results, truncated
+
+def passage_pipeline(ranges: List[PassageRange], book_order: List[str], max_verses: int) -> List[Dict]:
+   """
+   One bible_esv aggregation for all ranges: an indexed $match on books and
+   chapters, an exact range test that lists every range a verse falls in, an
+   $unwind into one copy per range (so overlapping ranges each get the verse, as
+   read_from_store returns them), then a sort into reference order and a cap of
+   max_verses + 1 (the extra verse marks truncation).
+   """
+   positions = {book: i for i, book in enumerate(book_order)}
+   spans = [passage.bounds(positions) for passage in ranges]
+   involved = sorted({b for lo, hi in spans for b in range(lo[0], hi[0] + 1)})
+   match, tags = [], []
+   # Verses are compared by one key packing book position, chapter and verse into a number.
+   book_position = {"$switch": {
+       "branches": [{"case": {"$eq": ["$book", book_order[b]]}, "then": b} for b in involved],
+       "default": -1,
+   }}
+   key = {"$add": [{"$multiply": [book_position, 1000000]}, {"$multiply": ["$chapter", 1000]}, "$verse"]}
+   for i, (lo, hi) in enumerate(spans):
+       books = book_order[lo[0]:hi[0] + 1]
+       if len(books) == 1:
+           match.append({"book": books[0], "chapter": {"$gte": lo[1], "$lte": hi[1]}})
+       else:
+           match.append({"book": {"$in": books}})
+       tags.append({"$cond": [
+           {"$and": [
+               {"$gte": [key, lo[0] * 1000000 + lo[1] * 1000 + lo[2]]},
+               {"$lte": [key, hi[0] * 1000000 + hi[1] * 1000 + hi[2]]},
+           ]},
+           [i],
+           [],
+       ]})
+   return [
+       {"$match": {"$or": match}},
+       {"$addFields": {"range": {"$concatArrays": tags}, "sort_key": key}},
+       # Verses in no range have an empty list and are dropped here.
+       {"$unwind": "$range"},
+       {"$sort": {"range": 1, "sort_key": 1}},
+       {"$limit": max_verses + 1},
+       {"$project": {"_id": 0, "book": 1, "chapter": 1, "verse": 1, "text": 1, "range": 1}},
+   ]
+
+async def fetch_from_db(db, ranges: List[PassageRange], book_order: List[str],
+                        max_verses: int) -> Tuple[List[List[Dict]], bool]:
+   """Fetches every range with one aggregation; returns per-range verses and whether the cap was hit."""
+   order = list(book_order) + [b for p in ranges for b in (p.start_book, p.end_book) if b not in book_order]
+   docs = await db["bible_esv"].aggregate(passage_pipeline(ranges, order, max_verses)).to_list(length=None)
+   truncated = len(docs) > max_verses
+   results: List[List[Dict]] = [[] for _ in ranges]
+   for doc in docs[:max_verses]:
+       results[doc.pop("range")].append(doc)
+   return results, truncated
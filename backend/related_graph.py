@@ -0,0 +1,259 @@
+# This module provides a precomputed related-passages graph over verses and commentary.
+#
+# An offline job (`python related_graph.py`) reads the embeddings of bible_esv
+# (where present) and commentary_chunks and keeps, for every node, its k nearest
+# verses and its k nearest commentary chunks, so neither kind crowds out the
+# other. Rows are normalized once; similarities are computed a block of rows at
+# a time as one matrix product against all candidates, and argpartition picks
+# each row's k best without sorting the rest. Neighbours in the same chapter (or
+# the same commentary page) are left out, since they are the obvious context
+# rather than related passages. Each list is a (nodes, k) array of neighbour ids
+# (int32, -1 for none) with one of cosine similarities (float16), saved as .npy
+# and memory-mapped by the API, so a lookup reads two short rows.
+
+import argparse
+import asyncio
+import json
+import os
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+RELATED_GRAPH_PATH = os.getenv("RELATED_GRAPH_PATH", str(Path(__file__).parent / "data" / "related_graph"))
+RELATED_GRAPH_K = int(os.getenv("RELATED_GRAPH_K", "10"))
+
+# Rows scored per matrix product; bounds the (block, nodes) score matrix (~64 MB for 32k nodes).
+GRAPH_BLOCK_ROWS = 512
+KINDS = ("verse", "commentary")
+ARRAY_NAMES = ("verse_neighbours", "verse_similarities", "commentary_neighbours", "commentary_similarities")
+COMMENTARY_FIELDS = ("chunk_id", "text", "source", "page", "section", "sub_section", "chapter_title", "book")
+
+_graph = None
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+   norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+   return vectors / np.where(norms == 0, 1, norms)
+
+def top_k_neighbours(rows: np.ndarray, columns: np.ndarray, row_groups: np.ndarray, column_groups: np.ndarray,
+                     k: int, block_rows: int = GRAPH_BLOCK_ROWS) -> Tuple[np.ndarray, np.ndarray]:
+   """
+   Returns (neighbours, similarities), both (len(rows), k) and best first: for
+   each unit-length row vector, the k most similar column vectors, skipping
+   columns in the row's own group. Missing neighbours are -1.
+   """
+   neighbours = np.full((rows.shape[0], k), -1, dtype=np.int32)
+   similarities = np.zeros((rows.shape[0], k), dtype=np.float16)
+   found_k = min(k, columns.shape[0])
+   if found_k == 0:
+       return neighbours, similarities
+   kth = columns.shape[0] - found_k
+   for start in range(0, rows.shape[0], block_rows):
+       stop = min(start + block_rows, rows.shape[0])
+       scores = rows[start:stop] @ columns.T
+       scores[row_groups[start:stop, None] == column_groups[None, :]] = -np.inf
+       # Partition the k largest into the last k slots; nothing else gets sorted.
+       top = np.argpartition(scores, kth, axis=1)[:, kth:]
+       top_scores = np.take_along_axis(scores, top, axis=1)
+       order = np.argsort(-top_scores, axis=1)
+       top = np.take_along_axis(top, order, axis=1)
+       top_scores = np.take_along_axis(top_scores, order, axis=1)
+       found = np.isfinite(top_scores)
+       neighbours[start:stop, :found_k] = np.where(found, top, -1)
+       similarities[start:stop, :found_k] = np.where(found, top_scores, 0)
+   return neighbours, similarities
+
+class RelatedGraph:
+   """
+   Top-k verse and top-k commentary neighbours of every verse (located by book,
+   chapter and verse) and commentary chunk. Neighbour ids index `verses` or
+   `commentary`; node ids are verse positions followed by commentary positions.
+   """
+
+   def __init__(self, verses: List[List], commentary: List[Dict], arrays: Dict[str, np.ndarray]):
+       self.verses = verses
+       self.commentary = commentary
+       self.arrays = arrays
+       self.verse_count = len(verses)
+       self.verse_nodes = {(book, chapter, verse): i for i, (book, chapter, verse) in enumerate(verses)}
+
+   @classmethod
+   def from_embeddings(cls, verses: List[List], verse_embeddings: Sequence[Sequence[float]],
+                       commentary: List[Dict], commentary_embeddings: Sequence[Sequence[float]],
+                       k: int = RELATED_GRAPH_K, block_rows: int = GRAPH_BLOCK_ROWS) -> "RelatedGraph":
+       """Builds the graph; verses are [book, chapter, verse] and commentary the metadata of each chunk."""
+       verse_vectors = np.asarray(verse_embeddings, dtype=np.float32)
+       commentary_vectors = np.asarray(commentary_embeddings, dtype=np.float32)
+       if len(verses) and len(commentary) and verse_vectors.shape[1] != commentary_vectors.shape[1]:
+           raise ValueError("Verse and commentary embeddings have different dimensions")
+       dim = verse_vectors.shape[1] if len(verses) else (commentary_vectors.shape[1] if len(commentary) else 0)
+       if dim:
+           nodes = _normalize(np.concatenate([verse_vectors.reshape(-1, dim), commentary_vectors.reshape(-1, dim)]))
+       else:
+           nodes = np.zeros((0, 0), dtype=np.float32)
+
+       group_ids: Dict[Tuple, int] = {}
+       groups = [group_ids.setdefault((book, chapter), len(group_ids)) for book, chapter, _ in verses]
+       for i, doc in enumerate(commentary):
+           page = (doc.get("source"), doc.get("page")) if doc.get("page") is not None else ("chunk", i)
+           groups.append(group_ids.setdefault(page, len(group_ids)))
+       groups = np.asarray(groups, dtype=np.int32)
+
+       arrays = {}
+       for kind, columns in (("verse", slice(0, len(verses))), ("commentary", slice(len(verses), None))):
+           arrays[f"{kind}_neighbours"], arrays[f"{kind}_similarities"] = top_k_neighbours(
+               nodes, nodes[columns], groups, groups[columns], k, block_rows
+           )
+       return cls(verses, commentary, arrays)
+
+   @classmethod
+   def load(cls, path: str, mmap: bool = True) -> "RelatedGraph":
+       """Loads a graph written by save(), memory-mapping the arrays by default."""
+       directory = Path(path)
+       with open(directory / "graph.json", "r", encoding="utf-8") as f:
+           meta = json.load(f)
+       mode = "r" if mmap else None
+       arrays = {name: np.load(directory / f"{name}.npy", mmap_mode=mode) for name in ARRAY_NAMES}
+       return cls([tuple(key) for key in meta["verses"]], meta["commentary"], arrays)
+
+   def save(self, path: str) -> None:
+       """Writes one .npy file per array plus graph.json (verse keys, commentary metadata)."""
+       directory = Path(path)
+       directory.mkdir(parents=True, exist_ok=True)
+       for name in ARRAY_NAMES:
+           np.save(directory / f"{name}.npy", self.arrays[name])
+       with open(directory / "graph.json", "w", encoding="utf-8") as f:
+           json.dump({"k": self.k, "verses": self.verses, "commentary": self.commentary}, f, ensure_ascii=False)
+
+   @property
+   def k(self) -> int:
+       return self.arrays["verse_neighbours"].shape[1]
+
+   @property
+   def node_count(self) -> int:
+       return self.verse_count + len(self.commentary)
+
+   @property
+   def nbytes(self) -> int:
+       return sum(array.nbytes for array in self.arrays.values())
+
+   def _neighbours(self, node: int, kind: str) -> List[Tuple[float, int, str]]:
+       ids = self.arrays[f"{kind}_neighbours"][node].tolist()
+       similarities = self.arrays[f"{kind}_similarities"][node].tolist()
+       return [(similarity, i, kind) for i, similarity in zip(ids, similarities) if i >= 0]
+
+   def related(self, book: str, chapter: int, verse: int, limit: int = RELATED_GRAPH_K,
+               kind: Optional[str] = None) -> Optional[List[Dict]]:
+       """
+       Returns up to `limit` (at most k per kind) passages related to a verse, best
+       first, or None if the verse is not in the graph. Verse results carry book,
+       chapter and verse; commentary results carry text and metadata. Scores are on
+       the Atlas scale, (1 + cos) / 2.
+       """
+       node = self.verse_nodes.get((book, chapter, verse))
+       if node is None:
+           return None
+       candidates = []
+       for candidate_kind in KINDS:
+           if kind in (None, candidate_kind):
+               candidates += self._neighbours(node, candidate_kind)
+       candidates.sort(key=lambda candidate: -candidate[0])
+
+       results = []
+       for similarity, i, candidate_kind in candidates[:limit]:
+           score = round((1.0 + similarity) / 2.0, 4)
+           if candidate_kind == "verse":
+               book_name, chapter_number, verse_number = self.verses[i]
+               results.append({"kind": "verse", "book": book_name, "chapter": chapter_number,
+                               "verse": verse_number, "score": score})
+           else:
+               doc = self.commentary[i]
+               metadata = {key: value for key, value in doc.items() if key != "text"}
+               results.append({"kind": "commentary", "text": doc.get("text", ""), "metadata": metadata, "score": score})
+       return results
+
+async def build_related_graph_from_db(db, k: int = RELATED_GRAPH_K,
+                                      embed_missing: Optional[Callable] = None) -> RelatedGraph:
+   """
+   Builds the graph from the embeddings stored in bible_esv and commentary_chunks.
+   With `embed_missing` (async, texts -> vectors), verses without a stored
+   embedding are embedded for this build; the vectors are not written back.
+   """
+   verses, verse_embeddings, missing = [], [], []
+   cursor = db["bible_esv"].find({}, {"_id": 0, "book": 1, "chapter": 1, "verse": 1, "text": 1, "embedding": 1})
+   async for doc in cursor:
+       if not doc.get("book") or doc.get("chapter") is None or doc.get("verse") is None:
+           continue
+       key = [doc["book"], int(doc["chapter"]), int(doc["verse"])]
+       if doc.get("embedding"):
+           verses.append(key)
+           verse_embeddings.append(doc["embedding"])
+       elif embed_missing is not None and doc.get("text"):
+           missing.append((key, doc["text"]))
+   if missing:
+       vectors = await embed_missing([text for _, text in missing])
+       for (key, _), vector in zip(missing, vectors):
+           verses.append(key)
+           verse_embeddings.append(vector)
+
+   commentary, commentary_embeddings = [], []
+   projection = {field: 1 for field in COMMENTARY_FIELDS}
+   projection.update({"_id": 0, "embedding": 1})
+   async for doc in db["commentary_chunks"].find({"embedding": {"$exists": True}}, projection):
+       if doc.get("embedding"):
+           commentary_embeddings.append(doc.pop("embedding"))
+           commentary.append(doc)
+
+   return await asyncio.to_thread(
+       RelatedGraph.from_embeddings, verses, verse_embeddings, commentary, commentary_embeddings, k
+   )
+
+def load_related_graph(path: str = RELATED_GRAPH_PATH) -> Optional[RelatedGraph]:
+   """Loads the prebuilt graph if there is one; it is too expensive to build at startup."""
+   global _graph
+   _graph = None
+   if not (Path(path) / "graph.json").exists():
+       return None
+   try:
+       _graph = RelatedGraph.load(path)
+   except Exception as e:
+       print(f"Error loading related passages graph: {e}. Related passages are unavailable.")
+   return _graph
+
+def get_related_graph() -> Optional[RelatedGraph]:
+   """Returns the process-wide related passages graph, or None if it is not loaded."""
+   return _graph
+
+def set_related_graph(graph: Optional[RelatedGraph]) -> None:
+   """Replaces the process-wide related passages graph."""
+   global _graph
+   _graph = graph
+
+async def _build_cli(out: str, k: int, embed_verses: bool, stub_embeddings: bool) -> None:
+   from database import connect_db, close_db_connection
+   embed_missing = None
+   if embed_verses:
+       if stub_embeddings:
+           from ai_stubs import install_stubs
+           install_stubs()
+       from ai_services import embedding_batcher, get_embeddings
+       embed_missing = get_embeddings
+   db = await connect_db()
+   try:
+       graph = await build_related_graph_from_db(db, k, embed_missing)
+   finally:
+       if embed_missing is not None:
+           await embedding_batcher.close()
+       close_db_connection()
+   graph.save(out)
+   print(f"Wrote {graph.node_count} nodes ({graph.verse_count} verses, {len(graph.commentary)} commentary chunks), "
+         f"k={graph.k} ({graph.nbytes / 1024:.0f} KiB) to {out}")
+
+if __name__ == "__main__":
+   parser = argparse.ArgumentParser(description="Build the related passages graph from MongoDB embeddings.")
+   parser.add_argument("--out", default=RELATED_GRAPH_PATH, help="Output directory")
+   parser.add_argument("--k", type=int, default=RELATED_GRAPH_K, help="Neighbours kept per node")
+   parser.add_argument("--embed-verses", action="store_true", help="Embed verses that have no stored embedding")
+   parser.add_argument("--stub-embeddings", action="store_true", help="Embed with the offline stub model")
+   args = parser.parse_args()
+   asyncio.run(_build_cli(args.out, args.k, args.embed_verses, args.stub_embeddings))
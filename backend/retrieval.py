@@ -0,0 +1,102 @@
+# This module fans a query embedding out to every registered retrieval source concurrently.
+#
+# Each source runs under its own deadline. A slow or failing source contributes no
+# results but does not hold up or fail the others, so retrieval latency is that of
+# the slowest source, capped by its deadline. Results carry per-source timings.
+
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from metrics import record
+
+RETRIEVAL_DEADLINE_MS = float(os.getenv("RETRIEVAL_DEADLINE_MS", "2000"))
+
+SearchFn = Callable[..., Awaitable[List[Dict]]]
+
+class RetrievalSource:
+   """A named search function; `role` selects the prompt section its results feed."""
+
+   def __init__(self, name: str, search: SearchFn, role: str, limit: int = 3, deadline_ms: Optional[float] = None):
+       self.name = name
+       self.search = search
+       self.role = role
+       self.limit = limit
+       self.deadline_ms = deadline_ms if deadline_ms is not None else RETRIEVAL_DEADLINE_MS
+
+class RetrievalResult:
+   """Per-source results plus timing, timeout and error metadata."""
+
+   def __init__(self):
+       self.results: Dict[str, List[Dict]] = {}
+       self.roles: Dict[str, str] = {}
+       self.timings_ms: Dict[str, float] = {}
+       self.timed_out: List[str] = []
+       self.errors: Dict[str, str] = {}
+       self.total_ms = 0.0
+
+   @property
+   def partial(self) -> bool:
+       return bool(self.timed_out or self.errors)
+
+   def by_role(self, role: str) -> List[Dict]:
+       """Results of every source with this role, best score first when several sources contribute."""
+       names = [name for name, source_role in self.roles.items() if source_role == role]
+       if len(names) == 1:
+           return self.results[names[0]]
+       merged = [doc for name in names for doc in self.results[name]]
+       return sorted(merged, key=lambda doc: doc.get("score", 0.0), reverse=True)
+
+   def metadata(self) -> Dict:
+       return {
+           "timings_ms": self.timings_ms,
+           "timed_out": self.timed_out,
+           "errors": self.errors,
+           "total_ms": self.total_ms,
+       }
+
+_sources: Dict[str, RetrievalSource] = {}
+
+def register_source(name: str, search: SearchFn, role: str, limit: int = 3, deadline_ms: Optional[float] = None) -> None:
+   """
+   Registers a retrieval source. `search(db, query_embedding, limit)` must return a
+   list of documents; results from sources sharing a role are merged.
+   """
+   _sources[name] = RetrievalSource(name, search, role, limit, deadline_ms)
+
+def unregister_source(name: str) -> None:
+   _sources.pop(name, None)
+
+def registered_sources() -> List[str]:
+   return list(_sources)
+
+async def _run_source(source: RetrievalSource, db, query_embedding: List[float], result: RetrievalResult,
+                      limit: Optional[int] = None) -> None:
+   start = time.perf_counter()
+   try:
+       docs = await asyncio.wait_for(source.search(db, query_embedding, limit or source.limit), source.deadline_ms / 1000.0)
+   except asyncio.TimeoutError:
+       docs = []
+       result.timed_out.append(source.name)
+   except Exception as e:
+       docs = []
+       result.errors[source.name] = str(e)
+   elapsed = time.perf_counter() - start
+   result.results[source.name] = docs
+   result.timings_ms[source.name] = round(elapsed * 1000, 2)
+   record(f"retrieval.{source.name}", elapsed)
+
+async def retrieve(db, query_embedding: List[float], sources: Optional[List[str]] = None,
+                  limit: Optional[int] = None) -> RetrievalResult:
+   """Queries the chosen (default: all) registered sources concurrently; `limit` overrides their own."""
+   result = RetrievalResult()
+   selected = [_sources[name] for name in (sources or _sources) if name in _sources]
+   for source in selected:
+       result.roles[source.name] = source.role
+   start = time.perf_counter()
+   await asyncio.gather(*(_run_source(source, db, query_embedding, result, limit) for source in selected))
+   result.total_ms = round((time.perf_counter() - start) * 1000, 2)
+   if result.partial:
+       print(f"Partial retrieval: timed out {result.timed_out}, errors {result.errors}")
+   return result
@@ -0,0 +1,58 @@
+# This router handles operational endpoints, guarded by the ADMIN_TOKEN environment variable.
+import asyncio
+import hmac
+import os
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status, Request
+from fastapi.responses import PlainTextResponse
+from profiler import PROFILER_ENABLED, PROFILER_MAX_SECONDS, begin_session, end_session
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+router = APIRouter()
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+   """Rejects requests without the admin token; admin endpoints are disabled if none is configured."""
+   if not ADMIN_TOKEN:
+       raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+   if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+       raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid admin token")
+
+@router.post("/api/v1/admin/reload", dependencies=[Depends(require_admin)])
+async def reload_data(request: Request):
+   """Reload themes, books, insights and connections from MongoDB without a restart."""
+   return await request.app.state.refresher.reload("admin")
+
+@router.get("/api/v1/admin/data", dependencies=[Depends(require_admin)])
+async def get_data_status(request: Request):
+   """Report the live data version, where it was loaded from, and refresher counters."""
+   return {
+       "meta": request.app.state.DATA["meta"],
+       "refresher": request.app.state.refresher.stats(),
+   }
+
+@router.post("/api/v1/admin/profile", dependencies=[Depends(require_admin)])
+async def profile(
+   seconds: float = Query(10, gt=0, le=PROFILER_MAX_SECONDS),
+   interval_ms: float = Query(5, ge=1, le=1000),
+   request_fraction: float = Query(1.0, gt=0, le=1, description="Fraction of requests to sample"),
+   format: str = Query("json", pattern="^(json|collapsed)$"),
+   top: int = Query(50, ge=1, le=1000)
+):
+   """
+   Sample the event loop thread for `seconds` and return the CPU stacks of the
+   sampled requests, tagged by route, as JSON or as collapsed flame graph input.
+   """
+   if not PROFILER_ENABLED:
+       raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profiler is disabled; set PROFILER_ENABLED=true")
+   try:
+       session = begin_session(seconds, interval_ms, request_fraction)
+   except RuntimeError as e:
+       raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+   try:
+       await asyncio.sleep(session.seconds)
+   finally:
+       end_session(session)
+   if format == "collapsed":
+       return PlainTextResponse(session.collapsed())
+   return session.summary(top)
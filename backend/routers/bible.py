@@ -1,51 +1,66 @@
 
 # This router handles endpoints related to biblical books, chapters, and verses.
-from fastapi import APIRouter, HTTPException, status, Request
+from fastapi import APIRouter, HTTPException, Query, status, Request
 from typing import List, Optional
 from database import get_db
-from models import Book, BookInsight, ChapterInfo, VerseInfo
+from verse_store import get_verse_store
+from related_graph import RELATED_GRAPH_K, get_related_graph
+from catalog import catalog_response
+from metrics import span
+from references import (
+   PASSAGE_MAX_VERSES, InvalidReference, canonical_book_order, fetch_from_db, parse_reference, read_from_store
+)
+from models import Book, BookInsight, BookTheme, ChapterInfo, PassageResponse, RelatedPassagesResponse, VerseInfo
 
 router = APIRouter()
 
 @router.get("/api/v1/books", response_model=List[Book])
 async def get_books(request: Request):
    """Get all biblical books."""
-   return request.app.state.DATA["books"]
+   return catalog_response(request, request.app.state.DATA["catalog"].books)
 
 @router.get("/api/v1/books/{book_id}", response_model=Optional[Book])
 async def get_book(book_id: int, request: Request):
    """Get a specific book by ID."""
-   book = next((b for b in request.app.state.DATA["books"] if b.get("id") == book_id), None)
-   if not book:
+   compiled = request.app.state.DATA["catalog"].book.get(book_id)
+   if not compiled:
        raise HTTPException(
            status_code=status.HTTP_404_NOT_FOUND,
            detail=f"Book with ID {book_id} not found"
        )
-   return book
+   return catalog_response(request, compiled)
 
 @router.get("/api/v1/books/{book_id}/insights", response_model=BookInsight)
 async def get_book_insights(book_id: int, request: Request):
    """Get insights for a specific book."""
-   insights = request.app.state.DATA["book_insights"].get(str(book_id))
+   compiled = request.app.state.DATA["catalog"].book_insights.get(book_id)
+   if not compiled:
+       raise HTTPException(
+           status_code=status.HTTP_404_NOT_FOUND,
+           detail=f"Book with ID {book_id} not found"
+       )
+   return catalog_response(request, compiled)
 
-   if not insights:
-       book = next((b for b in request.app.state.DATA["books"] if b.get("id") == book_id), None)
-       if not book:
-           raise HTTPException(
-               status_code=status.HTTP_404_NOT_FOUND,
-               detail=f"Book with ID {book_id} not found"
-           )
-       return {
-           "overview": f"{book.get('name')} is part of the {book.get('category')} "
-                         f"section of the {book.get('testament', '').title()} Testament.",
-           "key_scriptures": [],
-           "theological_context": f"Theological insights for {book.get('name')} would be displayed here."
-       }
-   return insights
+@router.get("/api/v1/books/{book_id}/themes", response_model=List[BookTheme])
+async def get_book_themes(book_id: int, request: Request, limit: Optional[int] = Query(None, ge=1)):
+   """Get the themes connected to a book, most prominent first."""
+   themes = request.app.state.DATA["theme_matrix"].book_themes(book_id, limit)
+   if themes is None:
+       raise HTTPException(
+           status_code=status.HTTP_404_NOT_FOUND,
+           detail=f"Book with ID {book_id} not found"
+       )
+   return themes
 
 @router.get("/api/v1/books/{book}/chapters", response_model=List[ChapterInfo])
 async def get_book_chapters(book: str):
-   """Get all chapters for a specific book from the bible_esv collection."""
+   """Get all chapters for a specific book, served from the verse store when loaded."""
+   store = get_verse_store()
+   if store is not None:
+       chapters = store.chapters(book)
+       if chapters:
+           return chapters
+
    db = get_db()
    collection = db["bible_esv"]
    pipeline = [
@@ -62,7 +77,8 @@ async def get_book_chapters(book: str):
        }},
        {"$sort": {"number": 1}}
    ]
-   chapters = list(collection.aggregate(pipeline))
+   with span("mongo.chapters"):
+       chapters = await collection.aggregate(pipeline).to_list(length=None)
    if not chapters:
        raise HTTPException(
            status_code=status.HTTP_404_NOT_FOUND,
@@ -72,15 +88,96 @@ async def get_book_chapters(book: str):
 
 @router.get("/api/v1/books/{book}/chapters/{chapter_number}/verses", response_model=List[VerseInfo])
 async def get_chapter_verses(book: str, chapter_number: int):
+   """Get all verses in a chapter, served from the verse store when loaded."""
+   store = get_verse_store()
+   if store is not None:
+       verses = store.verses(book, chapter_number)
+       if verses:
+           return verses
+
    db = get_db()
    collection = db["bible_esv"]
-   verses = list(collection.find(
-       {"book": book, "chapter": chapter_number},
-       {"_id": 0, "verse": 1, "text": 1, "chapter": 1, "book": 1}
-   ).sort("verse", 1))
+   with span("mongo.verses"):
+       verses = await collection.find(
+           {"book": book, "chapter": chapter_number},
+           {"_id": 0, "verse": 1, "text": 1, "chapter": 1, "book": 1}
+       ).sort("verse", 1).to_list(length=None)
    if not verses:
        raise HTTPException(
            status_code=status.HTTP_404_NOT_FOUND,
            detail=f"No verses found for book '{book}', chapter {chapter_number}"
        )
-   return verses
\ No newline at end of file
+   return verses
+
+@router.get("/api/v1/books/{book}/chapters/{chapter_number}/verses/{verse_number}/related", response_model=RelatedPassagesResponse)
+async def get_related_passages(
+   book: str,
+   chapter_number: int,
+   verse_number: int,
+   limit: int = Query(RELATED_GRAPH_K, ge=1, le=100),
+   kind: Optional[str] = Query(None, pattern="^(verse|commentary)$")
+):
+   """Get the verses and commentary most similar to a verse, read from the precomputed graph."""
+   graph = get_related_graph()
+   if graph is None:
+       raise HTTPException(
+           status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+           detail="Related passages graph is not loaded"
+       )
+   related = graph.related(book, chapter_number, verse_number, limit, kind)
+   if related is None:
+       raise HTTPException(
+           status_code=status.HTTP_404_NOT_FOUND,
+           detail=f"No related passages for {book} {chapter_number}:{verse_number}"
+       )
+
+   verses = [item for item in related if item["kind"] == "verse"]
+   store = get_verse_store()
+   if store is not None:
+       for item in verses:
+           item["text"] = store.verse_text(item["book"], item["chapter"], item["verse"]) or ""
+   elif verses:
+       with span("mongo.related_verses"):
+           docs = await get_db()["bible_esv"].find(
+               {"$or": [{"book": item["book"], "chapter": item["chapter"], "verse": item["verse"]} for item in verses]},
+               {"_id": 0, "book": 1, "chapter": 1, "verse": 1, "text": 1}
+           ).to_list(length=None)
+       texts = {(doc["book"], doc["chapter"], doc["verse"]): doc.get("text", "") for doc in docs}
+       for item in verses:
+           item["text"] = texts.get((item["book"], item["chapter"], item["verse"]), "")
+   return {"book": book, "chapter": chapter_number, "verse": verse_number, "related": related}
+
+@router.get("/api/v1/passages", response_model=PassageResponse)
+async def get_passage(
+   request: Request,
+   ref: str = Query(..., max_length=500, description="e.g. 'John 3:16-21' or 'Romans 8; 12:1-2'"),
+   limit: int = Query(PASSAGE_MAX_VERSES, ge=1, le=PASSAGE_MAX_VERSES)
+):
+   """Get the verses of a scripture reference in reference order, in one store lookup or database query."""
+   store = get_verse_store()
+   book_order = canonical_book_order(request.app.state.DATA["books"], store)
+   try:
+       ranges = parse_reference(ref, book_order)
+   except InvalidReference as e:
+       raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+   if store is not None:
+       with span("passage.store"):
+           results, truncated = read_from_store(store, ranges, book_order, limit)
+   else:
+       with span("passage.mongo"):
+           results, truncated = await fetch_from_db(get_db(), ranges, book_order, limit)
+   if not any(results):
+       raise HTTPException(
+           status_code=status.HTTP_404_NOT_FOUND,
+           detail=f"No verses found for '{ref}'"
+       )
+   return {
+       "reference": "; ".join(passage.label() for passage in ranges),
+       "passages": [
+           {"reference": passage.label(), "verses": verses}
+           for passage, verses in zip(ranges, results)
+       ],
+       "verse_count": sum(len(verses) for verses in results),
+       "truncated": truncated,
+   }
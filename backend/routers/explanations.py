@@ -1,83 +1,118 @@
 
 # This router manages the AI-powered explanation endpoints.
 from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import StreamingResponse
 from datetime import datetime
+import asyncio
+import json
+import os
 from database import get_db
-from models import EventExplanationRequest, EventExplanationResponse, VerseExplanationRequest, VerseExplanationResponse
-from ai_services import get_embedding, generate_event_explanation, generate_verse_explanation
-from typing import List, Dict
+from explanation_cache import EXPLANATION_PROJECTION, ExplanationCache, event_explanation_cache, verse_explanation_cache
+from semantic_cache import semantic_cache
+from generation_scheduler import BACKGROUND, INTERACTIVE, GenerationOverloaded
+from metrics import span
+from singleflight import SingleFlight, mongo_lease, wait_for_document
+from verse_store import get_verse_store
+from vector_index import get_vector_index
+from retrieval import register_source, retrieve
+from models import (
+   BatchExplanationRequest, EventExplanationRequest, EventExplanationResponse,
+   VerseExplanationRequest, VerseExplanationResponse
+)
+from ai_services import (
+   get_embedding, generate_event_explanation, generate_verse_explanation,
+   stream_event_explanation, stream_verse_explanation
+)
+from typing import AsyncIterator, List, Dict, Optional, Tuple
+
+EXPLAIN_BATCH_CONCURRENCY = int(os.getenv("EXPLAIN_BATCH_CONCURRENCY", "4"))
+EXPLAIN_BATCH_MAX_ITEMS = int(os.getenv("EXPLAIN_BATCH_MAX_ITEMS", "100"))
 
 router = APIRouter()
 
+# Concurrent requests for the same explanation key share one generation.
+explanation_flights = SingleFlight()
+
 async def vector_search_theology(db, query_embedding: List[float], limit: int = 5) -> List[Dict]:
-   """Perform vector search on theology collection."""
-   try:
-       collection = db["theology"]
-       pipeline = [
-           {
-               "$vectorSearch": {
-                   "index": "vector_index",
-                   "path": "embedding",
-                   "queryVector": query_embedding,
-                   "numCandidates": 20,
-                   "limit": limit
-               }
-           },
-           {
-               "$project": {
-                   "_id": 0,
-                   "concept": 1,
-                   "summary": 1,
-                   "description": 1,
-                   "score": {"$meta": "vectorSearchScore"}
-               }
+   """Perform vector search on theology collection. Errors propagate to the retrieval engine."""
+   index = get_vector_index("theology")
+   if index is not None:
+       return index.search(query_embedding, limit)
+
+   collection = db["theology"]
+   pipeline = [
+       {
+           "$vectorSearch": {
+               "index": "vector_index",
+               "path": "embedding",
+               "queryVector": query_embedding,
+               "numCandidates": 20,
+               "limit": limit
            }
-       ]
-       
-       results = list(collection.aggregate(pipeline))
-       return results
-   except Exception as e:
-       print(f"Error in theology vector search: {e}")
-       return []
+       },
+       {
+           "$project": {
+               "_id": 0,
+               "concept": 1,
+               "summary": 1,
+               "description": 1,
+               "score": {"$meta": "vectorSearchScore"}
+           }
+       }
+   ]
+   
+   results = await collection.aggregate(pipeline).to_list(length=None)
+   return results
 
 async def vector_search_commentary(db, query_embedding: List[float], limit: int = 5) -> List[Dict]:
-   """Perform vector search on commentary_chunks collection."""
-   try:
-       collection = db["commentary_chunks"]
-       pipeline = [
-           {
-               "$vectorSearch": {
-                   "index": "vector_index",
-                   "path": "embedding",
-                   "queryVector": query_embedding,
-                   "numCandidates": 20,
-                   "limit": limit
-               }
-           },
-           {
-               "$project": {
-                   "_id": 0,
-                   "text": 1,
-                   "book": 1,
-                   "chapter": 1,
-                   "verse": 1,
-                   "source": 1,
-                   "score": {"$meta": "vectorSearchScore"}
-               }
+   """Perform vector search on commentary_chunks collection. Errors propagate to the retrieval engine."""
+   index = get_vector_index("commentary_chunks")
+   if index is not None:
+       return index.search(query_embedding, limit)
+
+   collection = db["commentary_chunks"]
+   pipeline = [
+       {
+           "$vectorSearch": {
+               "index": "vector_index",
+               "path": "embedding",
+               "queryVector": query_embedding,
+               "numCandidates": 20,
+               "limit": limit
            }
-       ]
-       
-       results = list(collection.aggregate(pipeline))
-       return results
-   except Exception as e:
-       print(f"Error in commentary vector search: {e}")
-       return []
+       },
+       {
+           "$project": {
+               "_id": 0,
+               "text": 1,
+               "book": 1,
+               "chapter": 1,
+               "verse": 1,
+               "source": 1,
+               "score": {"$meta": "vectorSearchScore"}
+           }
+       }
+   ]
+   
+   results = await collection.aggregate(pipeline).to_list(length=None)
+   return results
+
+# Retrieval sources queried concurrently for every explanation. Further sources
+# (e.g. other collections) can be registered with the same roles.
+register_source("theology", vector_search_theology, role="theology")
+register_source("commentary", vector_search_commentary, role="commentary")
 
 async def get_verse_text(db, book: str, chapter: int, verse: int) -> str:
-   """Get the actual verse text from bible_esv collection."""
+   """Get the actual verse text from the verse store, falling back to bible_esv."""
+   store = get_verse_store()
+   if store is not None:
+       text = store.verse_text(book, chapter, verse)
+       if text:
+           return text
+
    try:
        collection = db["bible_esv"]
-       verse_doc = collection.find_one({
+       verse_doc = await collection.find_one({
            "book": book,
            "chapter": chapter,
            "verse": verse
@@ -87,54 +122,190 @@ async def get_verse_text(db, book: str, chapter: int, verse: int) -> str:
        print(f"Error getting verse text: {e}")
        return ""
 
-@router.post("/api/v1/explain-event", response_model=EventExplanationResponse, status_code=status.HTTP_200_OK)
-async def explain_event(request: EventExplanationRequest):
-   """
-   Generate or retrieve an explanation for a biblical event based on book, verse, and theme.
-   """
-   db = get_db()
-   explanations_collection = db["event_explanations"]
+async def embed_event_query(book: str, verse: str, theme: str) -> Tuple[str, List[float]]:
+   """Build and embed the retrieval query of an event explanation."""
+   query = f"{book} {verse} {theme}"
+   query_embedding = await get_embedding(query)
 
-   try:
-       existing_explanation = explanations_collection.find_one({
-           "book": request.book,
-           "verse": request.verse,
-           "theme": request.theme
-       })
+   if not query_embedding:
+       raise HTTPException(
+           status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+           detail="Failed to generate query embedding"
+       )
+   return query, query_embedding
 
-       if existing_explanation:
-           existing_explanation.pop('_id', None)
-           return existing_explanation
+async def retrieve_event_context(db, book: str, verse: str, theme: str,
+                                 query_embedding: Optional[List[float]] = None) -> Tuple[str, List[float], List[Dict], List[Dict]]:
+   """Embed the event query (unless already embedded) and fetch theology and commentary context for it."""
+   if query_embedding:
+       query = f"{book} {verse} {theme}"
+   else:
+       query, query_embedding = await embed_event_query(book, verse, theme)
+
+   retrieval = await retrieve(db, query_embedding)
+   theology_results = retrieval.by_role("theology")
+   commentary_results = retrieval.by_role("commentary")
+   return query, query_embedding, theology_results, commentary_results
+
+async def retrieve_verse_context(db, book: str, chapter: int, verse: int) -> Tuple[str, List[Dict], List[Dict]]:
+   """Look up the verse text, embed it and fetch theology and commentary context for it."""
+   verse_text = await get_verse_text(db, book, chapter, verse)
+
+   if not verse_text:
+       raise HTTPException(
+           status_code=status.HTTP_404_NOT_FOUND,
+           detail=f"Verse not found: {book} {chapter}:{verse}"
+       )
+
+   query = f"{book} {chapter}:{verse} {verse_text}"
+   query_embedding = await get_embedding(query)
 
-       query = f"{request.book} {request.verse} {request.theme}"
-       query_embedding = await get_embedding(query)
-       
-       if not query_embedding:
-           raise HTTPException(
-               status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-               detail="Failed to generate query embedding"
+   if not query_embedding:
+       raise HTTPException(
+           status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+           detail="Failed to generate query embedding"
+       )
+
+   retrieval = await retrieve(db, query_embedding)
+   theology_results = retrieval.by_role("theology")
+   commentary_results = retrieval.by_role("commentary")
+   return verse_text, theology_results, commentary_results
+
+async def build_event_explanation(db, book: str, verse: str, theme: str,
+                                  query_embedding: Optional[List[float]] = None, priority: int = INTERACTIVE) -> Dict:
+   """
+   Run retrieval and generation for an event explanation and store it with its
+   query embedding. Holds a cross-worker lease so only one worker generates a
+   given key at a time, and keeps it until the write-behind flush has put the
+   explanation in MongoDB.
+   """
+   key = (book, verse, theme)
+
+   async with mongo_lease(db, f"event|{book}|{verse}|{theme}") as leader:
+       if not leader:
+           existing_explanation = await wait_for_document(
+               db["event_explanations"], event_explanation_cache.query(key), projection=EXPLANATION_PROJECTION
            )
+           if existing_explanation:
+               return existing_explanation
 
-       theology_results = await vector_search_theology(db, query_embedding, limit=3)
-       commentary_results = await vector_search_commentary(db, query_embedding, limit=3)
+       query, query_embedding, theology_results, commentary_results = await retrieve_event_context(
+           db, book, verse, theme, query_embedding
+       )
 
        explanation = await generate_event_explanation(
            query, theology_results, commentary_results,
-           request.book, request.verse, request.theme
+           book, verse, theme, priority=priority
        )
 
        new_explanation = {
-           "book": request.book,
-           "verse": request.verse,
-           "theme": request.theme,
+           "book": book,
+           "verse": verse,
+           "theme": theme,
            "explanation": explanation,
            "created_at": datetime.utcnow().isoformat()
        }
+       await event_explanation_cache.put(db, key, new_explanation, stored_fields={"query_embedding": query_embedding})
+       semantic_cache.add(book, verse, theme, query_embedding)
+       return new_explanation
+
+async def reuse_similar_event_explanation(db, book: str, verse: str, theme: str,
+                                          query_embedding: List[float]) -> Optional[Dict]:
+   """
+   Return the stored explanation of the closest paraphrase of this event label in
+   the same book and theme, if the semantic cache finds one. The reuse is stored
+   under the requested key with its match score, so repeats are exact-key hits.
+   """
+   match = semantic_cache.lookup(book, theme, query_embedding)
+   if match is None:
+       return None
+   matched_verse, score = match
+   source = await event_explanation_cache.get(db, (book, matched_verse, theme))
+   if source is None:
+       return None
+   reused = {
+       **source,
+       "verse": verse,
+       "semantic_match": {"verse": matched_verse, "score": score},
+       "created_at": datetime.utcnow().isoformat()
+   }
+   event_explanation_cache.put(db, (book, verse, theme), reused)
+   return reused
+
+async def build_verse_explanation(db, book: str, chapter: int, verse: int, priority: int = INTERACTIVE) -> Dict:
+   """
+   Run retrieval and generation for a verse explanation and store it. Holds a
+   cross-worker lease so only one worker generates a given key at a time, and
+   keeps it until the write-behind flush has put the explanation in MongoDB.
+   """
+   key = (book, chapter, verse)
 
-       explanations_collection.insert_one(new_explanation.copy())
-       new_explanation.pop('_id', None)
+   async with mongo_lease(db, f"verse|{book}|{chapter}|{verse}") as leader:
+       if not leader:
+           existing_explanation = await wait_for_document(
+               db["verse_explanations"], verse_explanation_cache.query(key), projection=EXPLANATION_PROJECTION
+           )
+           if existing_explanation:
+               return existing_explanation
+
+       verse_text, theology_results, commentary_results = await retrieve_verse_context(db, book, chapter, verse)
+
+       explanation = await generate_verse_explanation(
+           verse_text, theology_results, commentary_results,
+           book, chapter, verse, priority=priority
+       )
+
+       new_explanation = {
+           "book": book,
+           "chapter": chapter,
+           "verse": verse,
+           "explanation": explanation,
+           "created_at": datetime.utcnow().isoformat()
+       }
+       await verse_explanation_cache.put(db, key, new_explanation)
        return new_explanation
 
+def generation_overloaded(e: GenerationOverloaded) -> HTTPException:
+   """The 429 returned when the generation queue is full."""
+   return HTTPException(
+       status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+       detail="Too many explanations are being generated; try again shortly",
+       headers={"Retry-After": str(e.retry_after)}
+   )
+
+@router.post("/api/v1/explain-event", response_model=EventExplanationResponse, status_code=status.HTTP_200_OK)
+async def explain_event(request: EventExplanationRequest):
+   """
+   Generate or retrieve an explanation for a biblical event based on book, verse, and theme.
+   """
+   db = get_db()
+
+   try:
+       with span("explanation_cache"):
+           existing_explanation = await event_explanation_cache.get(db, (request.book, request.verse, request.theme))
+
+       if existing_explanation:
+           return existing_explanation
+
+       query_embedding = None
+       if semantic_cache.enabled:
+           _, query_embedding = await embed_event_query(request.book, request.verse, request.theme)
+           with span("semantic_cache"):
+               similar_explanation = await reuse_similar_event_explanation(
+                   db, request.book, request.verse, request.theme, query_embedding
+               )
+           if similar_explanation:
+               return similar_explanation
+
+       return await explanation_flights.do(
+           ("event", request.book, request.verse, request.theme),
+           lambda: build_event_explanation(db, request.book, request.verse, request.theme, query_embedding)
+       )
+
+   except HTTPException:
+       raise
+   except GenerationOverloaded as e:
+       raise generation_overloaded(e)
    except Exception as e:
        raise HTTPException(
            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -147,58 +318,214 @@ async def explain_verse(request: VerseExplanationRequest):
    Generate or retrieve an explanation for a specific Bible verse.
    """
    db = get_db()
-   verse_explanations = db["verse_explanations"]
 
    try:
-       existing_explanation = verse_explanations.find_one({
-           "book": request.book,
-           "chapter": request.chapter,
-           "verse": request.verse
-       })
+       with span("explanation_cache"):
+           existing_explanation = await verse_explanation_cache.get(db, (request.book, request.chapter, request.verse))
 
        if existing_explanation:
-           existing_explanation.pop('_id', None)
            return existing_explanation
 
-       verse_text = await get_verse_text(db, request.book, request.chapter, request.verse)
-       
-       if not verse_text:
-           raise HTTPException(
-               status_code=status.HTTP_404_NOT_FOUND,
-               detail=f"Verse not found: {request.book} {request.chapter}:{request.verse}"
-           )
+       return await explanation_flights.do(
+           ("verse", request.book, request.chapter, request.verse),
+           lambda: build_verse_explanation(db, request.book, request.chapter, request.verse)
+       )
 
-       query = f"{request.book} {request.chapter}:{request.verse} {verse_text}"
-       query_embedding = await get_embedding(query)
-       
-       if not query_embedding:
-           raise HTTPException(
-               status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-               detail="Failed to generate query embedding"
-           )
+   except HTTPException:
+       raise
+   except GenerationOverloaded as e:
+       raise generation_overloaded(e)
+   except Exception as e:
+       raise HTTPException(
+           status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+           detail=f"Failed to generate verse explanation: {str(e)}"
+       )
 
-       theology_results = await vector_search_theology(db, query_embedding, limit=3)
-       commentary_results = await vector_search_commentary(db, query_embedding, limit=3)
+def sse_event(event: str, data: Dict) -> str:
+   """Format one server-sent event."""
+   return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
-       explanation = await generate_verse_explanation(
-           verse_text, theology_results, commentary_results,
-           request.book, request.chapter, request.verse
-       )
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
 
-       new_explanation = {
-           "book": request.book,
-           "chapter": request.chapter,
-           "verse": request.verse,
-           "explanation": explanation,
-           "created_at": datetime.utcnow().isoformat()
-       }
+async def stream_explanation_events(db, cache: ExplanationCache, kind: str, key: Tuple, load_context, stream) -> AsyncIterator[str]:
+   """
+   Yield SSE events for an explanation. A cached explanation is sent as one
+   `explanation` event. A miss is generated like the non-streaming endpoints, under
+   explanation_flights and the cross-worker lease: the request that generates sends
+   the text as `token` events as it arrives, then stores it. Every request ends with
+   the stored explanation as an `explanation` event, which is all a request that
+   joined another request's or worker's generation gets. Failures are sent as an
+   `error` event and nothing is stored.
+   """
+   # Flush headers immediately so the client sees the stream open.
+   yield ": stream open\n\n"
+   tokens: asyncio.Queue = asyncio.Queue()
+   flight = None
 
-       verse_explanations.insert_one(new_explanation.copy())
-       new_explanation.pop('_id', None)
-       return new_explanation
+   async def generate() -> Dict:
+       async with mongo_lease(db, "|".join(str(part) for part in (kind, *key))) as leader:
+           if not leader:
+               existing_explanation = await wait_for_document(
+                   db[cache.collection_name], cache.query(key), projection=EXPLANATION_PROJECTION
+               )
+               if existing_explanation:
+                   return existing_explanation
+
+           context = await load_context()
+           pieces = []
+           async for piece in stream(*context):
+               pieces.append(piece)
+               tokens.put_nowait(piece)
 
+           explanation = "".join(pieces)
+           if not explanation:
+               raise ValueError("Empty response from model")
+
+           new_explanation = {**cache.query(key), "explanation": explanation, "created_at": datetime.utcnow().isoformat()}
+           await cache.put(db, key, new_explanation)
+           return new_explanation
+
+   try:
+       with span("explanation_cache"):
+           existing_explanation = await cache.get(db, key)
+       if existing_explanation:
+           yield sse_event("explanation", existing_explanation)
+           return
+
+       flight = asyncio.ensure_future(explanation_flights.do((kind, *key), generate))
+       while not flight.done():
+           next_token = asyncio.ensure_future(tokens.get())
+           await asyncio.wait({next_token, flight}, return_when=asyncio.FIRST_COMPLETED)
+           if next_token.done():
+               yield sse_event("token", {"text": next_token.result()})
+           else:
+               next_token.cancel()
+       while not tokens.empty():
+           yield sse_event("token", {"text": tokens.get_nowait()})
+       yield sse_event("explanation", flight.result())
+   except HTTPException as e:
+       yield sse_event("error", {"status": e.status_code, "detail": e.detail})
+   except GenerationOverloaded as e:
+       error = generation_overloaded(e)
+       yield sse_event("error", {"status": error.status_code, "detail": error.detail, "retry_after": e.retry_after})
    except Exception as e:
+       print(f"Error streaming explanation: {e}")
+       yield sse_event("error", {"status": status.HTTP_500_INTERNAL_SERVER_ERROR, "detail": f"Failed to generate explanation: {str(e)}"})
+   finally:
+       # The client went away: stop waiting (a shared generation still finishes and is stored).
+       if flight is not None:
+           flight.cancel()
+
+@router.post("/api/v1/explain-event/stream")
+async def explain_event_stream(request: EventExplanationRequest):
+   """
+   Stream an event explanation as server-sent events, writing it through to the cache when complete.
+   """
+   db = get_db()
+
+   async def load_context():
+       _, _, theology_results, commentary_results = await retrieve_event_context(db, request.book, request.verse, request.theme)
+       return theology_results, commentary_results, request.book, request.verse, request.theme
+
+   events = stream_explanation_events(
+       db, event_explanation_cache, "event", (request.book, request.verse, request.theme),
+       load_context, stream_event_explanation
+   )
+   return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.post("/api/v1/explain-verse/stream")
+async def explain_verse_stream(request: VerseExplanationRequest):
+   """
+   Stream a verse explanation as server-sent events, writing it through to the cache when complete.
+   """
+   db = get_db()
+
+   async def load_context():
+       verse_text, theology_results, commentary_results = await retrieve_verse_context(db, request.book, request.chapter, request.verse)
+       return verse_text, theology_results, commentary_results, request.book, request.chapter, request.verse
+
+   events = stream_explanation_events(
+       db, verse_explanation_cache, "verse", (request.book, request.chapter, request.verse),
+       load_context, stream_verse_explanation
+   )
+   return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)
+
+# Cache and builder of each explanation kind; cache key fields are in the order used for explanation_flights keys.
+BATCH_KINDS = {
+   "verse": (verse_explanation_cache, build_verse_explanation),
+   "event": (event_explanation_cache, build_event_explanation),
+}
+
+async def batch_explanation_lines(db, items: List[Tuple[int, str, Tuple]]) -> AsyncIterator[str]:
+   """
+   Yield one NDJSON line per (index, kind, key) item: cache hits first, then
+   generated explanations in completion order, then a summary line. Misses are
+   generated at most EXPLAIN_BATCH_CONCURRENCY at a time.
+   """
+   def line(payload: Dict) -> str:
+       return json.dumps(payload, default=str) + "\n"
+
+   summary = {"cached": 0, "generated": 0, "failed": 0}
+   with span("explanation_cache"):
+       lookups = await asyncio.gather(*(
+           cache.get_many(db, [key for _, k, key in items if k == kind])
+           for kind, (cache, _) in BATCH_KINDS.items()
+       ))
+   cached = dict(zip(BATCH_KINDS, lookups))
+
+   misses = []
+   for index, kind, key in items:
+       doc = cached[kind].get(key)
+       if doc is None:
+           misses.append((index, kind, key))
+           continue
+       summary["cached"] += 1
+       yield line({"type": "result", "index": index, "kind": kind, "status": "cached", "explanation": doc})
+
+   semaphore = asyncio.Semaphore(max(1, EXPLAIN_BATCH_CONCURRENCY))
+
+   async def generate(index: int, kind: str, key: Tuple) -> Dict:
+       cache, build = BATCH_KINDS[kind]
+       args = cache.query(key)
+       result = {"type": "result", "index": index, "kind": kind}
+       async with semaphore:
+           try:
+               # Shares work with single-key requests and with duplicate keys in this batch.
+               doc = await explanation_flights.do((kind, *key), lambda: build(db, **args, priority=BACKGROUND))
+               summary["generated"] += 1
+               return {**result, "status": "generated", "explanation": doc}
+           except HTTPException as e:
+               summary["failed"] += 1
+               return {**result, "status": "error", "error": {"status": e.status_code, "detail": e.detail}}
+           except GenerationOverloaded as e:
+               summary["failed"] += 1
+               error = generation_overloaded(e)
+               return {**result, "status": "error", "error": {"status": error.status_code, "detail": error.detail, "retry_after": e.retry_after}}
+           except Exception as e:
+               summary["failed"] += 1
+               return {**result, "status": "error", "error": {"status": status.HTTP_500_INTERNAL_SERVER_ERROR, "detail": f"Failed to generate explanation: {str(e)}"}}
+
+   tasks = [asyncio.ensure_future(generate(*miss)) for miss in misses]
+   try:
+       for next_result in asyncio.as_completed(tasks):
+           yield line(await next_result)
+   finally:
+       # The client went away: stop waiting (in-flight generations still finish and are stored).
+       for task in tasks:
+           task.cancel()
+   yield line({"type": "summary", **summary})
+
+@router.post("/api/v1/explain/batch")
+async def explain_batch(request: BatchExplanationRequest):
+   """
+   Explain many verses and/or events in one request, streamed as NDJSON. Cached
+   explanations are found in memory or with one query per kind; misses are generated concurrently.
+   """
+   items = [(i, "verse", (v.book, v.chapter, v.verse)) for i, v in enumerate(request.verses)]
+   items += [(len(request.verses) + i, "event", (e.book, e.verse, e.theme)) for i, e in enumerate(request.events)]
+   if not items or len(items) > EXPLAIN_BATCH_MAX_ITEMS:
        raise HTTPException(
-           status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-           detail=f"Failed to generate verse explanation: {str(e)}"
+           status_code=status.HTTP_400_BAD_REQUEST,
+           detail=f"A batch must contain between 1 and {EXPLAIN_BATCH_MAX_ITEMS} items"
        )
+   return StreamingResponse(batch_explanation_lines(get_db(), items), media_type="application/x-ndjson")
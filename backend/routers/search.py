@@ -0,0 +1,86 @@
+# This router handles full-text search over scripture and commentary.
+from fastapi import APIRouter, HTTPException, Query, status
+from typing import Dict, List, Optional
+import time
+from database import get_db
+from search_index import get_search_index
+from retrieval import retrieve
+from ai_services import get_embedding
+from models import SearchResponse
+from metrics import record
+
+router = APIRouter()
+
+RRF_K = 60
+RRF_CANDIDATES = 50
+
+def vector_hit(doc: Dict, role: str) -> Dict:
+   """Shapes a retrieval result like a full-text hit."""
+   metadata = {key: value for key, value in doc.items() if key not in ("text", "score")}
+   if role == "theology":
+       text = doc.get("summary") or doc.get("description") or doc.get("concept") or ""
+       return {"kind": "theology", "text": text, "metadata": metadata}
+   return {"kind": "commentary", "text": doc.get("text", ""), "metadata": metadata}
+
+def reciprocal_rank_fusion(rankings: Dict[str, List[Dict]], limit: int) -> List[Dict]:
+   """Merges ranked lists by summing 1 / (RRF_K + rank); hits are identified by kind and text."""
+   fused: Dict[tuple, Dict] = {}
+   for name, hits in rankings.items():
+       for rank, hit in enumerate(hits, start=1):
+           key = (hit["kind"], hit["text"])
+           entry = fused.setdefault(key, {**hit, "score": 0.0, "matched_by": []})
+           entry["score"] += 1.0 / (RRF_K + rank)
+           entry["matched_by"].append(name)
+   ranked = sorted(fused.values(), key=lambda hit: hit["score"], reverse=True)[:limit]
+   for hit in ranked:
+       hit["score"] = round(hit["score"], 6)
+   return ranked
+
+@router.get("/api/v1/search", response_model=SearchResponse)
+async def search(
+   q: str = Query(..., min_length=1, max_length=300, description='Keywords; quote phrases, e.g. "steadfast love"'),
+   limit: int = Query(10, ge=1, le=100),
+   kind: Optional[str] = Query(None, pattern="^(verse|commentary)$"),
+   book: Optional[str] = None,
+   vector: bool = Query(False, description="Merge in vector search results with reciprocal rank fusion")
+):
+   """Full-text BM25 search over verses and commentary, optionally fused with vector search."""
+   if book is not None and kind == "commentary":
+       raise HTTPException(
+           status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+           detail="The book filter applies to verses and cannot be combined with kind=commentary"
+       )
+
+   index = get_search_index()
+   if index is None:
+       raise HTTPException(
+           status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+           detail="Search index is not loaded"
+       )
+
+   start = time.perf_counter()
+   candidates = max(limit, RRF_CANDIDATES) if vector else limit
+   total, hits = index.search(q, candidates, kind=kind, book=book)
+   elapsed = time.perf_counter() - start
+   record("search.bm25", elapsed)
+   timings = {"bm25": round(elapsed * 1000, 2)}
+   for hit in hits:
+       hit["matched_by"] = ["bm25"]
+   if not vector:
+       return {"query": q, "total": total, "hits": hits, "fused": False, "timings_ms": timings}
+
+   # Vector results cannot be filtered by book, and only commentary and theology are embedded.
+   rankings = {"bm25": hits}
+   if book is None and kind != "verse":
+       start = time.perf_counter()
+       query_embedding = await get_embedding(q)
+       if query_embedding:
+           retrieval = await retrieve(get_db(), query_embedding, limit=RRF_CANDIDATES)
+           for name, role in retrieval.roles.items():
+               if kind is None or role == kind:
+                   rankings[f"vector:{name}"] = [vector_hit(doc, role) for doc in retrieval.results[name]]
+       elapsed = time.perf_counter() - start
+       record("search.vector", elapsed)
+       timings["vector"] = round(elapsed * 1000, 2)
+   fused = reciprocal_rank_fusion(rankings, limit)
+   return {"query": q, "total": total, "hits": fused, "fused": True, "timings_ms": timings}
@@ -1,23 +1,54 @@
 
 # This router handles endpoints for biblical themes.
-from fastapi import APIRouter, HTTPException, status, Request
+from fastapi import APIRouter, HTTPException, Query, status, Request
 from typing import List
-from models import Theme, ThemeConnection
+from models import SimilarTheme, Theme, ThemeConnection, ThemeOverlayBook
+from catalog import catalog_response
+from theme_matrix import COMBINE_FUNCTIONS
 
 router = APIRouter()
 
 @router.get("/api/v1/themes", response_model=List[Theme])
 async def get_themes(request: Request):
    """Get all biblical themes."""
-   return request.app.state.DATA["themes"]
+   return catalog_response(request, request.app.state.DATA["catalog"].themes)
 
 @router.get("/api/v1/themes/{theme_id}/connections", response_model=List[ThemeConnection])
 async def get_theme_connections(theme_id: str, request: Request):
    """Get connections for a specific theme."""
-   connections = request.app.state.DATA["theme_connections"].get(theme_id)
-   if connections is None:
+   compiled = request.app.state.DATA["catalog"].theme_connections.get(theme_id)
+   if compiled is None:
        raise HTTPException(
            status_code=status.HTTP_404_NOT_FOUND,
            detail=f"No connections found for theme '{theme_id}'"
        )
-   return connections
+   return catalog_response(request, compiled)
+
+@router.get("/api/v1/themes/overlay", response_model=List[ThemeOverlayBook])
+async def get_theme_overlay(
+   request: Request,
+   themes: str = Query(..., description="Comma-separated theme ids"),
+   mode: str = Query("intersection", pattern="^(intersection|union)$"),
+   combine: str = Query("sum", pattern="^(" + "|".join(COMBINE_FUNCTIONS) + ")$")
+):
+   """Get the books connected to all (intersection) or any (union) of several themes, with combined prominence."""
+   matrix = request.app.state.DATA["theme_matrix"]
+   theme_ids = list(dict.fromkeys(theme_id.strip() for theme_id in themes.split(",") if theme_id.strip()))
+   unknown = matrix.unknown_themes(theme_ids)
+   if not theme_ids or unknown:
+       raise HTTPException(
+           status_code=status.HTTP_404_NOT_FOUND,
+           detail=f"Unknown themes: {', '.join(unknown)}" if unknown else "No themes given"
+       )
+   return matrix.overlay(theme_ids, mode, combine)
+
+@router.get("/api/v1/themes/{theme_id}/similar", response_model=List[SimilarTheme])
+async def get_similar_themes(theme_id: str, request: Request, limit: int = Query(5, ge=1, le=50)):
+   """Get the themes whose prominence across books is most similar to this theme's."""
+   matrix = request.app.state.DATA["theme_matrix"]
+   if matrix.unknown_themes([theme_id]):
+       raise HTTPException(
+           status_code=status.HTTP_404_NOT_FOUND,
+           detail=f"Theme '{theme_id}' not found"
+       )
+   return matrix.similar_themes(theme_id, limit)
@@ -0,0 +1,301 @@
+# This module provides an in-memory BM25 full-text index over bible_esv and commentary_chunks.
+#
+# Postings are stored as flat arrays (CSR layout): for every term, a sorted run of
+# document ids with term frequencies, and for every posting a run of token
+# positions used to match quoted phrases. Scoring accumulates BM25 weights into one
+# numpy array per query, so whole-Bible queries take a few milliseconds. Like the
+# verse store, the arrays can be saved to disk and memory-mapped.
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", str(Path(__file__).parent / "data" / "search_index"))
+SEARCH_INDEX_ENABLED = os.getenv("SEARCH_INDEX_ENABLED", "true").lower() == "true"
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+ARRAY_NAMES = (
+   "term_offsets", "posting_docs", "posting_tf", "position_offsets", "positions",
+   "doc_lengths", "verse_books", "verse_chapters", "verse_numbers", "text_offsets", "text",
+)
+
+KINDS = ("verse", "commentary")
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_PHRASE = re.compile(r'"([^"]*)"')
+
+_index = None
+
+def tokenize(text: str) -> List[str]:
+   """Lowercased alphanumeric tokens; punctuation and apostrophes split words."""
+   return _TOKEN.findall(text.lower())
+
+def parse_query(query: str) -> Tuple[List[str], List[List[str]]]:
+   """Splits a query into free terms and quoted phrases (each a list of terms)."""
+   phrases = [tokenize(phrase) for phrase in _PHRASE.findall(query)]
+   terms = tokenize(_PHRASE.sub(" ", query))
+   return terms, [phrase for phrase in phrases if phrase]
+
+class SearchIndex:
+   """
+   BM25 index over verses (document ids 0..verse_count-1, located by book,
+   chapter and verse) followed by commentary chunks (located by their metadata).
+   """
+
+   def __init__(self, terms: List[str], books: List[str], commentary: List[Dict], **arrays: np.ndarray):
+       self.terms = list(terms)
+       self.term_ids = {term: i for i, term in enumerate(self.terms)}
+       self.books = list(books)
+       self.book_ids = {book.lower(): i for i, book in enumerate(self.books)}
+       self.commentary = commentary
+       for name in ARRAY_NAMES:
+           setattr(self, name, arrays[name])
+       self.verse_count = len(self.verse_books)
+       self.doc_count = len(self.doc_lengths)
+       self._text = memoryview(self.text)
+       # The BM25 length normalization depends only on the document, so it is computed once.
+       lengths = self.doc_lengths.astype(np.float32)
+       average = float(lengths.mean()) if self.doc_count else 1.0
+       self._norm = (BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(average, 1.0))).astype(np.float32)
+
+   @classmethod
+   def from_documents(cls, verses: Iterable[Dict], commentary: Iterable[Dict]) -> "SearchIndex":
+       """Builds an index from bible_esv documents and commentary_chunks documents."""
+       verses = sorted(
+           (doc for doc in verses if doc.get("book") and doc.get("chapter") is not None and doc.get("verse") is not None),
+           key=lambda doc: (doc["book"], int(doc["chapter"]), int(doc["verse"])),
+       )
+       commentary = [doc for doc in commentary if doc.get("text")]
+
+       books, book_ids = [], {}
+       verse_books, verse_chapters, verse_numbers = [], [], []
+       for doc in verses:
+           if doc["book"] not in book_ids:
+               book_ids[doc["book"]] = len(books)
+               books.append(doc["book"])
+           verse_books.append(book_ids[doc["book"]])
+           verse_chapters.append(int(doc["chapter"]))
+           verse_numbers.append(int(doc["verse"]))
+
+       postings: Dict[str, List[Tuple[int, List[int]]]] = {}
+       doc_lengths, text_offsets = [], [0]
+       buffer = bytearray()
+       for doc_id, doc in enumerate(verses + commentary):
+           text = doc.get("text") or ""
+           tokens = tokenize(text)
+           doc_lengths.append(len(tokens))
+           buffer += text.encode("utf-8")
+           text_offsets.append(len(buffer))
+           occurrences: Dict[str, List[int]] = {}
+           for position, token in enumerate(tokens):
+               occurrences.setdefault(token, []).append(position)
+           for token, token_positions in occurrences.items():
+               postings.setdefault(token, []).append((doc_id, token_positions))
+
+       terms = sorted(postings)
+       term_offsets, posting_docs, posting_tf = [0], [], []
+       position_offsets, positions = [0], []
+       for term in terms:
+           for doc_id, token_positions in postings[term]:
+               posting_docs.append(doc_id)
+               posting_tf.append(min(len(token_positions), 65535))
+               positions.extend(token_positions)
+               position_offsets.append(len(positions))
+           term_offsets.append(len(posting_docs))
+
+       fields = ("page", "section", "sub_section", "chapter_title", "book", "chapter", "verse", "source")
+       metadata = [{field: doc[field] for field in fields if doc.get(field) is not None} for doc in commentary]
+       return cls(
+           terms, books, json.loads(json.dumps(metadata, default=str)),
+           term_offsets=np.asarray(term_offsets, dtype=np.int64),
+           posting_docs=np.asarray(posting_docs, dtype=np.int32),
+           posting_tf=np.asarray(posting_tf, dtype=np.uint16),
+           position_offsets=np.asarray(position_offsets, dtype=np.int64),
+           positions=np.asarray(positions, dtype=np.uint32),
+           doc_lengths=np.asarray(doc_lengths, dtype=np.int32),
+           verse_books=np.asarray(verse_books, dtype=np.int16),
+           verse_chapters=np.asarray(verse_chapters, dtype=np.int16),
+           verse_numbers=np.asarray(verse_numbers, dtype=np.int16),
+           text_offsets=np.asarray(text_offsets, dtype=np.int64),
+           text=np.frombuffer(bytes(buffer), dtype=np.uint8),
+       )
+
+   @classmethod
+   def load(cls, path: str, mmap: bool = True) -> "SearchIndex":
+       """Loads an index written by save(), memory-mapping the arrays by default."""
+       directory = Path(path)
+       with open(directory / "index.json", "r", encoding="utf-8") as f:
+           meta = json.load(f)
+       mode = "r" if mmap else None
+       arrays = {name: np.load(directory / f"{name}.npy", mmap_mode=mode) for name in ARRAY_NAMES}
+       return cls(meta["terms"], meta["books"], meta["commentary"], **arrays)
+
+   def save(self, path: str) -> None:
+       """Writes one .npy file per array plus index.json (terms, books, commentary metadata)."""
+       directory = Path(path)
+       directory.mkdir(parents=True, exist_ok=True)
+       for name in ARRAY_NAMES:
+           np.save(directory / f"{name}.npy", getattr(self, name))
+       with open(directory / "index.json", "w", encoding="utf-8") as f:
+           json.dump({"terms": self.terms, "books": self.books, "commentary": self.commentary}, f, ensure_ascii=False)
+
+   @property
+   def nbytes(self) -> int:
+       return sum(getattr(self, name).nbytes for name in ARRAY_NAMES)
+
+   def _postings(self, term_id: int) -> Tuple[int, int]:
+       return int(self.term_offsets[term_id]), int(self.term_offsets[term_id + 1])
+
+   def _phrase_docs(self, term_ids: List[int]) -> np.ndarray:
+       """Documents containing the terms at consecutive positions."""
+       spans = [self._postings(term_id) for term_id in term_ids]
+       # Intersect the shortest posting lists first.
+       candidates = None
+       for start, end in sorted(spans, key=lambda span: span[1] - span[0]):
+           docs = self.posting_docs[start:end]
+           candidates = docs if candidates is None else np.intersect1d(candidates, docs, assume_unique=True)
+       if candidates is None or len(term_ids) == 1 or not len(candidates):
+           return candidates if candidates is not None else np.empty(0, dtype=np.int32)
+
+       # Each occurrence becomes a key (document id << 32 | position); a phrase matches
+       # where the key of term i, shifted back by i, equals a key of the first term.
+       matched = None
+       for shift, (start, end) in enumerate(spans):
+           posting_index = start + np.searchsorted(self.posting_docs[start:end], candidates)
+           keys = self._occurrence_keys(posting_index, candidates) - shift
+           matched = keys if matched is None else np.intersect1d(matched, keys, assume_unique=True)
+           if not len(matched):
+               break
+       return np.unique(matched >> 32).astype(np.int32)
+
+   def _occurrence_keys(self, posting_index: np.ndarray, docs: np.ndarray) -> np.ndarray:
+       """(document id << 32 | position) for every position of the given postings."""
+       starts = self.position_offsets[posting_index]
+       lengths = self.position_offsets[posting_index + 1] - starts
+       total = int(lengths.sum())
+       # Flat indexes into `positions` for all runs at once: each run's start, plus 0..length-1.
+       run_starts = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+       flat = run_starts + np.arange(total)
+       return (np.repeat(docs.astype(np.int64), lengths) << 32) + self.positions[flat].astype(np.int64)
+
+   def document(self, doc_id: int) -> Dict:
+       """The stored document: a verse (book, chapter, verse) or a commentary chunk (its metadata)."""
+       text = str(self._text[self.text_offsets[doc_id]:self.text_offsets[doc_id + 1]], "utf-8")
+       if doc_id < self.verse_count:
+           return {
+               "kind": "verse",
+               "book": self.books[self.verse_books[doc_id]],
+               "chapter": int(self.verse_chapters[doc_id]),
+               "verse": int(self.verse_numbers[doc_id]),
+               "text": text,
+           }
+       return {"kind": "commentary", "text": text, "metadata": self.commentary[doc_id - self.verse_count]}
+
+   def search(self, query: str, limit: int = 10, kind: Optional[str] = None,
+              book: Optional[str] = None) -> Tuple[int, List[Dict]]:
+       """
+       Ranks documents matching any query term by BM25; quoted phrases must match
+       exactly. Returns the number of matching documents and the top `limit`.
+       """
+       terms, phrases = parse_query(query)
+       scores = np.zeros(self.doc_count, dtype=np.float32)
+       for term in dict.fromkeys(terms + [term for phrase in phrases for term in phrase]):
+           term_id = self.term_ids.get(term)
+           if term_id is None:
+               continue
+           start, end = self._postings(term_id)
+           docs = self.posting_docs[start:end]
+           tf = self.posting_tf[start:end].astype(np.float32)
+           idf = math.log(1 + (self.doc_count - (end - start) + 0.5) / ((end - start) + 0.5))
+           scores[docs] += idf * tf * (BM25_K1 + 1) / (tf + self._norm[docs])
+
+       candidates = np.flatnonzero(scores)
+       for phrase in phrases:
+           term_ids = [self.term_ids.get(term) for term in phrase]
+           if None in term_ids:
+               return 0, []
+           candidates = np.intersect1d(candidates, self._phrase_docs(term_ids), assume_unique=True)
+       if kind == "verse":
+           candidates = candidates[candidates < self.verse_count]
+       elif kind == "commentary":
+           candidates = candidates[candidates >= self.verse_count]
+       if book is not None:
+           book_id = self.book_ids.get(book.lower())
+           if book_id is None:
+               return 0, []
+           candidates = candidates[candidates < self.verse_count]
+           candidates = candidates[self.verse_books[candidates] == book_id]
+
+       total = len(candidates)
+       if total > limit:
+           top = np.argpartition(-scores[candidates], limit - 1)[:limit]
+           candidates = candidates[top]
+       ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+       hits = []
+       for doc_id in ranked.tolist():
+           hit = self.document(doc_id)
+           hit["score"] = round(float(scores[doc_id]), 4)
+           hits.append(hit)
+       return total, hits
+
+async def build_search_index_from_db(db) -> SearchIndex:
+   """Builds the index from one scan of bible_esv and one of commentary_chunks."""
+   verses, commentary = await asyncio.gather(
+       db["bible_esv"].find({}, {"_id": 0, "book": 1, "chapter": 1, "verse": 1, "text": 1}).to_list(length=None),
+       db["commentary_chunks"].find({}, {"_id": 0, "embedding": 0}).to_list(length=None),
+   )
+   # Tokenizing the whole Bible is CPU-bound; keep it off the event loop.
+   return await asyncio.to_thread(SearchIndex.from_documents, verses, commentary)
+
+async def load_search_index(db) -> Optional[SearchIndex]:
+   """
+   Loads the index from SEARCH_INDEX_PATH if a prebuilt copy exists, otherwise
+   builds it from MongoDB. Returns None (search is unavailable) on failure.
+   """
+   global _index
+   if not SEARCH_INDEX_ENABLED:
+       return None
+   try:
+       if (Path(SEARCH_INDEX_PATH) / "index.json").exists():
+           _index = SearchIndex.load(SEARCH_INDEX_PATH)
+       else:
+           index = await build_search_index_from_db(db)
+           _index = index if index.doc_count else None
+   except Exception as e:
+       print(f"Error loading search index: {e}. Full-text search is unavailable.")
+       _index = None
+   return _index
+
+def get_search_index() -> Optional[SearchIndex]:
+   """Returns the process-wide search index, or None if it is not loaded."""
+   return _index
+
+def set_search_index(index: Optional[SearchIndex]) -> None:
+   """Replaces the process-wide search index."""
+   global _index
+   _index = index
+
+async def _build_cli(out: str) -> None:
+   from database import connect_db, close_db_connection
+   db = await connect_db()
+   try:
+       index = await build_search_index_from_db(db)
+   finally:
+       close_db_connection()
+   index.save(out)
+   print(f"Wrote {index.doc_count} documents, {len(index.terms)} terms ({index.nbytes / 1e6:.1f} MB) to {out}")
+
+if __name__ == "__main__":
+   parser = argparse.ArgumentParser(description="Build the full-text search index from MongoDB.")
+   parser.add_argument("--out", default=SEARCH_INDEX_PATH, help="Output directory")
+   args = parser.parse_args()
+   asyncio.run(_build_cli(args.out))
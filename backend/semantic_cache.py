@@ -0,0 +1,101 @@
+# This module provides an optional semantic cache for event explanations.
+#
+# Event explanations are keyed by (book, verse, theme) where `verse` is a free-form
+# event label, so paraphrased labels miss the exact-key cache. Each stored event
+# explanation keeps the embedding of its retrieval query; lookups compare a new
+# query embedding against the stored ones for the same book and theme using a
+# small LocalVectorIndex per (book, theme) and reuse the closest explanation when
+# its cosine similarity reaches SEMANTIC_CACHE_THRESHOLD.
+
+import asyncio
+import os
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from vector_index import LocalVectorIndex
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+
+class SemanticCache:
+   """Nearest stored event label by query-embedding cosine similarity, per (book, theme)."""
+
+   def __init__(self, enabled: bool = SEMANTIC_CACHE_ENABLED, threshold: float = SEMANTIC_CACHE_THRESHOLD):
+       self.enabled = enabled
+       self.threshold = threshold
+       self._indexes: Dict[Tuple[str, str], LocalVectorIndex] = {}
+       self.lookups = 0
+       self.hits = 0
+
+   def __len__(self) -> int:
+       return sum(len(index) for index in self._indexes.values())
+
+   def add(self, book: str, verse: str, theme: str, embedding: Sequence[float]) -> None:
+       """Indexes the query embedding of a stored event explanation."""
+       if not self.enabled or not embedding:
+           return
+       row = LocalVectorIndex.from_embeddings([embedding], [{"verse": verse}])
+       index = self._indexes.get((book, theme))
+       if index is None:
+           self._indexes[(book, theme)] = row
+           return
+       if any(meta["verse"] == verse for meta in index.metadata) or index.vectors.shape[1] != row.vectors.shape[1]:
+           return
+       # Partitions hold one theme's events in one book, so rebuilding on insert stays cheap.
+       self._indexes[(book, theme)] = LocalVectorIndex(
+           np.concatenate([index.vectors, row.vectors]), index.metadata + row.metadata
+       )
+
+   def lookup(self, book: str, theme: str, embedding: Sequence[float]) -> Optional[Tuple[str, float]]:
+       """Returns (stored verse label, cosine similarity) of the closest match above the threshold."""
+       if not self.enabled:
+           return None
+       self.lookups += 1
+       index = self._indexes.get((book, theme))
+       if index is None or not embedding or index.vectors.shape[1] != len(embedding):
+           return None
+       best = index.search(embedding, limit=1)[0]
+       # LocalVectorIndex reports Atlas-style scores, (1 + cos) / 2.
+       similarity = 2.0 * best["score"] - 1.0
+       if similarity < self.threshold:
+           return None
+       self.hits += 1
+       return best["verse"], round(similarity, 4)
+
+   def clear(self) -> None:
+       self._indexes.clear()
+
+   def stats(self) -> Dict:
+       return {
+           "enabled": self.enabled,
+           "entries": len(self),
+           "threshold": self.threshold,
+           "lookups": self.lookups,
+           "hits": self.hits,
+           "hit_ratio": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+       }
+
+semantic_cache = SemanticCache()
+
+async def load_semantic_cache(db) -> int:
+   """Indexes the stored query embeddings of event_explanations; returns the number loaded."""
+   if not semantic_cache.enabled:
+       return 0
+   semantic_cache.clear()
+   try:
+       cursor = db["event_explanations"].find(
+           {"query_embedding": {"$exists": True}},
+           {"_id": 0, "book": 1, "verse": 1, "theme": 1, "query_embedding": 1},
+       )
+       loaded = 0
+       async for doc in cursor:
+           semantic_cache.add(doc.get("book"), doc.get("verse"), doc.get("theme"), doc.get("query_embedding"))
+           loaded += 1
+           if loaded % 1000 == 0:
+               # Yield to request handlers while a large collection is indexed.
+               await asyncio.sleep(0)
+       return loaded
+   except Exception as e:
+       print(f"Error loading semantic cache: {e}. Starting with an empty semantic cache.")
+       return 0
@@ -0,0 +1,110 @@
+# This module serves the API from several worker processes that share one copy of the read-only data.
+#
+# Run with several workers, plain uvicorn would have every worker load the catalog
+# from MongoDB and build or load its own verse store, search index and vector
+# indexes. This supervisor does that work once instead: it loads the catalog and
+# writes the data snapshot, builds whichever prebuilt datasets are missing (verse
+# store, full-text index and, with RETRIEVAL_BACKEND=local, the vector indexes),
+# and then starts uvicorn with WEB_CONCURRENCY workers. The workers boot from the
+# fresh snapshot without reloading it (DATA_SNAPSHOT_FRESH_SECONDS) and
+# memory-map the dataset arrays read-only, so those pages sit once in the page
+# cache and are shared by all workers instead of being copied into each. The
+# catalog itself is small and each worker parses its own copy.
+#
+# Usage (from the backend directory):
+#    python serve.py --workers 4 --port 8000
+#    python serve.py --rebuild      # rebuild every dataset, e.g. after the Bible text changed
+
+import argparse
+import asyncio
+import os
+from pathlib import Path
+from typing import Awaitable, Callable, Dict
+
+from data_loader import load_all_data, loaded_from_db
+from data_snapshot import SNAPSHOT_ENABLED, SNAPSHOT_PATH, write_snapshot
+from search_index import SEARCH_INDEX_ENABLED, SEARCH_INDEX_PATH, build_search_index_from_db
+from vector_index import COLLECTION_FIELDS, RETRIEVAL_BACKEND, VECTOR_INDEX_DIR, export_collection
+from verse_store import VERSE_STORE_ENABLED, VERSE_STORE_PATH, build_verse_store_from_db
+
+SERVE_WORKERS = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+SERVE_HOST = os.getenv("HOST", "0.0.0.0")
+SERVE_PORT = int(os.getenv("PORT", "8000"))
+# Long enough for every worker to have started from the snapshot the supervisor wrote.
+WORKER_SNAPSHOT_FRESH_SECONDS = 300
+
+async def _prepare_dataset(name: str, path: str, marker: str, rebuild: bool,
+                           build: Callable[[], Awaitable], size: Callable) -> str:
+   if (Path(path) / marker).exists() and not rebuild:
+       return "kept"
+   try:
+       dataset = await build()
+       if not size(dataset):
+           return "empty"
+       await asyncio.to_thread(dataset.save, path)
+   except Exception as e:
+       print(f"Error building {name}: {e}. Workers will load it themselves.")
+       return "failed"
+   return f"built ({size(dataset)} items)"
+
+async def prepare_datasets(db, rebuild: bool = False) -> Dict[str, str]:
+   """
+   Writes the data snapshot and builds the prebuilt datasets that are missing;
+   returns what happened to each. Existing datasets are only rebuilt on request,
+   since running workers may have them memory-mapped.
+   """
+   report = {}
+   if SNAPSHOT_ENABLED:
+       data = await load_all_data(db)
+       if loaded_from_db(data):
+           await asyncio.to_thread(write_snapshot, data)
+           report["snapshot"] = "written"
+       else:
+           report["snapshot"] = "kept" if Path(SNAPSHOT_PATH).exists() else "unavailable"
+   if VERSE_STORE_ENABLED:
+       report["verse_store"] = await _prepare_dataset(
+           "verse store", VERSE_STORE_PATH, "books.json", rebuild,
+           lambda: build_verse_store_from_db(db), lambda store: store.verse_count,
+       )
+   if SEARCH_INDEX_ENABLED:
+       report["search_index"] = await _prepare_dataset(
+           "search index", SEARCH_INDEX_PATH, "index.json", rebuild,
+           lambda: build_search_index_from_db(db), lambda index: index.doc_count,
+       )
+   if RETRIEVAL_BACKEND == "local":
+       for collection_name in COLLECTION_FIELDS:
+           report[f"vector_index.{collection_name}"] = await _prepare_dataset(
+               f"vector index for '{collection_name}'", str(Path(VECTOR_INDEX_DIR) / collection_name), "vectors.npy", rebuild,
+               lambda name=collection_name: export_collection(db, name), len,
+           )
+   return report
+
+async def _prepare_cli(rebuild: bool) -> Dict[str, str]:
+   from database import connect_db, close_db_connection
+   db = await connect_db()
+   try:
+       return await prepare_datasets(db, rebuild)
+   finally:
+       close_db_connection()
+
+def main(args) -> None:
+   if args.prepare:
+       report = asyncio.run(_prepare_cli(args.rebuild))
+       for name, outcome in report.items():
+           print(f"{name}: {outcome}")
+       if report.get("snapshot") == "written":
+           # Workers inherit the environment: boot from this snapshot instead of each reloading it from MongoDB.
+           os.environ.setdefault("DATA_SNAPSHOT_FRESH_SECONDS", str(WORKER_SNAPSHOT_FRESH_SECONDS))
+
+   import uvicorn
+   uvicorn.run(args.app, host=args.host, port=args.port, workers=args.workers)
+
+if __name__ == "__main__":
+   parser = argparse.ArgumentParser(description="Serve the API from several workers sharing the read-only datasets.")
+   parser.add_argument("--workers", type=int, default=SERVE_WORKERS, help="Worker processes (default: WEB_CONCURRENCY or the CPU count)")
+   parser.add_argument("--host", default=SERVE_HOST)
+   parser.add_argument("--port", type=int, default=SERVE_PORT)
+   parser.add_argument("--app", default="main:app", help="ASGI app import string")
+   parser.add_argument("--no-prepare", dest="prepare", action="store_false", help="Use the datasets on disk as they are")
+   parser.add_argument("--rebuild", action="store_true", help="Rebuild datasets that already exist")
+   main(parser.parse_args())
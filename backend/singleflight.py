@@ -0,0 +1,123 @@
+# This module de-duplicates concurrent work on the same key, inside one process and across workers.
+#
+# SingleFlight makes concurrent callers with the same key await one shared task.
+# MongoLease extends that across processes: the first worker to insert a lease
+# document for a key does the work, the others wait for its result for about as
+# long as one generation takes and then generate it themselves.
+
+import asyncio
+import os
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+LEASE_COLLECTION = "explanation_leases"
+LEASE_TTL_SECONDS = float(os.getenv("EXPLANATION_LEASE_TTL_SECONDS", "60"))
+# How long a worker waits for the lease holder's result: roughly one generation,
+# well under the TTL, after which a slow or failed holder is not worth waiting for.
+LEASE_WAIT_SECONDS = float(os.getenv("EXPLANATION_LEASE_WAIT_SECONDS", "15"))
+LEASE_POLL_INTERVAL_SECONDS = float(os.getenv("EXPLANATION_LEASE_POLL_SECONDS", "0.5"))
+
+class SingleFlight:
+   """Runs at most one task per key; concurrent callers share its result."""
+
+   def __init__(self):
+       self._tasks: Dict[Hashable, asyncio.Task] = {}
+       self.started = 0
+       self.shared = 0
+
+   async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+       """Awaits fn() for this key, joining an in-flight call if there is one."""
+       task = self._tasks.get(key)
+       if task is None:
+           self.started += 1
+           task = asyncio.ensure_future(fn())
+           self._tasks[key] = task
+           task.add_done_callback(lambda t, k=key: self._finish(k, t))
+       else:
+           self.shared += 1
+       # Shield the shared task so one caller disconnecting does not cancel it for the others.
+       return await asyncio.shield(task)
+
+   def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+       if self._tasks.get(key) is task:
+           del self._tasks[key]
+       if not task.cancelled():
+           task.exception()
+
+   def in_flight(self) -> int:
+       return len(self._tasks)
+
+   def stats(self) -> Dict[str, int]:
+       return {"started": self.started, "shared": self.shared, "in_flight": self.in_flight()}
+
+class MongoLease:
+   """A short-lived, TTL-expiring lock document used to elect one worker per key."""
+
+   def __init__(self, db, ttl_seconds: float = LEASE_TTL_SECONDS):
+       self.collection = db[LEASE_COLLECTION]
+       self.ttl = timedelta(seconds=ttl_seconds)
+       self.owner = uuid.uuid4().hex
+
+   async def acquire(self, key: str) -> bool:
+       """Returns True if this worker now holds the lease for key."""
+       now = datetime.utcnow()
+       try:
+           await self.collection.insert_one({"_id": key, "owner": self.owner, "expires_at": now + self.ttl})
+           return True
+       except DuplicateKeyError:
+           # Take over a lease whose holder died without releasing it.
+           taken = await self.collection.find_one_and_update(
+               {"_id": key, "expires_at": {"$lt": now}},
+               {"$set": {"owner": self.owner, "expires_at": now + self.ttl}},
+           )
+           return taken is not None
+
+   async def release(self, key: str) -> None:
+       await self.collection.delete_one({"_id": key, "owner": self.owner})
+
+@asynccontextmanager
+async def mongo_lease(db, key: str):
+   """
+   Yields True if this worker holds the lease for key, False if another worker does.
+   Lease errors (e.g. the database is unreachable) yield True so work still proceeds.
+   """
+   lease = MongoLease(db)
+   try:
+       acquired = await lease.acquire(key)
+   except Exception as e:
+       print(f"Error acquiring lease '{key}': {e}")
+       yield True
+       return
+   try:
+       yield acquired
+   finally:
+       if acquired:
+           try:
+               await lease.release(key)
+           except Exception as e:
+               print(f"Error releasing lease '{key}': {e}")
+
+async def wait_for_document(collection, query: Dict, timeout: float = LEASE_WAIT_SECONDS,
+                            interval: float = LEASE_POLL_INTERVAL_SECONDS,
+                            projection: Optional[Dict] = None) -> Optional[Dict]:
+   """
+   Polls for a document another worker is producing, up to timeout seconds.
+   Returns None if it does not appear in time or the lookup fails, so the caller
+   can produce it itself.
+   """
+   loop = asyncio.get_running_loop()
+   deadline = loop.time() + min(timeout, LEASE_TTL_SECONDS)
+   while loop.time() < deadline:
+       try:
+           doc = await collection.find_one(query, projection or {"_id": 0})
+       except Exception as e:
+           print(f"Error waiting for document {query}: {e}")
+           return None
+       if doc:
+           return doc
+       await asyncio.sleep(min(interval, max(deadline - loop.time(), 0)))
+   return None
@@ -0,0 +1,80 @@
+import asyncio
+
+from benchmarks.memory_db import MemoryDatabase
+from explanation_cache import ExplanationCache
+
+class CountingDatabase(MemoryDatabase):
+    """Records the size of every bulk_write to the explanations collection."""
+
+    def __init__(self):
+        super().__init__()
+        self.bulk_writes = []
+        collection = self["verse_explanations"]
+        bulk_write = collection.bulk_write
+
+        async def counting_bulk_write(requests, ordered=True):
+            self.bulk_writes.append(len(requests))
+            return await bulk_write(requests, ordered=ordered)
+
+        collection.bulk_write = counting_bulk_write
+
+def explanation(book, chapter, verse):
+    return {"book": book, "chapter": chapter, "verse": verse, "explanation": f"On {book} {chapter}:{verse}"}
+
+def make_cache():
+    return ExplanationCache("verse_explanations", ("book", "chapter", "verse"))
+
+def test_concurrent_puts_are_coalesced_into_one_bulk_write():
+    async def scenario():
+        db, cache = CountingDatabase(), make_cache()
+        keys = [("John", 3, verse) for verse in range(1, 21)]
+        stored = await asyncio.gather(*(cache.put(db, key, explanation(*key)) for key in keys))
+        count = await db["verse_explanations"].count_documents({})
+        await cache.close()
+        return db, cache, stored, count
+
+    db, cache, stored, count = asyncio.run(scenario())
+    assert stored == [True] * 20
+    assert count == 20
+    assert db.bulk_writes == [20]
+    assert cache.stats()["flushes"] == 1 and cache.stats()["writes_flushed"] == 20
+
+def test_puts_are_served_from_memory_before_they_are_flushed():
+    async def scenario():
+        db, cache = CountingDatabase(), make_cache()
+        key = ("John", 3, 16)
+        cache.put(db, key, explanation(*key))
+        cached = await cache.get(db, key)
+        in_db = await db["verse_explanations"].count_documents({})
+        await cache.close()
+        return cached, in_db
+
+    cached, in_db = asyncio.run(scenario())
+    assert cached == explanation("John", 3, 16)
+    assert in_db == 0
+
+def test_close_flushes_pending_writes():
+    async def scenario():
+        db, cache = CountingDatabase(), make_cache()
+        futures = [cache.put(db, ("Romans", 8, verse), explanation("Romans", 8, verse)) for verse in range(1, 6)]
+        await cache.close()
+        docs = await db["verse_explanations"].find({}, {"_id": 0}).to_list(None)
+        return db, futures, docs
+
+    db, futures, docs = asyncio.run(scenario())
+    assert sorted(doc["verse"] for doc in docs) == [1, 2, 3, 4, 5]
+    assert sum(db.bulk_writes) == 5
+    assert all(future.done() and future.result() for future in futures)
+
+def test_first_stored_explanation_wins():
+    async def scenario():
+        db, cache = CountingDatabase(), make_cache()
+        key = ("Jude", 1, 3)
+        await cache.put(db, key, explanation(*key))
+        await cache.put(db, key, {**explanation(*key), "explanation": "A later one"})
+        docs = await db["verse_explanations"].find({}, {"_id": 0}).to_list(None)
+        await cache.close()
+        return docs
+
+    docs = asyncio.run(scenario())
+    assert docs == [explanation("Jude", 1, 3)]
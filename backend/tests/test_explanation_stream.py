@@ -0,0 +1,98 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+from benchmarks.memory_db import MemoryDatabase
+from explanation_cache import ExplanationCache
+from routers.explanations import explanation_flights, stream_explanation_events
+from singleflight import LEASE_COLLECTION
+
+def parse(events):
+    parsed = []
+    for event in events:
+        if event.startswith(":"):
+            continue
+        name, data = event.strip().split("\n")
+        parsed.append((name[len("event: "):], json.loads(data[len("data: "):])))
+    return parsed
+
+class FakeModel:
+    def __init__(self, pieces=("In the ", "beginning", ".")):
+        self.pieces = pieces
+        self.contexts = 0
+
+    async def load_context(self):
+        self.contexts += 1
+        return ("context",)
+
+    async def stream(self, context):
+        for piece in self.pieces:
+            await asyncio.sleep(0.01)
+            yield piece
+
+async def collect(events):
+    return parse([event async for event in events])
+
+def test_concurrent_streams_share_one_generation():
+    async def scenario():
+        db = MemoryDatabase()
+        cache = ExplanationCache("verse_explanations", ("book", "chapter", "verse"))
+        model = FakeModel()
+        key = ("Genesis", 1, 1)
+        streams = [
+            collect(stream_explanation_events(db, cache, "verse", key, model.load_context, model.stream))
+            for _ in range(3)
+        ]
+        results = await asyncio.gather(*streams)
+        stored = await db["verse_explanations"].find_one({"book": "Genesis"}, {"_id": 0})
+        await cache.close()
+        return model, results, stored
+
+    model, results, stored = asyncio.run(scenario())
+    assert model.contexts == 1
+    leader, *followers = results
+    assert [data["text"] for name, data in leader if name == "token"] == ["In the ", "beginning", "."]
+    assert leader[-1] == ("explanation", {**leader[-1][1], "explanation": "In the beginning."})
+    for follower in followers:
+        assert follower == [leader[-1]]
+    assert stored["explanation"] == "In the beginning."
+    assert explanation_flights.in_flight() == 0
+
+def test_stream_waits_for_another_workers_generation():
+    async def scenario():
+        db = MemoryDatabase()
+        cache = ExplanationCache("verse_explanations", ("book", "chapter", "verse"))
+        model = FakeModel()
+        await db[LEASE_COLLECTION].insert_one({
+            "_id": "verse|John|3|16", "owner": "other-worker", "expires_at": datetime.utcnow() + timedelta(seconds=60),
+        })
+
+        async def other_worker():
+            await asyncio.sleep(0.05)
+            await db["verse_explanations"].insert_one({"book": "John", "chapter": 3, "verse": 16, "explanation": "Stored."})
+
+        events, _ = await asyncio.gather(
+            collect(stream_explanation_events(db, cache, "verse", ("John", 3, 16), model.load_context, model.stream)),
+            other_worker(),
+        )
+        await cache.close()
+        return model, events
+
+    model, events = asyncio.run(scenario())
+    assert model.contexts == 0
+    assert events == [("explanation", {"book": "John", "chapter": 3, "verse": 16, "explanation": "Stored."})]
+
+def test_failed_generation_is_an_error_event():
+    async def scenario():
+        db = MemoryDatabase()
+        cache = ExplanationCache("verse_explanations", ("book", "chapter", "verse"))
+        model = FakeModel(pieces=())
+        events = await collect(stream_explanation_events(db, cache, "verse", ("Jude", 1, 3), model.load_context, model.stream))
+        stored = await db["verse_explanations"].count_documents({})
+        await cache.close()
+        return events, stored
+
+    events, stored = asyncio.run(scenario())
+    assert [name for name, _ in events] == ["error"]
+    assert events[0][1]["status"] == 500
+    assert stored == 0
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from benchmarks.memory_db import MemoryDatabase
+from references import InvalidReference, fetch_from_db, parse_reference, read_from_store
+from verse_store import VerseStore
+
+BOOKS = ["Genesis", "Exodus", "John", "Romans", "1 Corinthians", "Jude"]
+CHAPTERS = {"Genesis": 4, "Exodus": 3, "John": 4, "Romans": 12, "1 Corinthians": 13, "Jude": 1}
+VERSES_PER_CHAPTER = 25
+
+def bible():
+    return [
+        {"book": book, "chapter": chapter, "verse": verse, "text": f"{book} {chapter}:{verse}"}
+        for book in BOOKS
+        for chapter in range(1, CHAPTERS[book] + 1)
+        for verse in range(1, VERSES_PER_CHAPTER + 1)
+    ]
+
+def spans(reference):
+    return [
+        (r.start_book, r.start_chapter, r.start_verse, r.end_book, r.end_chapter, r.end_verse)
+        for r in parse_reference(reference, BOOKS)
+    ]
+
+def test_single_verse():
+    assert spans("John 3:16") == [("John", 3, 16, "John", 3, 16)]
+    assert parse_reference("John 3:16", BOOKS)[0].label() == "John 3:16"
+
+def test_single_chapter_book_takes_a_verse():
+    assert spans("Jude 3") == [("Jude", 1, 3, "Jude", 1, 3)]
+
+def test_chapter_ranges():
+    assert spans("Romans 8") == [("Romans", 8, None, "Romans", 8, None)]
+    assert spans("Romans 8-10") == [("Romans", 8, None, "Romans", 10, None)]
+    assert spans("John 3:16-4:2") == [("John", 3, 16, "John", 4, 2)]
+
+def test_range_across_books():
+    assert spans("Genesis 4:20-Exodus 1:7") == [("Genesis", 4, 20, "Exodus", 1, 7)]
+    assert parse_reference("Genesis 4:20-Exodus 1:7", BOOKS)[0].label() == "Genesis 4:20-Exodus 1:7"
+
+def test_semicolon_starts_a_chapter_and_comma_continues_it():
+    assert spans("Romans 8; 12:1-2") == [
+        ("Romans", 8, None, "Romans", 8, None),
+        ("Romans", 12, 1, "Romans", 12, 2),
+    ]
+    assert spans("John 3:16, 18") == [("John", 3, 16, "John", 3, 16), ("John", 3, 18, "John", 3, 18)]
+
+def test_abbreviated_and_case_insensitive_book():
+    assert spans("1 cor 13") == [("1 Corinthians", 13, None, "1 Corinthians", 13, None)]
+
+def test_unknown_book():
+    with pytest.raises(InvalidReference, match="Unknown book"):
+        parse_reference("Hezekiah 1:1", BOOKS)
+
+@pytest.mark.parametrize("reference", ["John 3:18-16", "Romans 10-8", "Exodus 2-Genesis 3", "Romans 1:1-John 2:1"])
+def test_backwards_range(reference):
+    with pytest.raises(InvalidReference, match="ends before it starts"):
+        parse_reference(reference, BOOKS)
+
+@pytest.mark.parametrize("reference", [
+    "John 3:16; John 3:16-18",
+    "Romans 8:1-3, 2-4",
+    "Genesis 4:24-Exodus 1:2; Exodus 1",
+    "John 3:16-18; Genesis 1:1-2",
+    "Jude",
+])
+@pytest.mark.parametrize("max_verses", [500, 4])
+def test_store_and_database_agree(reference, max_verses):
+    docs = bible()
+    store = VerseStore.from_documents(docs)
+    ranges = parse_reference(reference, BOOKS)
+
+    async def from_db():
+        db = MemoryDatabase()
+        await db["bible_esv"].insert_many(docs)
+        return await fetch_from_db(db, ranges, BOOKS, max_verses)
+
+    assert asyncio.run(from_db()) == read_from_store(store, ranges, BOOKS, max_verses)
+
+def test_overlapping_ranges_repeat_verses():
+    store = VerseStore.from_documents(bible())
+    results, truncated = read_from_store(store, parse_reference("John 3:16; John 3:16-18", BOOKS), BOOKS, 500)
+    assert [[verse["verse"] for verse in passage] for passage in results] == [[16], [16, 17, 18]]
+    assert not truncated
@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routers import search as search_router
+from routers.search import RRF_K, reciprocal_rank_fusion
+from search_index import SearchIndex, get_search_index, parse_query, set_search_index
+
+VERSES = [
+    {"book": "Psalms", "chapter": 136, "verse": 1, "text": "Give thanks to the LORD, for he is good, for his steadfast love endures forever."},
+    {"book": "Psalms", "chapter": 136, "verse": 2, "text": "Give thanks to the God of gods, for his steadfast love endures forever."},
+    {"book": "Lamentations", "chapter": 3, "verse": 22, "text": "The steadfast love of the LORD never ceases; his mercies never come to an end."},
+    {"book": "Exodus", "chapter": 34, "verse": 6, "text": "The LORD, a God merciful and gracious, slow to anger, and abounding in steadfast love and faithfulness."},
+    {"book": "John", "chapter": 3, "verse": 16, "text": "For God so loved the world, that he gave his only Son."},
+    {"book": "John", "chapter": 11, "verse": 35, "text": "Jesus wept."},
+]
+COMMENTARY = [
+    {"text": "Love that is steadfast: the covenant word hesed, love love love.", "source": "Commentary", "page": 21,
+     "section": "Old Testament", "sub_section": "Psalms", "chapter_title": "136. HIS STEADFAST LOVE", "embedding": [0.1, 0.2]},
+    {"text": "Mercy and grace in the wilderness.", "source": "Commentary", "page": 22, "book": "Exodus"},
+]
+
+@pytest.fixture
+def index():
+    return SearchIndex.from_documents(VERSES, COMMENTARY)
+
+def locations(hits):
+    return [(hit["book"], hit["chapter"], hit["verse"]) if hit["kind"] == "verse" else hit["metadata"]["page"] for hit in hits]
+
+def test_parse_query_splits_phrases_from_terms():
+    assert parse_query('"Steadfast love" endures LORD\'s') == (["endures", "lord", "s"], [["steadfast", "love"]])
+
+def test_postings_are_compressed_rows_per_term(index):
+    assert index.term_offsets[0] == 0 and index.term_offsets[-1] == len(index.posting_docs)
+    assert np.all(np.diff(index.term_offsets) > 0)
+    term_id = index.term_ids["love"]
+    start, end = index._postings(term_id)
+    docs = index.posting_docs[start:end]
+    assert list(docs) == sorted(docs)
+    assert len(docs) == 5
+    # The first commentary chunk repeats "love" four times.
+    assert index.posting_tf[start:end][list(docs).index(index.verse_count)] == 4
+
+def test_rare_terms_outrank_common_ones(index):
+    total, hits = index.search("wept love")
+    assert total == 6
+    assert locations(hits)[0] == ("John", 11, 35)
+
+def test_term_frequency_and_length_order_the_hits(index):
+    _, hits = index.search("love")
+    assert locations(hits)[0] == 21
+    scores = [hit["score"] for hit in hits]
+    assert scores == sorted(scores, reverse=True)
+
+def test_phrases_must_match_in_order(index):
+    total, hits = index.search('"steadfast love"')
+    assert total == 4
+    assert sorted(map(str, locations(hits))) == sorted(map(str, [("Psalms", 136, 1), ("Psalms", 136, 2), ("Lamentations", 3, 22), ("Exodus", 34, 6)]))
+    assert index.search('"love steadfast"') == (0, [])
+    assert index.search('"steadfast unknownword"') == (0, [])
+
+def test_phrase_and_term_together(index):
+    total, hits = index.search('"give thanks" gods')
+    assert total == 2
+    assert locations(hits) == [("Psalms", 136, 2), ("Psalms", 136, 1)]
+
+def test_kind_and_book_filters(index):
+    assert {hit["kind"] for hit in index.search("love", kind="verse")[1]} == {"verse"}
+    assert locations(index.search("love", kind="commentary")[1]) == [21]
+    total, hits = index.search("love", book="psalms")
+    assert total == 2 and {hit["book"] for hit in hits} == {"Psalms"}
+    assert index.search("love", book="Genesis") == (0, [])
+
+def test_commentary_hits_carry_their_metadata(index):
+    _, hits = index.search("hesed", kind="commentary")
+    assert hits[0]["metadata"] == {
+        "page": 21, "section": "Old Testament", "sub_section": "Psalms",
+        "chapter_title": "136. HIS STEADFAST LOVE", "source": "Commentary",
+    }
+
+def test_limit_keeps_the_top_hits(index):
+    total, hits = index.search("love", limit=2)
+    _, all_hits = index.search("love", limit=10)
+    assert total == 5
+    assert hits == all_hits[:2]
+
+def test_saved_index_searches_the_same(index, tmp_path):
+    index.save(str(tmp_path))
+    loaded = SearchIndex.load(str(tmp_path))
+    for query in ("love", '"steadfast love" LORD', "mercy"):
+        assert loaded.search(query) == index.search(query)
+
+def test_reciprocal_rank_fusion_sums_reciprocal_ranks():
+    bm25 = [{"kind": "commentary", "text": "a"}, {"kind": "commentary", "text": "b"}, {"kind": "verse", "text": "c"}]
+    vector = [{"kind": "commentary", "text": "b"}, {"kind": "commentary", "text": "d"}]
+    fused = reciprocal_rank_fusion({"bm25": bm25, "vector:commentary": vector}, limit=3)
+    assert [hit["text"] for hit in fused] == ["b", "a", "d"]
+    assert fused[0]["matched_by"] == ["bm25", "vector:commentary"]
+    assert fused[0]["score"] == round(1 / (RRF_K + 2) + 1 / (RRF_K + 1), 6)
+
+@pytest.fixture
+def client(index):
+    previous = get_search_index()
+    set_search_index(index)
+    app = FastAPI()
+    app.include_router(search_router.router)
+    yield TestClient(app)
+    set_search_index(previous)
+
+def test_search_endpoint(client):
+    response = client.get("/api/v1/search", params={"q": '"steadfast love"', "book": "Psalms", "limit": 1})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total"] == 2 and len(body["hits"]) == 1 and body["hits"][0]["matched_by"] == ["bm25"]
+
+def test_book_filter_rejects_commentary(client):
+    response = client.get("/api/v1/search", params={"q": "love", "book": "Exodus", "kind": "commentary"})
+    assert response.status_code == 422
@@ -0,0 +1,161 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from benchmarks.memory_db import MemoryDatabase
+from singleflight import LEASE_COLLECTION, MongoLease, SingleFlight, mongo_lease, wait_for_document
+
+def test_concurrent_calls_share_one_task():
+    async def scenario():
+        flights = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "done"
+
+        results = await asyncio.gather(*(flights.do("key", work) for _ in range(5)))
+        return flights, calls, results
+
+    flights, calls, results = asyncio.run(scenario())
+    assert results == ["done"] * 5
+    assert len(calls) == 1
+    assert flights.stats() == {"started": 1, "shared": 4, "in_flight": 0}
+
+def test_cancelling_a_caller_does_not_cancel_the_shared_task():
+    async def scenario():
+        flights = SingleFlight()
+        finished = []
+
+        async def work():
+            await asyncio.sleep(0.05)
+            finished.append(1)
+            return "done"
+
+        first = asyncio.ensure_future(flights.do("key", work))
+        second = asyncio.ensure_future(flights.do("key", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return flights, finished, await second
+
+    flights, finished, result = asyncio.run(scenario())
+    assert result == "done"
+    assert finished == [1]
+    assert flights.in_flight() == 0
+
+def test_task_finishes_after_every_caller_is_cancelled():
+    async def scenario():
+        flights = SingleFlight()
+        finished = asyncio.Event()
+
+        async def work():
+            await asyncio.sleep(0.02)
+            finished.set()
+
+        caller = asyncio.ensure_future(flights.do("key", work))
+        await asyncio.sleep(0)
+        caller.cancel()
+        await asyncio.wait_for(finished.wait(), 1)
+        await asyncio.sleep(0)
+        return flights
+
+    assert asyncio.run(scenario()).in_flight() == 0
+
+def test_failure_is_shared_and_not_cached():
+    async def scenario():
+        flights = SingleFlight()
+        attempts = []
+
+        async def work():
+            attempts.append(1)
+            await asyncio.sleep(0.01)
+            if len(attempts) == 1:
+                raise ValueError("boom")
+            return "done"
+
+        failures = await asyncio.gather(flights.do("key", work), flights.do("key", work), return_exceptions=True)
+        return failures, await flights.do("key", work)
+
+    failures, retried = asyncio.run(scenario())
+    assert [type(failure) for failure in failures] == [ValueError, ValueError]
+    assert retried == "done"
+
+def test_lease_is_held_by_one_worker_until_released():
+    async def scenario():
+        db = MemoryDatabase()
+        first, second = MongoLease(db), MongoLease(db)
+        acquired = [await first.acquire("key"), await second.acquire("key")]
+        await second.release("key")
+        still_held = await second.acquire("key")
+        await first.release("key")
+        return acquired, still_held, await second.acquire("key")
+
+    acquired, still_held, after_release = asyncio.run(scenario())
+    assert acquired == [True, False]
+    assert still_held is False
+    assert after_release is True
+
+def test_expired_lease_is_taken_over():
+    async def scenario():
+        db = MemoryDatabase()
+        await db[LEASE_COLLECTION].insert_one({
+            "_id": "key", "owner": "dead-worker", "expires_at": datetime.utcnow() - timedelta(seconds=1),
+        })
+        lease = MongoLease(db)
+        taken = await lease.acquire("key")
+        return lease, taken, await db[LEASE_COLLECTION].find_one({"_id": "key"})
+
+    lease, taken, stored = asyncio.run(scenario())
+    assert taken is True
+    assert stored["owner"] == lease.owner
+    assert stored["expires_at"] > datetime.utcnow()
+
+def test_lease_errors_let_the_work_proceed():
+    class BrokenDatabase:
+        def __getitem__(self, name):
+            return self
+
+        async def insert_one(self, document):
+            raise ConnectionError("unreachable")
+
+    async def scenario():
+        async with mongo_lease(BrokenDatabase(), "key") as leader:
+            return leader
+
+    assert asyncio.run(scenario()) is True
+
+def test_wait_for_document_gives_up_after_its_timeout():
+    async def scenario():
+        db = MemoryDatabase()
+        start = time.perf_counter()
+        doc = await wait_for_document(db["explanations"], {"key": 1}, timeout=0.05, interval=0.01)
+        return doc, time.perf_counter() - start
+
+    doc, elapsed = asyncio.run(scenario())
+    assert doc is None
+    assert elapsed < 0.5
+
+def test_wait_for_document_returns_none_when_the_lookup_fails():
+    class BrokenCollection:
+        async def find_one(self, query, projection=None):
+            raise ConnectionError("unreachable")
+
+    assert asyncio.run(wait_for_document(BrokenCollection(), {"key": 1}, timeout=1)) is None
+
+def test_wait_for_document_finds_a_later_write():
+    async def scenario():
+        db = MemoryDatabase()
+
+        async def write():
+            await asyncio.sleep(0.03)
+            await db["explanations"].insert_one({"key": 1, "text": "stored"})
+
+        doc, _ = await asyncio.gather(wait_for_document(db["explanations"], {"key": 1}, timeout=1, interval=0.01), write())
+        return doc
+
+    assert asyncio.run(scenario()) == {"key": 1, "text": "stored"}
@@ -0,0 +1,114 @@
+# This module holds the theme x book prominence matrix behind the multi-theme endpoints.
+#
+# Built from app.state.DATA whenever data is (re)loaded: one dense float32 row per
+# theme with the prominence of every book (0 = not connected), plus an event index
+# keyed by (theme, book). Overlays, theme similarity and per-book rankings are
+# vectorized operations over the matrix.
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+COMBINE_FUNCTIONS = {
+   "sum": lambda rows: rows.sum(axis=0),
+   "mean": lambda rows: rows.mean(axis=0),
+   "max": lambda rows: rows.max(axis=0),
+   "min": lambda rows: rows.min(axis=0),
+}
+
+class ThemeMatrix:
+   """Dense themes x books prominence matrix with row-normalized copies for similarity."""
+
+   def __init__(self, data: Dict[str, Any]):
+       connections = data.get("theme_connections", {})
+       self.theme_ids = [theme.get("id") for theme in data.get("themes", []) if theme.get("id")]
+       self.theme_ids += [theme_id for theme_id in connections if theme_id not in set(self.theme_ids)]
+       self.theme_index = {theme_id: i for i, theme_id in enumerate(self.theme_ids)}
+
+       book_ids = [book.get("id") for book in data.get("books", []) if book.get("id") is not None]
+       linked = {c.get("bookId") for items in connections.values() for c in items or [] if c.get("bookId") is not None}
+       self.book_ids = np.asarray(sorted(set(book_ids) | linked), dtype=np.int32)
+       self.book_index = {int(book_id): i for i, book_id in enumerate(self.book_ids)}
+
+       self.prominence = np.zeros((len(self.theme_ids), len(self.book_ids)), dtype=np.float32)
+       self.events: Dict[Tuple[int, int], List[str]] = {}
+       for theme_id, items in connections.items():
+           t = self.theme_index[theme_id]
+           for connection in items or []:
+               b = self.book_index.get(connection.get("bookId"))
+               if b is None:
+                   continue
+               self.prominence[t, b] = float(connection.get("prominence") or 0)
+               self.events[(t, b)] = list(connection.get("events") or [])
+
+       self.present = self.prominence > 0
+       norms = np.linalg.norm(self.prominence, axis=1, keepdims=True)
+       self._unit = np.divide(self.prominence, norms, out=np.zeros_like(self.prominence), where=norms > 0)
+       # Themes are few, so the full cosine-similarity and shared-book matrices are precomputed.
+       self.similarity = self._unit @ self._unit.T
+       present = self.present.astype(np.float32)
+       self.shared_books = (present @ present.T).astype(np.int32)
+
+   def _rows(self, theme_ids: List[str]) -> np.ndarray:
+       return np.asarray([self.theme_index[theme_id] for theme_id in theme_ids], dtype=np.intp)
+
+   def unknown_themes(self, theme_ids: List[str]) -> List[str]:
+       return [theme_id for theme_id in theme_ids if theme_id not in self.theme_index]
+
+   def overlay(self, theme_ids: List[str], mode: str = "intersection", combine: str = "sum") -> List[Dict]:
+       """
+       Books connected to all (intersection) or any (union) of the themes, in book
+       order, with the combined prominence and each theme's prominence and events.
+       """
+       rows = self._rows(theme_ids)
+       present = self.present[rows]
+       mask = present.all(axis=0) if mode == "intersection" else present.any(axis=0)
+       combined = COMBINE_FUNCTIONS[combine](self.prominence[rows])
+       result = []
+       for b in np.flatnonzero(mask).tolist():
+           result.append({
+               "bookId": int(self.book_ids[b]),
+               "prominence": round(float(combined[b]), 3),
+               "themes": {
+                   self.theme_ids[t]: int(self.prominence[t, b]) for t in rows.tolist() if self.present[t, b]
+               },
+               "events": {
+                   self.theme_ids[t]: self.events.get((t, b), []) for t in rows.tolist() if self.present[t, b]
+               },
+           })
+       return result
+
+   def similar_themes(self, theme_id: str, limit: int = 5) -> List[Dict]:
+       """Other themes ranked by cosine similarity of their prominence across books."""
+       t = self.theme_index[theme_id]
+       scores = self.similarity[t].copy()
+       scores[t] = -np.inf
+       order = np.argsort(-scores, kind="stable")[:max(0, min(limit, len(self.theme_ids) - 1))]
+       return [
+           {
+               "themeId": self.theme_ids[o],
+               "similarity": round(float(self.similarity[t, o]), 4),
+               "sharedBooks": int(self.shared_books[t, o]),
+           }
+           for o in order.tolist()
+       ]
+
+   def book_themes(self, book_id: int, limit: Optional[int] = None) -> Optional[List[Dict]]:
+       """Themes connected to a book, most prominent first, or None if the book is unknown."""
+       b = self.book_index.get(book_id)
+       if b is None:
+           return None
+       column = self.prominence[:, b]
+       connected = np.flatnonzero(column > 0)
+       ranked = connected[np.argsort(-column[connected], kind="stable")][:limit]
+       return [
+           {
+               "themeId": self.theme_ids[t],
+               "prominence": int(column[t]),
+               "events": self.events.get((t, b), []),
+           }
+           for t in ranked.tolist()
+       ]
+
+def build_theme_matrix(data: Dict[str, Any]) -> ThemeMatrix:
+   return ThemeMatrix(data)
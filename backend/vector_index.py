@@ -0,0 +1,180 @@
+# This module provides a local, memory-mapped vector index as an alternative to Atlas $vectorSearch.
+#
+# The `embedding` fields of a collection are exported into a row-normalized NumPy
+# matrix (float32, float16 or int8 with per-row scales) next to the projected
+# metadata of each document. Queries are scored block by block with matrix
+# products, so a memory-mapped index is never upcast in one piece.
+
+import argparse
+import asyncio
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "atlas").lower()
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", str(Path(__file__).parent / "data" / "vector_index"))
+VECTOR_INDEX_DTYPE = os.getenv("VECTOR_INDEX_DTYPE", "float32")
+
+# Fields kept for each collection; these mirror the $project stages of the Atlas queries.
+COLLECTION_FIELDS = {
+   "theology": ["concept", "summary", "description"],
+   "commentary_chunks": ["text", "book", "chapter", "verse", "source"],
+}
+
+SUPPORTED_DTYPES = ("float32", "float16", "int8")
+SCORE_BLOCK_ROWS = 8192
+
+_indexes: Dict[str, "LocalVectorIndex"] = {}
+
+class LocalVectorIndex:
+   """Top-k cosine search over a (possibly quantized) embedding matrix."""
+
+   def __init__(self, vectors: np.ndarray, metadata: List[Dict], scales: Optional[np.ndarray] = None,
+                ids: Optional[List[str]] = None):
+       self.vectors = vectors
+       self.metadata = metadata
+       self.scales = scales
+       self.ids = ids or []
+
+   @classmethod
+   def from_embeddings(cls, embeddings: Sequence[Sequence[float]], metadata: List[Dict],
+                       dtype: str = "float32", ids: Optional[List[str]] = None) -> "LocalVectorIndex":
+       """Normalizes each row to unit length and stores it in the requested dtype."""
+       if dtype not in SUPPORTED_DTYPES:
+           raise ValueError(f"Unsupported vector index dtype '{dtype}'")
+       matrix = np.asarray(embeddings, dtype=np.float32)
+       if matrix.ndim != 2:
+           matrix = matrix.reshape(len(embeddings), 0)
+       norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+       matrix = matrix / np.where(norms == 0, 1, norms)
+
+       if dtype == "int8":
+           scales = np.abs(matrix).max(axis=1) / 127.0
+           scales[scales == 0] = 1.0
+           vectors = np.round(matrix / scales[:, None]).astype(np.int8)
+           return cls(vectors, metadata, scales.astype(np.float32), ids)
+       return cls(matrix.astype(dtype), metadata, None, ids)
+
+   @classmethod
+   def load(cls, path: str, mmap: bool = True) -> "LocalVectorIndex":
+       """Loads an index written by save(), memory-mapping the matrix by default."""
+       directory = Path(path)
+       mode = "r" if mmap else None
+       vectors = np.load(directory / "vectors.npy", mmap_mode=mode)
+       scales_path = directory / "scales.npy"
+       scales = np.load(scales_path) if scales_path.exists() else None
+       with open(directory / "metadata.json", "r", encoding="utf-8") as f:
+           payload = json.load(f)
+       return cls(vectors, payload["metadata"], scales, payload.get("ids"))
+
+   def save(self, path: str) -> None:
+       """Writes vectors.npy (+ scales.npy for int8) and metadata.json."""
+       directory = Path(path)
+       directory.mkdir(parents=True, exist_ok=True)
+       np.save(directory / "vectors.npy", self.vectors)
+       if self.scales is not None:
+           np.save(directory / "scales.npy", self.scales)
+       elif (directory / "scales.npy").exists():
+           (directory / "scales.npy").unlink()
+       with open(directory / "metadata.json", "w", encoding="utf-8") as f:
+           json.dump({"dtype": str(self.vectors.dtype), "ids": self.ids, "metadata": self.metadata}, f, ensure_ascii=False)
+
+   def __len__(self) -> int:
+       return len(self.metadata)
+
+   @property
+   def nbytes(self) -> int:
+       return self.vectors.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+   def _cosine_scores(self, queries: np.ndarray) -> np.ndarray:
+       """Returns an (n_queries, n_rows) matrix of cosine similarities."""
+       scores = np.empty((queries.shape[0], self.vectors.shape[0]), dtype=np.float32)
+       for start in range(0, self.vectors.shape[0], SCORE_BLOCK_ROWS):
+           block = np.asarray(self.vectors[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+           block_scores = queries @ block.T
+           if self.scales is not None:
+               block_scores *= self.scales[start:start + SCORE_BLOCK_ROWS]
+           scores[:, start:start + block.shape[0]] = block_scores
+       return scores
+
+   def search_batch(self, query_embeddings: Sequence[Sequence[float]], limit: int = 5) -> List[List[Dict]]:
+       """Scores a batch of queries at once and returns the top `limit` documents for each."""
+       if len(self) == 0:
+           return [[] for _ in query_embeddings]
+       queries = np.asarray(query_embeddings, dtype=np.float32)
+       norms = np.linalg.norm(queries, axis=1, keepdims=True)
+       queries = queries / np.where(norms == 0, 1, norms)
+
+       scores = self._cosine_scores(queries)
+       k = min(limit, scores.shape[1])
+       top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+       results = []
+       for row, candidates in zip(scores, top):
+           ordered = candidates[np.argsort(-row[candidates])]
+           # Match Atlas: vectorSearchScore for cosine similarity is (1 + cos) / 2.
+           results.append([
+               {**self.metadata[i], "score": float((1.0 + row[i]) / 2.0)}
+               for i in ordered
+           ])
+       return results
+
+   def search(self, query_embedding: Sequence[float], limit: int = 5) -> List[Dict]:
+       """Returns the top `limit` documents for one query, shaped like the Atlas projection."""
+       return self.search_batch([query_embedding], limit)[0]
+
+async def export_collection(db, collection_name: str, dtype: str = VECTOR_INDEX_DTYPE) -> LocalVectorIndex:
+   """Reads every embedded document of a collection into a LocalVectorIndex."""
+   fields = COLLECTION_FIELDS[collection_name]
+   projection = {field: 1 for field in fields}
+   projection["embedding"] = 1
+   embeddings, metadata, ids = [], [], []
+   async for doc in db[collection_name].find({"embedding": {"$exists": True}}, projection):
+       embedding = doc.get("embedding")
+       if not embedding:
+           continue
+       embeddings.append(embedding)
+       metadata.append({field: doc[field] for field in fields if field in doc})
+       ids.append(str(doc["_id"]))
+   return LocalVectorIndex.from_embeddings(embeddings, metadata, dtype=dtype, ids=ids)
+
+def load_vector_indexes(directory: str = VECTOR_INDEX_DIR) -> Dict[str, LocalVectorIndex]:
+   """Loads the exported indexes when RETRIEVAL_BACKEND is 'local'."""
+   _indexes.clear()
+   if RETRIEVAL_BACKEND != "local":
+       return _indexes
+   for collection_name in COLLECTION_FIELDS:
+       path = Path(directory) / collection_name
+       if not (path / "vectors.npy").exists():
+           print(f"Warning: no local vector index for '{collection_name}' in {directory}. Using Atlas.")
+           continue
+       try:
+           _indexes[collection_name] = LocalVectorIndex.load(str(path))
+       except Exception as e:
+           print(f"Error loading local vector index for '{collection_name}': {e}. Using Atlas.")
+   return _indexes
+
+def get_vector_index(collection_name: str) -> Optional[LocalVectorIndex]:
+   """Returns the local index for a collection, or None to use Atlas."""
+   return _indexes.get(collection_name)
+
+async def _export_cli(collections: List[str], out: str, dtype: str) -> None:
+   from database import connect_db, close_db_connection
+   db = await connect_db()
+   try:
+       for collection_name in collections:
+           index = await export_collection(db, collection_name, dtype)
+           index.save(str(Path(out) / collection_name))
+           print(f"Exported {len(index)} vectors from '{collection_name}' as {dtype} ({index.nbytes / 1024:.0f} KiB)")
+   finally:
+       close_db_connection()
+
+if __name__ == "__main__":
+   parser = argparse.ArgumentParser(description="Export collection embeddings into local vector indexes.")
+   parser.add_argument("--collections", nargs="+", default=list(COLLECTION_FIELDS), choices=list(COLLECTION_FIELDS))
+   parser.add_argument("--out", default=VECTOR_INDEX_DIR, help="Output directory")
+   parser.add_argument("--dtype", default=VECTOR_INDEX_DTYPE, choices=SUPPORTED_DTYPES)
+   args = parser.parse_args()
+   asyncio.run(_export_cli(args.collections, args.out, args.dtype))
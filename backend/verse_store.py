@@ -0,0 +1,258 @@
+# This module provides a compact, read-only in-memory store for the bible_esv text.
+#
+# The whole Bible is held as a handful of flat arrays: per-book chapter offsets,
+# per-chapter verse offsets, chapter/verse numbers and one UTF-8 text buffer with
+# per-verse byte offsets. The arrays can be saved to disk and memory-mapped so
+# several worker processes share the same pages.
+
+import argparse
+import asyncio
+import bisect
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+VERSE_STORE_PATH = os.getenv("VERSE_STORE_PATH", str(Path(__file__).parent / "data" / "verse_store"))
+VERSE_STORE_ENABLED = os.getenv("VERSE_STORE_ENABLED", "true").lower() == "true"
+
+ARRAY_NAMES = ("book_chapter_offsets", "chapter_numbers", "chapter_verse_offsets", "verse_numbers", "text_offsets", "text")
+
+_store = None
+
+class VerseStore:
+   """Array-backed lookup of chapters, verses and verse text by book name."""
+
+   def __init__(self, books: List[str], book_chapter_offsets: np.ndarray, chapter_numbers: np.ndarray,
+                chapter_verse_offsets: np.ndarray, verse_numbers: np.ndarray,
+                text_offsets: np.ndarray, text: np.ndarray):
+       self.books = list(books)
+       self.book_index = {name: i for i, name in enumerate(self.books)}
+       self.book_chapter_offsets = book_chapter_offsets
+       self.chapter_numbers = chapter_numbers
+       self.chapter_verse_offsets = chapter_verse_offsets
+       self.verse_numbers = verse_numbers
+       self.text_offsets = text_offsets
+       self.text = text
+       # Lookups index through memoryviews: they read the (possibly memory-mapped)
+       # arrays in place and return plain ints, avoiding per-element numpy overhead.
+       self._chapter_offsets = memoryview(book_chapter_offsets)
+       self._chapter_numbers = memoryview(chapter_numbers)
+       self._verse_offsets = memoryview(chapter_verse_offsets)
+       self._verse_numbers = memoryview(verse_numbers)
+       self._text_offsets = memoryview(text_offsets)
+       self._text = memoryview(text)
+
+   @classmethod
+   def from_documents(cls, docs: Iterable[Dict]) -> "VerseStore":
+       """Builds a store from bible_esv documents ({book, chapter, verse, text}) in any order."""
+       grouped: Dict[str, Dict[int, Dict[int, str]]] = {}
+       for doc in docs:
+           book = doc.get("book")
+           if book is None or doc.get("chapter") is None or doc.get("verse") is None:
+               continue
+           grouped.setdefault(book, {}).setdefault(int(doc["chapter"]), {})[int(doc["verse"])] = doc.get("text") or ""
+
+       books, book_chapter_offsets = [], [0]
+       chapter_numbers, chapter_verse_offsets = [], [0]
+       verse_numbers, text_offsets = [], [0]
+       buffer = bytearray()
+       for book, chapters in grouped.items():
+           books.append(book)
+           for chapter in sorted(chapters):
+               chapter_numbers.append(chapter)
+               for verse in sorted(chapters[chapter]):
+                   verse_numbers.append(verse)
+                   buffer += chapters[chapter][verse].encode("utf-8")
+                   text_offsets.append(len(buffer))
+               chapter_verse_offsets.append(len(verse_numbers))
+           book_chapter_offsets.append(len(chapter_numbers))
+
+       return cls(
+           books,
+           np.asarray(book_chapter_offsets, dtype=np.int32),
+           np.asarray(chapter_numbers, dtype=np.int16),
+           np.asarray(chapter_verse_offsets, dtype=np.int32),
+           np.asarray(verse_numbers, dtype=np.int16),
+           np.asarray(text_offsets, dtype=np.uint32),
+           np.frombuffer(bytes(buffer), dtype=np.uint8),
+       )
+
+   @classmethod
+   def load(cls, path: str, mmap: bool = True) -> "VerseStore":
+       """Loads a store written by save(), memory-mapping the arrays by default."""
+       directory = Path(path)
+       with open(directory / "books.json", "r", encoding="utf-8") as f:
+           books = json.load(f)
+       mode = "r" if mmap else None
+       arrays = {name: np.load(directory / f"{name}.npy", mmap_mode=mode) for name in ARRAY_NAMES}
+       return cls(books, **arrays)
+
+   def save(self, path: str) -> None:
+       """Writes the store as one .npy file per array plus the book name list."""
+       directory = Path(path)
+       directory.mkdir(parents=True, exist_ok=True)
+       for name in ARRAY_NAMES:
+           np.save(directory / f"{name}.npy", getattr(self, name))
+       with open(directory / "books.json", "w", encoding="utf-8") as f:
+           json.dump(self.books, f, ensure_ascii=False)
+
+   @property
+   def verse_count(self) -> int:
+       return len(self.verse_numbers)
+
+   @property
+   def nbytes(self) -> int:
+       """Approximate size of the array data in bytes."""
+       return sum(getattr(self, name).nbytes for name in ARRAY_NAMES)
+
+   def _chapter_slot(self, book: str, chapter: int) -> Optional[int]:
+       b = self.book_index.get(book)
+       if b is None:
+           return None
+       numbers = self._chapter_numbers
+       start, end = self._chapter_offsets[b], self._chapter_offsets[b + 1]
+       # Chapters are almost always numbered 1..n, so try the direct slot first.
+       guess = start + chapter - 1
+       if start <= guess < end and numbers[guess] == chapter:
+           return guess
+       slot = bisect.bisect_left(numbers, chapter, start, end)
+       if slot < end and numbers[slot] == chapter:
+           return slot
+       return None
+
+   def _verse_text(self, v: int) -> str:
+       return str(self._text[self._text_offsets[v]:self._text_offsets[v + 1]], "utf-8")
+
+   def chapters(self, book: str) -> Optional[List[Dict]]:
+       """Returns [{number, verseCount, book}] for a book, or None if unknown."""
+       b = self.book_index.get(book)
+       if b is None:
+           return None
+       numbers, offsets = self._chapter_numbers, self._verse_offsets
+       return [
+           {"number": numbers[c], "verseCount": offsets[c + 1] - offsets[c], "book": book}
+           for c in range(self._chapter_offsets[b], self._chapter_offsets[b + 1])
+       ]
+
+   def verses(self, book: str, chapter: int) -> Optional[List[Dict]]:
+       """Returns [{verse, text, chapter, book}] ordered by verse, or None if unknown."""
+       slot = self._chapter_slot(book, chapter)
+       if slot is None:
+           return None
+       numbers = self._verse_numbers
+       return [
+           {"verse": numbers[v], "text": self._verse_text(v), "chapter": chapter, "book": book}
+           for v in range(self._verse_offsets[slot], self._verse_offsets[slot + 1])
+       ]
+
+   def verse_text(self, book: str, chapter: int, verse: int) -> Optional[str]:
+       """Returns the text of a single verse, or None if unknown."""
+       slot = self._chapter_slot(book, chapter)
+       if slot is None:
+           return None
+       numbers = self._verse_numbers
+       start, end = self._verse_offsets[slot], self._verse_offsets[slot + 1]
+       guess = start + verse - 1
+       if start <= guess < end and numbers[guess] == verse:
+           return self._verse_text(guess)
+       v = bisect.bisect_left(numbers, verse, start, end)
+       if v < end and numbers[v] == verse:
+           return self._verse_text(v)
+       return None
+
+   def verse_span(self, book: str, start: Tuple[int, int], end: Tuple[int, int]) -> Tuple[int, int]:
+       """
+       Positions [first, stop) of the verses of a book from (chapter, verse) start
+       to end, inclusive; chapters and verses that do not exist are skipped.
+       """
+       b = self.book_index.get(book)
+       if b is None:
+           return 0, 0
+       numbers, offsets, verses = self._chapter_numbers, self._verse_offsets, self._verse_numbers
+       lo, hi = self._chapter_offsets[b], self._chapter_offsets[b + 1]
+       first_slot = bisect.bisect_left(numbers, start[0], lo, hi)
+       stop_slot = bisect.bisect_right(numbers, end[0], lo, hi)
+       if first_slot >= stop_slot:
+           return 0, 0
+       first = offsets[first_slot]
+       if numbers[first_slot] == start[0]:
+           first = bisect.bisect_left(verses, start[1], first, offsets[first_slot + 1])
+       stop = offsets[stop_slot]
+       if numbers[stop_slot - 1] == end[0]:
+           stop = bisect.bisect_right(verses, end[1], offsets[stop_slot - 1], stop)
+       return first, max(first, stop)
+
+   def verse_slice(self, first: int, stop: int) -> List[Dict]:
+       """Returns [{verse, text, chapter, book}] for the verses at positions [first, stop)."""
+       if first >= stop:
+           return []
+       offsets, chapter_offsets = self._verse_offsets, self._chapter_offsets
+       slot = bisect.bisect_right(offsets, first) - 1
+       b = bisect.bisect_right(chapter_offsets, slot) - 1
+       result = []
+       for v in range(first, stop):
+           while v >= offsets[slot + 1]:
+               slot += 1
+           while slot >= chapter_offsets[b + 1]:
+               b += 1
+           result.append({
+               "verse": self._verse_numbers[v],
+               "text": self._verse_text(v),
+               "chapter": self._chapter_numbers[slot],
+               "book": self.books[b],
+           })
+       return result
+
+async def build_verse_store_from_db(db) -> VerseStore:
+   """Builds a store with a single scan of the bible_esv collection."""
+   docs = await db["bible_esv"].find(
+       {}, {"_id": 0, "book": 1, "chapter": 1, "verse": 1, "text": 1}
+   ).to_list(length=None)
+   return VerseStore.from_documents(docs)
+
+async def load_verse_store(db) -> Optional[VerseStore]:
+   """
+   Loads the verse store from VERSE_STORE_PATH if a prebuilt copy exists, otherwise
+   builds it from MongoDB. Returns None (routes fall back to MongoDB) on failure.
+   """
+   global _store
+   if not VERSE_STORE_ENABLED:
+       return None
+   try:
+       if (Path(VERSE_STORE_PATH) / "books.json").exists():
+           _store = VerseStore.load(VERSE_STORE_PATH)
+       else:
+           store = await build_verse_store_from_db(db)
+           _store = store if store.verse_count else None
+   except Exception as e:
+       print(f"Error loading verse store: {e}. Falling back to MongoDB queries.")
+       _store = None
+   return _store
+
+def get_verse_store() -> Optional[VerseStore]:
+   """Returns the process-wide verse store, or None if it is not loaded."""
+   return _store
+
+def set_verse_store(store: Optional[VerseStore]) -> None:
+   """Replaces the process-wide verse store."""
+   global _store
+   _store = store
+
+async def _build_cli(out: str) -> None:
+   from database import connect_db, close_db_connection
+   db = await connect_db()
+   try:
+       store = await build_verse_store_from_db(db)
+   finally:
+       close_db_connection()
+   store.save(out)
+   print(f"Wrote {store.verse_count} verses in {len(store.books)} books to {out} ({store.nbytes / 1024:.0f} KiB)")
+
+if __name__ == "__main__":
+   parser = argparse.ArgumentParser(description="Build the prebuilt verse store from MongoDB.")
+   parser.add_argument("--out", default=VERSE_STORE_PATH, help="Output directory")
+   args = parser.parse_args()
+   asyncio.run(_build_cli(args.out))